@@ -0,0 +1,304 @@
+"""
+Vectorized aspects.
+
+NatalAspects and SynastryAspects compare every pair of points in Python: one
+get_aspect_from_two_points per pair (a scan over the aspect settings) and two
+planet_id_decoder scans per aspect found. Here the distances between all the
+points are one N x M array, classified against every orb at once, and
+AspectModel objects are only built for the pairs in aspect.
+
+FastNatalAspects and FastSynastryAspects are drop-in subclasses: their
+all_aspects and relevant_aspects are equal to the originals', node pair and
+axes_orbit rules included.
+
+get_aspect_from_two_points only ever looks at int(distance), so which aspect
+(if any) a pair is in is fixed by one of 181 whole distances: AspectTable
+compiles that answer once per list of aspects, degrees and orbs. The lists
+filter_aspects_settings returns carry theirs (AspectSettings.aspect_table),
+and for SettingsCache settings are themselves cached on the settings entry.
+"""
+import timeit
+from functools import cached_property, lru_cache
+from operator import itemgetter
+from typing import List, Sequence
+
+import numpy as np
+import swisseph as swe
+from kerykeion import AstrologicalSubject, NatalAspects, SynastryAspects
+from kerykeion.aspects.aspects_utils import get_active_points_list
+from kerykeion.aspects.natal_aspects import AXES_LIST
+from kerykeion.kr_types import AspectModel
+
+from SettingsCache import ReadOnlyList, get_registered_entry
+
+
+# NatalAspects skips these pairs: they're always in opposition
+OPPOSITE_PAIRS = {
+    ("Ascendant", "Descendant"),
+    ("Descendant", "Ascendant"),
+    ("Medium_Coeli", "Imum_Coeli"),
+    ("Imum_Coeli", "Medium_Coeli"),
+    ("True_Node", "True_South_Node"),
+    ("Mean_Node", "Mean_South_Node"),
+    ("True_South_Node", "True_Node"),
+    ("Mean_South_Node", "Mean_Node"),
+}
+
+# Aspect index of a pair that isn't in aspect
+NO_ASPECT = -1
+
+# abs(swe.difdeg2n) is at most 180, so int(distance) is one of 0-180
+WHOLE_DISTANCES = 181
+
+# What an AspectTable is compiled from, per aspect
+_ASPECT_FIELDS = itemgetter("name", "degree", "orb")
+
+
+def difdeg2n(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """swe.difdeg2n on arrays: first - second normalized to [-180, 180), with the same rounding."""
+    difference = np.fmod(first - second, 360.0)
+    difference = np.where(np.abs(difference) < 1e-13, 0.0, difference)
+    difference = np.where(difference < 0, difference + 360.0, difference)
+    return np.where(difference >= 180.0, difference - 360.0, difference)
+
+
+class AspectTable:
+    """
+    The aspect get_aspect_from_two_points finds for every whole distance, given
+    (name, degree, orb) for each aspect in settings order.
+
+        table = get_aspect_table(aspects_settings)
+        aspect_id, orbit = table.get_aspect(point_one, point_two)
+        if aspect_id != NO_ASPECT:
+            name, degree, orb = table.aspects[aspect_id]
+    """
+
+    __slots__ = ("aspects", "ids", "lookup")
+
+    def __init__(self, aspects: Sequence[tuple]) -> None:
+        self.aspects = tuple(aspects)
+
+        lookup = np.full(WHOLE_DISTANCES, NO_ASPECT, dtype=np.int64)
+        whole_distances = np.arange(WHOLE_DISTANCES)
+        # Last aspect first, so that the first one in settings order wins
+        for aspect_id in reversed(range(len(self.aspects))):
+            _, degree, orb = self.aspects[aspect_id]
+            lookup[(degree - orb <= whole_distances) & (whole_distances <= degree + orb)] = aspect_id
+
+        self.lookup = lookup
+        self.ids = tuple(lookup.tolist())
+
+    def get_aspect(self, point_one: float, point_two: float) -> tuple:
+        """(aspect id or NO_ASPECT, orbit) between two longitudes; the orbit is the distance when there's no aspect."""
+        distance = abs(swe.difdeg2n(point_one, point_two))
+        aspect_id = self.ids[int(distance)]
+        if aspect_id == NO_ASPECT:
+            return aspect_id, distance
+        return aspect_id, distance - self.aspects[aspect_id][1]
+
+
+class AspectSettings(ReadOnlyList):
+    """
+    Aspect settings as filter_aspects_settings returns them, with the AspectTable
+    of their names, degrees and orbs. Read-only, so the table stays theirs.
+    """
+
+    __slots__ = ("aspect_table",)
+
+    def __init__(self, aspects_settings: Sequence) -> None:
+        super().__init__(aspects_settings)
+        self.aspect_table = compile_aspect_table(tuple(map(_ASPECT_FIELDS, self)))
+
+
+@lru_cache(maxsize=256)
+def compile_aspect_table(aspects: tuple) -> AspectTable:
+    return AspectTable(aspects)
+
+
+def get_aspect_table(aspects_settings: list) -> AspectTable:
+    """
+    AspectTable of an aspect settings list (dicts or settings models): the one
+    AspectSettings carry, otherwise compiled once per (name, degree, orb)
+    contents, so orbs changed in a list already in use are picked up.
+    """
+    if type(aspects_settings) is AspectSettings:
+        return aspects_settings.aspect_table
+    if aspects_settings and not isinstance(aspects_settings[0], dict):
+        # A model's fields are in its __dict__, read without going through __getitem__
+        return compile_aspect_table(tuple(map(_ASPECT_FIELDS, map(vars, aspects_settings))))
+    return compile_aspect_table(tuple(map(_ASPECT_FIELDS, aspects_settings)))
+
+
+def _with_orb(aspect_settings, orb: float):
+    if aspect_settings["orb"] == orb:
+        return aspect_settings
+    if isinstance(aspect_settings, dict):
+        return {**aspect_settings, "orb": orb}
+    return aspect_settings.model_copy(update={"orb": orb})
+
+
+def _filter_aspects_settings(aspects_settings: list, active_aspects: list, first_match_only: bool) -> AspectSettings:
+    filtered_settings = []
+    for aspect_settings in aspects_settings:
+        for aspect in active_aspects:
+            if aspect_settings["name"] == aspect["name"]:
+                filtered_settings.append(_with_orb(aspect_settings, aspect["orb"]))
+                if first_match_only:
+                    break
+
+    return AspectSettings(filtered_settings)
+
+
+def filter_aspects_settings(aspects_settings: list, active_aspects: list, first_match_only: bool = True) -> AspectSettings:
+    """
+    The settings of the active aspects with their orbs, as NatalAspects.all_aspects
+    (first_match_only) and SynastryAspects.all_aspects filter them, and the
+    AspectTable those orbs compile to. The settings are left as they are
+    (SettingsCache's are read-only): an aspect whose orb changes is a copy.
+
+    The aspects of SettingsCache settings are filtered once per active aspects
+    and orbs, on the settings entry.
+    """
+    entry = get_registered_entry(aspects_settings)
+    if entry is None:
+        return _filter_aspects_settings(aspects_settings, active_aspects, first_match_only)
+
+    key = ("aspect_settings", tuple((aspect["name"], aspect["orb"]) for aspect in active_aspects), first_match_only)
+    return entry.get_index(key, lambda: _filter_aspects_settings(aspects_settings, active_aspects, first_match_only))
+
+
+def get_aspect_matrix(first_positions: Sequence[float], second_positions: Sequence[float], aspects_settings: list) -> tuple:
+    """
+    (aspect indexes, distances) for every pair of positions, shaped (N, M).
+
+    The index is the first of aspects_settings whose orb get_aspect_from_two_points
+    would accept for the pair, or NO_ASPECT; the distance is abs(swe.difdeg2n).
+    """
+    first_positions = np.asarray(first_positions, dtype=np.float64)
+    second_positions = np.asarray(second_positions, dtype=np.float64)
+
+    distances = np.abs(difdeg2n(first_positions[:, None], second_positions[None, :]))
+    # Distances are never negative, so truncating is int(distance)
+    aspect_indexes = get_aspect_table(aspects_settings).lookup[distances.astype(np.int64)]
+    return aspect_indexes, distances
+
+
+def build_aspect_models(
+    first_points: list,
+    second_points: list,
+    first_owner: str,
+    second_owner: str,
+    aspect_indexes: np.ndarray,
+    distances: np.ndarray,
+    aspects_settings: list,
+    celestial_points: list,
+) -> List[AspectModel]:
+    """AspectModel for every pair with an aspect, in the order the pairwise loops produce them."""
+    point_ids = {}
+    for point in celestial_points:
+        # planet_id_decoder returns the first match
+        point_ids.setdefault(point["name"], point["id"])
+
+    aspects_list = []
+    for first, second in zip(*np.nonzero(aspect_indexes != NO_ASPECT)):
+        first_point, second_point = first_points[first], second_points[second]
+        aspect = aspects_settings[aspect_indexes[first, second]]
+
+        aspects_list.append(AspectModel(
+            p1_name=first_point["name"],
+            p1_owner=first_owner,
+            p1_abs_pos=first_point["abs_pos"],
+            p2_name=second_point["name"],
+            p2_owner=second_owner,
+            p2_abs_pos=second_point["abs_pos"],
+            aspect=aspect["name"],
+            orbit=float(distances[first, second]) - aspect["degree"],
+            aspect_degrees=aspect["degree"],
+            diff=abs(first_point["abs_pos"] - second_point["abs_pos"]),
+            p1=point_ids[first_point["name"]],
+            p2=point_ids[second_point["name"]],
+        ))
+
+    return aspects_list
+
+
+def filter_relevant_aspects(aspects_list: List[AspectModel], axes_orbit: float) -> List[AspectModel]:
+    """NatalAspects.relevant_aspects: drops aspects of the axes that are wider than axes_orbit."""
+    return [
+        aspect for aspect in aspects_list
+        if not ((aspect["p1_name"] in AXES_LIST or aspect["p2_name"] in AXES_LIST) and abs(aspect["orbit"]) >= axes_orbit)
+    ]
+
+
+class FastNatalAspects(NatalAspects):
+    """NatalAspects with the aspect matrix, same arguments and results."""
+
+    @cached_property
+    def all_aspects(self):
+        active_points_list = get_active_points_list(self.user, self.settings, self.active_points)
+        self.aspects_settings = filter_aspects_settings(self.aspects_settings, self.active_aspects)
+
+        positions = [point["abs_pos"] for point in active_points_list]
+        aspect_indexes, distances = get_aspect_matrix(positions, positions, self.aspects_settings)
+
+        # Each pair once, the opposite pairs not at all
+        names = [point["name"] for point in active_points_list]
+        skipped = ~np.triu(np.ones(aspect_indexes.shape, dtype=bool), k=1)
+        for first, first_name in enumerate(names):
+            for second, second_name in enumerate(names):
+                if (first_name, second_name) in OPPOSITE_PAIRS:
+                    skipped[first, second] = True
+        aspect_indexes[skipped] = NO_ASPECT
+
+        self.all_aspects_list = build_aspect_models(
+            active_points_list, active_points_list, self.user.name, self.user.name, aspect_indexes, distances, self.aspects_settings, self.celestial_points
+        )
+        return self.all_aspects_list
+
+    @cached_property
+    def relevant_aspects(self):
+        self.aspects = filter_relevant_aspects(self.all_aspects, self.axes_orbit_settings)
+        return self.aspects
+
+
+class FastSynastryAspects(SynastryAspects):
+    """SynastryAspects with the aspect matrix, same arguments and results."""
+
+    @cached_property
+    def all_aspects(self):
+        if self._all_aspects is not None:
+            return self._all_aspects
+
+        first_active_points_list = get_active_points_list(self.first_user, self.settings, self.active_points)
+        second_active_points_list = get_active_points_list(self.second_user, self.settings, self.active_points)
+        self.aspects_settings = filter_aspects_settings(self.aspects_settings, self.active_aspects, first_match_only=False)
+
+        aspect_indexes, distances = get_aspect_matrix(
+            [point["abs_pos"] for point in first_active_points_list],
+            [point["abs_pos"] for point in second_active_points_list],
+            self.aspects_settings,
+        )
+
+        self.all_aspects_list = build_aspect_models(
+            first_active_points_list, second_active_points_list, self.first_user.name, self.second_user.name, aspect_indexes, distances, self.aspects_settings, self.celestial_points
+        )
+        return self.all_aspects_list
+
+    @cached_property
+    def relevant_aspects(self):
+        self.aspects = filter_relevant_aspects(self.all_aspects, self.axes_orbit_settings)
+        return self.aspects
+
+
+if __name__ == "__main__":
+    john = AstrologicalSubject("John", 1940, 10, 9, 18, 30, "Liverpool", "GB", lng=-2.98, lat=53.41, tz_str="Europe/London", online=False)
+    yoko = AstrologicalSubject("Yoko", 1933, 2, 18, 20, 30, "Tokyo", "JP", lng=139.69, lat=35.69, tz_str="Asia/Tokyo", online=False)
+
+    assert FastNatalAspects(john).relevant_aspects == NatalAspects(john).relevant_aspects
+    assert FastSynastryAspects(john, yoko).relevant_aspects == SynastryAspects(john, yoko).relevant_aspects
+
+    natal = timeit.timeit(lambda: NatalAspects(john).relevant_aspects, number=50) / 50 * 1000
+    fast_natal = timeit.timeit(lambda: FastNatalAspects(john).relevant_aspects, number=50) / 50 * 1000
+    synastry = timeit.timeit(lambda: SynastryAspects(john, yoko).relevant_aspects, number=50) / 50 * 1000
+    fast_synastry = timeit.timeit(lambda: FastSynastryAspects(john, yoko).relevant_aspects, number=50) / 50 * 1000
+    print(f"NatalAspects: {natal:.2f} ms -> {fast_natal:.2f} ms, SynastryAspects: {synastry:.2f} ms -> {fast_synastry:.2f} ms")
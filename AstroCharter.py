@@ -4,10 +4,12 @@ from PyQt5.QtWidgets import (
 )
 
 from PyQt5.QtWebEngineWidgets import QWebEngineView
-from PyQt5.QtCore import Qt, QUrl
+from PyQt5.QtCore import Qt, QUrl, QByteArray
 from PyQt5.QtGui import QFont
 from pathlib import Path
-from kerykeion import AstrologicalSubject, KerykeionChartSVG
+from kerykeion import AstrologicalSubject
+from ChartPalette import PASTEL_MAGICAL_GIRL_COLORS, Palette, PaletteChartSVG
+from ChartRenderer import ChartRender
 from geopy.geocoders import Nominatim
 from timezonefinder import TimezoneFinder
 from datetime import datetime
@@ -15,145 +17,8 @@ import os
 from PyQt5.QtGui import QFont, QIcon  # Add QIcon here
 
 
-# Define the pastel magical girl color map
-PASTEL_MAGICAL_GIRL_COLORS = {
-    # General Text and Background
-    "#000000": "#000000",  # Text → Black for sharp readability (used for all text)
-    "#ffffff": "#ffffff",  # White → White (background color)
-
-    # Wheel Colors
-    "#0000ff": "#7FBFFF",  # Blue → Brighter pastel blue (used for Air signs)
-    "#06537f": "#06537f",  # Dark teal → Dark teal (used for Water signs)
-    "#124500": "#124500",  # Dark green → Dark green (used for Earth signs)
-    "#150052": "#DB6EC0",  # Deep purple → Brighter pastel lavender (used for House lines)
-    "#160": "#DB6EC0",     # Dark olive → Brighter blush pink (used for Fire signs)
-    "#176": "#DB6EC0",     # Olive → Brighter blush pink (used for Fire signs)
-    "#1f99b3": "#DB6EC0",  # Teal → Brighter pastel aqua (used for Water signs)
-    "#26bbcf": "#8FD3FF",  # Cyan → Brighter pastel sky blue (used for Air signs)
-    "#2b4972": "#A7CFFF",  # Navy → Brighter pastel periwinkle (used for Water elements)
-
-    # Earth Element (Greens)
-    "#36d100": "#387038",  # Bright green → Forest green (used for Earth symbols)
-    "#666f06": "#387038",  # Olive green → Forest green (used for Earth-related signs)
-    "#6a2d04": "#387038",  # Reddish-brown → Forest green (used for Earth elements)
-    "#6b3d00": "#387038",  # Dark orange → Forest green (used for Earth signs)
-    "#713f04": "#387038",  # Deep orange → Forest green (used for Earth-related aspects)
-    "#7a9810": "#387038",  # Olive → Forest green (used for Earth signs)
-    "#984b00": "#387038",  # Orange-brown → Forest green (used for Earth aspects)
-    "#985a10": "#387038",  # Burnt orange → Forest green (used for Earth symbols)
-
-    # Air Element (Purples)
-    "#6f0766": "#A080FF",  # Dark magenta → Vibrant pastel purple (used for Air symbols)
-    "#6f76d1": "#A080FF",  # Blue-purple → Vibrant pastel purple (used for Air-related signs)
-    "#810757": "#A080FF",  # Deep magenta → Vibrant pastel purple (used for Air aspects)
-    "#510060": "#A080FF",  # Deep purple → Vibrant pastel purple (used for Air symbols)
-    "#5757e2": "#A080FF",  # Bright blue → Vibrant pastel purple (used for Air-related elements)
-    "#630e73": "#A080FF",  # Dark purple → Vibrant pastel purple (used for Air aspects)
-
-    # Fire Element (Reds)
-    "#F00": "#DB6EC0",     # Bright red → Darker Brick Red (used for Fire symbols)
-    "#FF0000": "#DB6EC0",  # Red → Brighter peachy pink (used for Fire-related elements)
-    "#ff7200": "#DB6EC0",  # Bright orange → Brighter coral pink (used for Fire signs)
-    "#ff7e00": "#DB6EC0",  # Deep orange → Brighter coral pink (used for Fire aspects)
-    "#ff6600": "#DB6EC0",  # Orange → Brighter coral pink (used for Fire symbols)
-
-    # Water Element (Blues)
-    "#8FD3FF": "#375B73",  # Cyan → Deep Ocean Blue (used for Water symbols)
-    "#2b4972": "#375B73",  # Navy → Deep Ocean Blue (used for Water-related signs)
-
-    # House Dividing Lines (Neutral Gray)
-    "#404040": "#000000",  # Pure Black for sharp contrast (used for house dividing lines)
-
-    # Miscellaneous (Signs, Points, Aspects)
-    "#b14e58": "#DB6EC0",  # Rosewood → Brighter salmon pink (used for Venus and similar aspects)
-    "#d59e28": "#d59e28",  # Gold → Brighter pastel coral (used for Sun-related aspects)
-    "#dc0000": "#DB6EC0",  # Bright red → Brighter peachy pink (used for Mars and similar aspects)
-    "#520800": "#DB6EC0",  # Brownish red → Brighter dusty rose (used for Saturn aspects)
-    "#400052": "#DB6EC0",  # Deep violet → Brighter pastel lavender (used for Neptune aspects)
-    "#47133d": "#DB6EC0",  # Wine → Brighter pastel coral (used for Pluto aspects)
-}
-
-
-
-
-
-
-
-def change_svg_colors(svg_path, output_path, color_map):
-    import xml.etree.ElementTree as ET
-    import re
-
-    # Normalize color_map to handle case insensitivity
-    color_map = {k.lower(): v for k, v in color_map.items()}
-
-    try:
-        # Parse the SVG file
-        tree = ET.parse(svg_path)
-        root = tree.getroot()
-
-        # Namespace handling
-        namespaces = {'svg': 'http://www.w3.org/2000/svg'}
-        ET.register_namespace('', namespaces['svg'])
-
-        # Track whether changes were made
-        changes_made = False
-
-        # Find the <style> block
-        for style_elem in root.findall(".//{http://www.w3.org/2000/svg}style"):
-            css_content = style_elem.text
-            if css_content:
-                # Match CSS variables
-                css_variable_regex = re.compile(r"(--[\w-]+):\s*(#[0-9a-fA-F]{3,6});")
-                updated_css_content = css_content
-
-                # Replace CSS variables with pastel colors
-                for match in css_variable_regex.finditer(css_content):
-                    css_var, original_color = match.groups()
-                    if original_color.lower() in color_map:
-                        updated_color = color_map[original_color.lower()]
-                        updated_css_content = updated_css_content.replace(
-                            f"{css_var}: {original_color}", f"{css_var}: {updated_color}"
-                        )
-                        changes_made = True
-
-                # Update the <style> block
-                style_elem.text = updated_css_content
-
-        # Update inline `fill`, `stroke`, and `style` attributes
-        for elem in root.iter():
-            # Check for `fill` and `stroke`
-            if 'fill' in elem.attrib:
-                original_fill = elem.attrib['fill'].lower()
-                if original_fill in color_map:
-                    elem.attrib['fill'] = color_map[original_fill]
-                    changes_made = True
-            if 'stroke' in elem.attrib:
-                original_stroke = elem.attrib['stroke'].lower()
-                if original_stroke in color_map:
-                    elem.attrib['stroke'] = color_map[original_stroke]
-                    changes_made = True
-
-            # Check for `style` attribute
-            if 'style' in elem.attrib:
-                style = elem.attrib['style']
-                updated_style = style
-                color_regex = re.compile(r"(fill|stroke):\s*(#[0-9a-fA-F]{3,6})")
-                for attr, color in color_regex.findall(style):
-                    lower_color = color.lower()
-                    if lower_color in color_map:
-                        updated_style = updated_style.replace(color, color_map[lower_color])
-                        changes_made = True
-                elem.attrib['style'] = updated_style
-
-        # Save changes to the output SVG file
-        if changes_made:
-            tree.write(output_path)
-            print(f"Modified SVG written to: {output_path}")
-        else:
-            print("No changes made to the SVG.")
-
-    except Exception as e:
-        print(f"Error processing SVG file: {e}")
+# Compiled once: charts are drawn in these colors directly
+PASTEL_PALETTE = Palette(PASTEL_MAGICAL_GIRL_COLORS)
 
 
 def get_location_info(city, state, country):
@@ -390,7 +255,7 @@ class AstrologyChartGenerator(QMainWindow):
                 second_person_data = self.get_person_data(self.second_person["entries"])
 
                 file_name = f"{main_person_data['name']} and {second_person_data['name']} - Synastry Chart.svg"
-                chart = KerykeionChartSVG(
+                chart = PaletteChartSVG(
                     AstrologicalSubject(
                         name=main_person_data["name"],
                         year=main_person_data["year"],
@@ -415,16 +280,15 @@ class AstrologyChartGenerator(QMainWindow):
                         tz_str=second_person_data["timezone"]
                     ),
                     new_output_directory=str(output_dir),
+                    palette=PASTEL_PALETTE,
                 )
-                chart.makeSVG()
 
-                # Apply pastel colors to the generated SVG
-                default_file_path = output_dir / f"{main_person_data['name']} - Synastry Chart.svg"
-                pastel_file_path = output_dir / file_name
-                change_svg_colors(default_file_path, pastel_file_path, PASTEL_MAGICAL_GIRL_COLORS)
+                # The chart is drawn in pastel colors directly
+                render = ChartRender(chart)
+                pastel_file_path = render.save(path=output_dir / file_name)
 
                 # Preview the pastel chart
-                self.preview_chart(pastel_file_path)
+                self.preview_chart(pastel_file_path, render.to_bytes())
 
             elif chart_type == "Natal":
                 subject = AstrologicalSubject(
@@ -438,16 +302,14 @@ class AstrologyChartGenerator(QMainWindow):
                     lat=person_data["latitude"],
                     tz_str=person_data["timezone"],
                 )
-                chart_file = output_dir / f"{subject.name} - Natal Chart.svg"
                 pastel_chart_file = output_dir / f"{subject.name} - Natal Chart (Pastel).svg"
-                chart = KerykeionChartSVG(subject, new_output_directory=str(output_dir))
-                chart.makeSVG()
 
-                # Apply pastel colors to the generated SVG
-                change_svg_colors(chart_file, pastel_chart_file, PASTEL_MAGICAL_GIRL_COLORS)
+                # The chart is drawn in pastel colors directly
+                render = ChartRender(PaletteChartSVG(subject, new_output_directory=str(output_dir), palette=PASTEL_PALETTE))
+                render.save(path=pastel_chart_file)
 
                 # Preview the pastel chart
-                self.preview_chart(pastel_chart_file)
+                self.preview_chart(pastel_chart_file, render.to_bytes())
 
             elif chart_type == "Transit":
                 now = datetime.utcnow()
@@ -473,16 +335,14 @@ class AstrologyChartGenerator(QMainWindow):
                     lat=0.0,
                     tz_str="UTC",
                 )
-                chart_file = output_dir / f"{person_data['name']} - Transit Chart.svg"
                 pastel_chart_file = output_dir / f"{person_data['name']} - Transit Chart (Pastel).svg"
-                chart = KerykeionChartSVG(natal_subject, "Transit", transit_subject, new_output_directory=str(output_dir))
-                chart.makeSVG()
 
-                # Apply pastel colors to the generated SVG
-                change_svg_colors(chart_file, pastel_chart_file, PASTEL_MAGICAL_GIRL_COLORS)
+                # The chart is drawn in pastel colors directly
+                render = ChartRender(PaletteChartSVG(natal_subject, "Transit", transit_subject, new_output_directory=str(output_dir), palette=PASTEL_PALETTE))
+                render.save(path=pastel_chart_file)
 
                 # Preview the pastel chart
-                self.preview_chart(pastel_chart_file)
+                self.preview_chart(pastel_chart_file, render.to_bytes())
 
         except ValueError as ve:
             QMessageBox.warning(self, "Input Error", str(ve))
@@ -490,14 +350,18 @@ class AstrologyChartGenerator(QMainWindow):
             QMessageBox.critical(self, "Error", f"An unexpected error occurred: {str(e)}")
 
 
-    def preview_chart(self, html_path):
+    def preview_chart(self, html_path, svg_bytes=None):
         try:
             for index in range(self.tab_widget.count()):
                 if self.tab_widget.tabText(index) == Path(html_path).stem:
                     self.tab_widget.setCurrentIndex(index)
                     return
             browser = QWebEngineView()
-            browser.setUrl(QUrl.fromLocalFile(str(html_path)))
+            if svg_bytes is not None:
+                # Already rendered in memory, no need to read the file back
+                browser.setContent(QByteArray(svg_bytes), "image/svg+xml")
+            else:
+                browser.setUrl(QUrl.fromLocalFile(str(html_path)))
             self.tab_widget.addTab(browser, Path(html_path).stem)
             self.tab_widget.setCurrentWidget(browser)
         except Exception as e:
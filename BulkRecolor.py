@@ -0,0 +1,240 @@
+"""
+Recolor a directory of already generated charts.
+
+change_svg_colors parses every file with ElementTree, compiles its regexes
+again for every element and writes the tree back. Here a color map is compiled
+once into a lookup, and a single precompiled bytes pattern finds every color
+in one pass; the map's colors are swapped where recolor_svg swaps them (the
+places change_svg_colors did): CSS variables in style blocks, fill and stroke
+attributes, and in style attributes every occurrence of a color used there as
+a fill or stroke. Files are recolored as bytes, without parsing, across a
+process pool.
+
+In incremental mode a manifest in the output directory remembers the color
+map and the size, modification time and hash of every source file. Files whose
+size and modification time are unchanged, or else whose hash is, are skipped
+(as long as their output is still there), and files that are gone from the
+source directory are dropped from the manifest.
+
+    python BulkRecolor.py generated_charts recolored_charts --incremental
+    python BulkRecolor.py generated_charts recolored_charts --color-map colors.json --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Mapping, Union
+
+from ChartPalette import PASTEL_MAGICAL_GIRL_COLORS
+from EphemerisEngine import split_into_chunks
+
+
+MANIFEST_NAME = ".recolor-manifest.json"
+
+# Below this many files starting the workers takes longer than recoloring
+MIN_POOL_FILES = 64
+
+CHUNKS_PER_WORKER = 4
+
+# What has to come right before a color for it to be recolored, looked for in the CONTEXT_SIZE bytes before it
+CONTEXT_SIZE = 128
+_COLOR_CONTEXT = re.compile(rb"(?:(?P<variable>--[\w-]+: )|\s(?:fill|stroke)=(?P<quote>['\"]))\Z")
+
+# Where CSS variables are recolored
+_STYLE_BLOCK = re.compile(rb"<style\b[^>]*>.*?</style>", re.DOTALL)
+
+# How far back the start of a color's style attribute is looked for, and the colors recolored in a style attribute
+STYLE_ATTRIBUTE_SIZE = 4096
+_STYLE_COLOR = re.compile(rb"(?:fill|stroke):\s*(#[0-9a-fA-F]{3,6})")
+
+
+class ColorMapRecolor:
+    """
+    A color map compiled for bytes. One pattern finds every hex color in a
+    single pass; a color of the map (ignoring case) is swapped when it's in one
+    of the places recolor_svg recolors:
+
+        --name: #COLOR;                  CSS variables in style blocks
+        fill='#COLOR'                    fill and stroke attributes (either quote)
+        style='stroke: #COLOR; ...'      every occurrence of the colors used as a
+                                         fill or stroke in a style attribute
+    """
+
+    # Starts with a literal, so the scan skips everything up to the next "#"
+    pattern = re.compile(rb"#[0-9a-fA-F]{3,6}")
+
+    def __init__(self, color_map: Mapping[str, str]) -> None:
+        self.replacements = {original.lower().encode("ascii"): replacement.encode("ascii") for original, replacement in color_map.items()}
+
+    def _replace(self, match: "re.Match") -> bytes:
+        found = match.group(0).lower()
+        color = self.replacements.get(found)
+        # In a style attribute a color of the map is replaced even at the start of a longer one
+        if color is None and not any(found[:length] in self.replacements for length in range(4, len(found))):
+            return match.group(0)
+
+        svg, start, end = match.string, match.start(), match.end()
+        if color is not None:
+            context = _COLOR_CONTEXT.search(svg, max(0, start - CONTEXT_SIZE), start)
+            if context is not None:
+                follower = svg[end:end + 1]
+                if context.group("variable") is not None:
+                    if follower == b";" and any(block_start < start < block_end for block_start, block_end in self._style_blocks):
+                        return color
+                elif follower == context.group("quote"):
+                    return color
+
+        return self._replace_in_style_attribute(match)
+
+    def _replace_in_style_attribute(self, match: "re.Match") -> bytes:
+        svg, start = match.string, match.start()
+        attribute = svg.rfind(b"style=", max(0, start - STYLE_ATTRIBUTE_SIZE), start)
+        if attribute < 1 or not svg[attribute - 1:attribute].isspace():
+            return match.group(0)
+        quote = svg[attribute + 6:attribute + 7]
+        if quote not in (b"'", b'"') or quote in svg[attribute + 7:start]:
+            return match.group(0)
+
+        if attribute not in self._style_colors:
+            style = svg[attribute + 7:svg.find(quote, attribute + 7)]
+            colors = {color: self.replacements[color.lower()] for color in _STYLE_COLOR.findall(style) if color.lower() in self.replacements}
+            self._style_colors[attribute] = sorted(colors.items(), key=lambda item: len(item[0]), reverse=True)
+
+        # Like recolor_svg, the colors used as a fill or stroke are replaced wherever they are in the attribute, longest first
+        for color, replacement in self._style_colors[attribute]:
+            if svg.startswith(color, start):
+                return replacement + match.group(0)[len(color):]
+        return match.group(0)
+
+    def recolor(self, svg: bytes) -> bytes:
+        self._style_blocks = [block.span() for block in _STYLE_BLOCK.finditer(svg)]
+        self._style_colors = {}
+        return self.pattern.sub(self._replace, svg)
+
+
+def get_color_map_hash(color_map: Mapping[str, str]) -> str:
+    return hashlib.sha1(json.dumps(sorted((original.lower(), replacement) for original, replacement in color_map.items())).encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _get_recolor(color_map_items: tuple) -> ColorMapRecolor:
+    # Compiled once per worker process
+    return ColorMapRecolor(dict(color_map_items))
+
+
+def _recolor_files(jobs: List[tuple], color_map_items: tuple) -> List[tuple]:
+    """(name, manifest entry, recolored) for every (name, source, output, previous manifest entry or None) job."""
+    recolor = _get_recolor(color_map_items)
+
+    results = []
+    for name, source, output, previous in jobs:
+        stat = os.stat(source)
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        recolored_before = previous is not None and os.path.exists(output)
+        if recolored_before and (previous["size"], previous["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            results.append((name, {**entry, "hash": previous["hash"]}, False))
+            continue
+
+        svg = Path(source).read_bytes()
+        entry["hash"] = hashlib.sha1(svg).hexdigest()
+        if recolored_before and entry["hash"] == previous["hash"]:
+            results.append((name, entry, False))
+            continue
+
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_bytes(recolor.recolor(svg))
+        results.append((name, entry, True))
+
+    return results
+
+
+@dataclass
+class RecolorReport:
+    """What recolor_directory did: names of the files relative to the source directory."""
+
+    recolored: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+
+def recolor_directory(
+    source_directory: Union[str, Path],
+    output_directory: Union[str, Path],
+    color_map: Mapping[str, str] = PASTEL_MAGICAL_GIRL_COLORS,
+    pattern: str = "*.svg",
+    workers: Union[int, None] = None,
+    incremental: bool = False,
+) -> RecolorReport:
+    """
+    Recolors every file of source_directory matching pattern (recursively) into
+    the same relative path in output_directory, which may not be the source
+    directory: in place, the next run couldn't tell sources from results.
+    """
+    source_directory, output_directory = Path(source_directory), Path(output_directory)
+    if source_directory.resolve() == output_directory.resolve():
+        raise ValueError("The output directory must not be the source directory")
+
+    color_map_items = tuple(color_map.items())
+    color_map_hash = get_color_map_hash(color_map)
+
+    # {"color_map": hash of the color map, "files": {name: {"size", "mtime_ns", "hash"}}}
+    manifest_path = output_directory / MANIFEST_NAME
+    files: Dict[str, dict] = {}
+    if incremental and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("color_map") == color_map_hash:
+            # Sources deleted since the last run are forgotten
+            files = {name: entry for name, entry in manifest["files"].items() if (source_directory / name).is_file()}
+
+    jobs = []
+    for source in sorted(source_directory.rglob(pattern)):
+        # The output directory may be inside the source directory
+        if not source.is_file() or output_directory.resolve() in source.resolve().parents:
+            continue
+        name = source.relative_to(source_directory).as_posix()
+        jobs.append((name, str(source), str(output_directory / name), files.get(name)))
+
+    if workers and workers > 1 and len(jobs) >= MIN_POOL_FILES:
+        chunks = split_into_chunks(jobs, workers * CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = [result for part in executor.map(_recolor_files, chunks, [color_map_items] * len(chunks)) for result in part]
+    else:
+        results = _recolor_files(jobs, color_map_items)
+
+    report = RecolorReport()
+    for name, entry, recolored in results:
+        files[name] = entry
+        (report.recolored if recolored else report.skipped).append(name)
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps({"color_map": color_map_hash, "files": files}, indent=2, sort_keys=True), encoding="utf-8")
+    return report
+
+
+def main(arguments: Union[List[str], None] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recolor a directory of SVG charts with a color map.")
+    parser.add_argument("source", help="directory of the charts to recolor, e.g. generated_charts")
+    parser.add_argument("output", help="directory the recolored charts are written to")
+    parser.add_argument("--color-map", help="JSON file of {original color: new color} (default: the pastel magical girl colors)")
+    parser.add_argument("--pattern", default="*.svg", help="files to recolor (default: *.svg)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--incremental", action="store_true", help="skip files whose source and color map are unchanged since the last run")
+    options = parser.parse_args(arguments)
+
+    color_map = PASTEL_MAGICAL_GIRL_COLORS
+    if options.color_map:
+        with open(options.color_map, "r", encoding="utf-8") as color_map_file:
+            color_map = json.load(color_map_file)
+
+    started = timeit.default_timer()
+    report = recolor_directory(options.source, options.output, color_map, options.pattern, options.workers, options.incremental)
+    print(f"{len(report.recolored)} recolored, {len(report.skipped)} unchanged in {timeit.default_timer() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Color maps applied at render time.
+
+AstroCharter used to render every chart with the default colors and then
+recolor the written file with change_svg_colors (an ElementTree pass over the
+whole SVG), keeping both files. A Palette compiles such a color map once into
+what the chart is drawn from instead: the theme CSS with its color variables
+swapped, and settings whose colors are swapped. PaletteChartSVG then emits the
+final colors directly, so a recolored chart costs the same as a default one.
+
+The few colors kerykeion draws with hard-coded values (the transit ring's
+degree steps) are in the cached static layer, which is recolored once per
+palette. The result is the same SVG recolor_svg makes of the default chart.
+"""
+import timeit
+from pathlib import Path
+from typing import Mapping, Union
+
+from kerykeion import AstrologicalSubject
+from kerykeion.kr_types import KerykeionSettingsModel
+from kerykeion.kr_types.kr_literals import KerykeionChartTheme
+
+from ChartRenderer import FastKerykeionChartSVG, recolor_css, recolor_svg
+from SettingsCache import get_settings, get_writable_copy
+
+
+# The static layer entries kerykeion draws, as opposed to the theme and the color variables
+DRAWN_STATIC_LAYERS = ("transitRing", "degreeRing", "first_circle", "second_circle", "third_circle", "makeZodiac")
+
+# The pastel magical girl color map of AstroCharter (and BulkRecolor's default)
+PASTEL_MAGICAL_GIRL_COLORS = {
+    # General Text and Background
+    "#000000": "#000000",  # Text → Black for sharp readability (used for all text)
+    "#ffffff": "#ffffff",  # White → White (background color)
+
+    # Wheel Colors
+    "#0000ff": "#7FBFFF",  # Blue → Brighter pastel blue (used for Air signs)
+    "#06537f": "#06537f",  # Dark teal → Dark teal (used for Water signs)
+    "#124500": "#124500",  # Dark green → Dark green (used for Earth signs)
+    "#150052": "#DB6EC0",  # Deep purple → Brighter pastel lavender (used for House lines)
+    "#160": "#DB6EC0",     # Dark olive → Brighter blush pink (used for Fire signs)
+    "#176": "#DB6EC0",     # Olive → Brighter blush pink (used for Fire signs)
+    "#1f99b3": "#DB6EC0",  # Teal → Brighter pastel aqua (used for Water signs)
+    "#26bbcf": "#8FD3FF",  # Cyan → Brighter pastel sky blue (used for Air signs)
+    "#2b4972": "#A7CFFF",  # Navy → Brighter pastel periwinkle (used for Water elements)
+
+    # Earth Element (Greens)
+    "#36d100": "#387038",  # Bright green → Forest green (used for Earth symbols)
+    "#666f06": "#387038",  # Olive green → Forest green (used for Earth-related signs)
+    "#6a2d04": "#387038",  # Reddish-brown → Forest green (used for Earth elements)
+    "#6b3d00": "#387038",  # Dark orange → Forest green (used for Earth signs)
+    "#713f04": "#387038",  # Deep orange → Forest green (used for Earth-related aspects)
+    "#7a9810": "#387038",  # Olive → Forest green (used for Earth signs)
+    "#984b00": "#387038",  # Orange-brown → Forest green (used for Earth aspects)
+    "#985a10": "#387038",  # Burnt orange → Forest green (used for Earth symbols)
+
+    # Air Element (Purples)
+    "#6f0766": "#A080FF",  # Dark magenta → Vibrant pastel purple (used for Air symbols)
+    "#6f76d1": "#A080FF",  # Blue-purple → Vibrant pastel purple (used for Air-related signs)
+    "#810757": "#A080FF",  # Deep magenta → Vibrant pastel purple (used for Air aspects)
+    "#510060": "#A080FF",  # Deep purple → Vibrant pastel purple (used for Air symbols)
+    "#5757e2": "#A080FF",  # Bright blue → Vibrant pastel purple (used for Air-related elements)
+    "#630e73": "#A080FF",  # Dark purple → Vibrant pastel purple (used for Air aspects)
+
+    # Fire Element (Reds)
+    "#F00": "#DB6EC0",     # Bright red → Darker Brick Red (used for Fire symbols)
+    "#FF0000": "#DB6EC0",  # Red → Brighter peachy pink (used for Fire-related elements)
+    "#ff7200": "#DB6EC0",  # Bright orange → Brighter coral pink (used for Fire signs)
+    "#ff7e00": "#DB6EC0",  # Deep orange → Brighter coral pink (used for Fire aspects)
+    "#ff6600": "#DB6EC0",  # Orange → Brighter coral pink (used for Fire symbols)
+
+    # Water Element (Blues)
+    "#8FD3FF": "#375B73",  # Cyan → Deep Ocean Blue (used for Water symbols)
+    "#2b4972": "#375B73",  # Navy → Deep Ocean Blue (used for Water-related signs)
+
+    # House Dividing Lines (Neutral Gray)
+    "#404040": "#000000",  # Pure Black for sharp contrast (used for house dividing lines)
+
+    # Miscellaneous (Signs, Points, Aspects)
+    "#b14e58": "#DB6EC0",  # Rosewood → Brighter salmon pink (used for Venus and similar aspects)
+    "#d59e28": "#d59e28",  # Gold → Brighter pastel coral (used for Sun-related aspects)
+    "#dc0000": "#DB6EC0",  # Bright red → Brighter peachy pink (used for Mars and similar aspects)
+    "#520800": "#DB6EC0",  # Brownish red → Brighter dusty rose (used for Saturn aspects)
+    "#400052": "#DB6EC0",  # Deep violet → Brighter pastel lavender (used for Neptune aspects)
+    "#47133d": "#DB6EC0",  # Wine → Brighter pastel coral (used for Pluto aspects)
+}
+
+
+class Palette:
+    """
+    A color map ({original color: new color}, colors matched ignoring case)
+    compiled for charts.
+
+        palette = Palette(PASTEL_MAGICAL_GIRL_COLORS)
+        chart = PaletteChartSVG(subject, palette=palette)
+    """
+
+    def __init__(self, color_map: Mapping[str, str]) -> None:
+        self.color_map = {original.lower(): replacement for original, replacement in color_map.items()}
+        self.key = tuple(sorted(self.color_map.items()))
+        self._theme_css = {}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Palette) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def get_color(self, color: str) -> str:
+        """The color that replaces color, or color itself (CSS variables stay, their values are swapped in the theme)."""
+        return self.color_map.get(color.lower(), color)
+
+    def get_theme_css(self, css: str) -> str:
+        """A theme's CSS with the color variables swapped, compiled once per theme."""
+        if css not in self._theme_css:
+            self._theme_css[css] = recolor_css(css, self.color_map)
+        return self._theme_css[css]
+
+    def get_settings(self, settings: KerykeionSettingsModel) -> KerykeionSettingsModel:
+        """A copy of settings with the chart, point and aspect colors swapped."""
+        chart_colors = settings.chart_colors
+        return settings.model_copy(update={
+            "chart_colors": chart_colors.model_copy(update={name: self.get_color(color) for name, color in chart_colors.__dict__.items()}),
+            # Points of the chart's own: it marks the active ones
+            "celestial_points": [get_writable_copy(point, color=self.get_color(point.color)) for point in settings.celestial_points],
+            "aspects": [aspect.model_copy(update={"color": self.get_color(aspect.color)}) for aspect in settings.aspects],
+        })
+
+    def recolor(self, svg: str) -> str:
+        """recolor_svg with this palette's colors."""
+        return recolor_svg(svg, self.color_map)
+
+
+class PaletteChartSVG(FastKerykeionChartSVG):
+    """
+    FastKerykeionChartSVG drawn with a Palette's colors: same arguments, plus the
+    keyword-only palette.
+    """
+
+    def __init__(self, *args, palette: Palette, **kwargs) -> None:
+        self.palette = palette
+        super().__init__(*args, **kwargs)
+
+    def parse_json_settings(self, settings_file_or_dict: Union[Path, dict, KerykeionSettingsModel, None]) -> None:
+        settings = self.palette.get_settings(get_settings(settings_file_or_dict))
+
+        self.language_settings = settings["language_settings"][self.chart_language]
+        self.chart_colors_settings = settings["chart_colors"]
+        self.planets_settings = settings["celestial_points"]
+        self.aspects_settings = settings["aspects"]
+
+    def set_up_theme(self, theme: Union[KerykeionChartTheme, None] = None) -> None:
+        super().set_up_theme(theme)
+        self.color_style_tag = self.palette.get_theme_css(self.color_style_tag)
+
+    def _get_static_layer_key(self) -> tuple:
+        return super()._get_static_layer_key() + (self.palette,)
+
+    def _create_static_layer(self) -> dict:
+        template_dict = super()._create_static_layer()
+        for name in DRAWN_STATIC_LAYERS:
+            template_dict[name] = self.palette.recolor(template_dict[name])
+        return template_dict
+
+
+if __name__ == "__main__":
+    from kerykeion.utilities import setup_logging
+
+    setup_logging(level="critical")
+
+    john = AstrologicalSubject("John", 1940, 10, 9, 18, 30, "Liverpool", "GB", lng=-2.98, lat=53.41, tz_str="Europe/London", online=False)
+    yoko = AstrologicalSubject("Yoko", 1933, 2, 18, 20, 30, "Tokyo", "JP", lng=139.69, lat=35.69, tz_str="Asia/Tokyo", online=False)
+    inverted = Palette({"#000000": "#ffffff", "#ffffff": "#000000", "#F00": "#00f"})
+
+    for chart_type, second in (("Natal", None), ("Synastry", yoko), ("Transit", yoko)):
+        assert PaletteChartSVG(john, chart_type, second, palette=inverted).makeTemplate() == inverted.recolor(FastKerykeionChartSVG(john, chart_type, second).makeTemplate())
+
+    default_ms = timeit.timeit(lambda: FastKerykeionChartSVG(john, "Transit", yoko).makeTemplate(), number=20) / 20 * 1000
+    recolored_ms = timeit.timeit(lambda: inverted.recolor(FastKerykeionChartSVG(john, "Transit", yoko).makeTemplate()), number=20) / 20 * 1000
+    palette_ms = timeit.timeit(lambda: PaletteChartSVG(john, "Transit", yoko, palette=inverted).makeTemplate(), number=20) / 20 * 1000
+    print(f"Transit chart: default {default_ms:.2f} ms, recolored after rendering {recolored_ms:.2f} ms, with the palette {palette_ms:.2f} ms")
@@ -0,0 +1,636 @@
+"""
+Faster KerykeionChartSVG rendering.
+
+makeTemplate, makeWheelOnlyTemplate and makeAspectGridOnlyTemplate open their
+XML template (chart.xml is ~70 KB) and parse it into a new string.Template on
+every chart, and set_up_theme reads the theme CSS again for every chart. Here
+each template is read once per process and split into its literal segments
+and the placeholders between them (CompiledTemplate), so rendering is a single
+join of the segments with the chart's values. Themes are read once as well.
+
+Much of a chart doesn't depend on the planets either: the rings, circles,
+zodiac slices and color variables only change with the theme, the settings'
+colors and the rotation of the wheel (the first subject's Descendant). That
+static layer is cached by those inputs, and only the houses, planets, aspects,
+grids and texts are drawn for every chart. Transits of one natal subject share
+its static layer, whatever their dates.
+
+FastKerykeionChartSVG is a drop-in subclass: same arguments, byte-identical
+SVG output. Its two layers are upstream's _create_template_dictionary split in
+two, copied from kerykeion KERYKEION_VERSION: on any other version it warns
+and builds the dictionary with upstream's method.
+
+ChartRender keeps what a chart renders in memory: post-processing stages like
+recolor_svg and minify_svg turn it into variants without going through files,
+and writing any of them to disk is an optional last step.
+"""
+import logging
+import re
+import timeit
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from importlib.metadata import version
+from pathlib import Path
+from string import Template
+from typing import Callable, Dict, List, Mapping, Sequence, Union
+
+import kerykeion.charts.kerykeion_chart_svg
+import swisseph as swe
+from kerykeion import AstrologicalSubject, KerykeionChartSVG
+from kerykeion.charts.charts_utils import (
+    calculate_moon_phase_chart_params,
+    convert_latitude_coordinate_to_string,
+    convert_longitude_coordinate_to_string,
+    draw_aspect_grid,
+    draw_degree_ring,
+    draw_first_circle,
+    draw_house_grid,
+    draw_houses_cusps_and_text_number,
+    draw_planet_grid,
+    draw_second_circle,
+    draw_third_circle,
+    draw_transit_aspect_grid,
+    draw_transit_aspect_list,
+    draw_transit_ring,
+    draw_transit_ring_degree_steps,
+)
+from kerykeion.charts.draw_planets import draw_planets
+from kerykeion.kr_types import ChartTemplateDictionary
+from kerykeion.kr_types.kr_literals import KerykeionChartTheme
+from kerykeion.utilities import get_houses_list, inline_css_variables_in_svg
+from scour.scour import scourString
+
+
+# The kerykeion release _create_static_layer and _create_chart_layer were copied
+# from (KerykeionChartSVG._create_template_dictionary); pinned in requirements.txt
+KERYKEION_VERSION = "4.26.3"
+INSTALLED_KERYKEION_VERSION = version("kerykeion")
+if INSTALLED_KERYKEION_VERSION != KERYKEION_VERSION:
+    logging.warning(
+        f"FastKerykeionChartSVG was written for kerykeion {KERYKEION_VERSION}, not {INSTALLED_KERYKEION_VERSION}: "
+        "it builds its charts with KerykeionChartSVG._create_template_dictionary, without the static layer cache."
+    )
+
+CHARTS_DIR = Path(kerykeion.charts.kerykeion_chart_svg.__file__).parent
+TEMPLATES_DIR = CHARTS_DIR / "templates"
+THEMES_DIR = CHARTS_DIR / "themes"
+
+# What recolor_svg looks at, the same places change_svg_colors does
+_STYLE_BLOCK = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.DOTALL)
+_CSS_VARIABLE = re.compile(r"(--[\w-]+): (#[0-9a-fA-F]{3,6});")
+_COLOR_ATTRIBUTE = re.compile(r"(\s(?:fill|stroke)=)(['\"])([^'\"]*)\2")
+_STYLE_ATTRIBUTE = re.compile(r"(\sstyle=)(['\"])([^'\"]*)\2")
+_STYLE_COLOR = re.compile(r"(?:fill|stroke):\s*(#[0-9a-fA-F]{3,6})")
+
+# Static layers kept, most recently used last
+STATIC_LAYERS_CACHE_SIZE = 64
+_static_layers: "OrderedDict[tuple, dict]" = OrderedDict()
+
+
+class CompiledTemplate:
+    """
+    A string.Template split once into literal segments and placeholder slots:
+    literals[0], slots[0], literals[1], ..., slots[-1], literals[-1].
+
+    render(mapping) gives the same string as Template(text).substitute(mapping),
+    KeyError on a missing placeholder included.
+    """
+
+    __slots__ = ("literals", "slots")
+
+    def __init__(self, text: str) -> None:
+        literals, slots = [], []
+        literal, start = "", 0
+        for match in Template.pattern.finditer(text):
+            literal += text[start:match.start()]
+            start = match.end()
+
+            if match.group("escaped") is not None:
+                literal += Template.delimiter
+                continue
+
+            name = match.group("named") or match.group("braced")
+            if name is None:
+                # Same error Template.substitute raises
+                Template(text).substitute({})
+
+            literals.append(literal)
+            slots.append(name)
+            literal = ""
+
+        literals.append(literal + text[start:])
+        self.literals = tuple(literals)
+        self.slots = tuple(slots)
+
+    def render(self, mapping: Mapping) -> str:
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(str(mapping[slot]))
+            parts.append(literal)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=None)
+def get_template(template_name: str) -> CompiledTemplate:
+    """One of kerykeion's chart templates ("chart.xml", "wheel_only.xml", "aspect_grid_only.xml"), compiled once."""
+    with open(TEMPLATES_DIR / template_name, "r", encoding="utf-8", errors="ignore") as f:
+        return CompiledTemplate(f.read())
+
+
+@lru_cache(maxsize=None)
+def get_theme_css(theme: KerykeionChartTheme) -> str:
+    """The CSS of one of kerykeion's chart themes, read once."""
+    with open(THEMES_DIR / f"{theme}.css", "r") as f:
+        return f.read()
+
+
+def finish_template(template: str, minify: bool = False, remove_css_variables: bool = False) -> str:
+    """The post-processing the make*Template methods do after substituting."""
+    if remove_css_variables:
+        template = inline_css_variables_in_svg(template)
+
+    if minify:
+        return minify_svg(template)
+
+    return template.replace('"', "'")
+
+
+def minify_svg(svg: str) -> str:
+    """The minify=True post-processing of the make*Template methods, as a stage of its own."""
+    return scourString(svg).replace('"', "'").replace("\n", "").replace("\t", "").replace("    ", "").replace("  ", "")
+
+
+@lru_cache(maxsize=32)
+def _get_color_lookup(color_map_items: tuple) -> dict:
+    return {original.lower(): replacement for original, replacement in color_map_items}
+
+
+def recolor_css(css: str, color_map: Mapping[str, str]) -> str:
+    """The colors of color_map swapped in the CSS variables of a style sheet, like change_svg_colors does in style blocks."""
+    lookup = _get_color_lookup(tuple(color_map.items()))
+
+    def recolor_css_variable(match):
+        color = lookup.get(match.group(2).lower())
+        return match.group(0) if color is None else f"{match.group(1)}: {color};"
+
+    return _CSS_VARIABLE.sub(recolor_css_variable, css)
+
+
+def recolor_svg(svg: str, color_map: Mapping[str, str]) -> str:
+    """
+    The colors of color_map swapped in an SVG string, like the
+    change_svg_colors AstroCharter used to run over its files: CSS variables
+    in style blocks, fill and stroke attributes, and fill and stroke colors in
+    style attributes. Color names are matched ignoring case.
+    """
+    lookup = _get_color_lookup(tuple(color_map.items()))
+
+    def recolor_style_block(match):
+        return match.group(1) + recolor_css(match.group(2), color_map) + match.group(3)
+
+    def recolor_attribute(match):
+        color = lookup.get(match.group(3).lower())
+        return match.group(0) if color is None else f"{match.group(1)}{match.group(2)}{color}{match.group(2)}"
+
+    def recolor_style_attribute(match):
+        style = match.group(3)
+        colors = {color: lookup[color.lower()] for color in _STYLE_COLOR.findall(style) if color.lower() in lookup}
+        if colors:
+            style = re.sub("|".join(map(re.escape, sorted(colors, key=len, reverse=True))), lambda found: colors[found.group(0)], style)
+        return f"{match.group(1)}{match.group(2)}{style}{match.group(2)}"
+
+    svg = _STYLE_BLOCK.sub(recolor_style_block, svg)
+    svg = _COLOR_ATTRIBUTE.sub(recolor_attribute, svg)
+    return _STYLE_ATTRIBUTE.sub(recolor_style_attribute, svg)
+
+
+class FastKerykeionChartSVG(KerykeionChartSVG):
+    """KerykeionChartSVG with compiled templates and themes and a cached static layer, same arguments and output."""
+
+    def set_up_theme(self, theme: Union[KerykeionChartTheme, None] = None) -> None:
+        self.color_style_tag = "" if theme is None else get_theme_css(theme)
+
+    def _get_static_layer_key(self) -> tuple:
+        """Everything the static layer depends on: chart type and size, theme, colors and the Descendant's rotation."""
+        return (
+            self.chart_type,
+            self.double_chart_aspect_grid_type,
+            self.height,
+            self.width,
+            self.main_radius,
+            self.first_circle_radius,
+            self.second_circle_radius,
+            self.third_circle_radius,
+            self.user.seventh_house.abs_pos,
+            self.color_style_tag,
+            tuple(self.chart_colors_settings.__dict__.items()),
+            tuple((planet["id"], planet["color"]) for planet in self.planets_settings),
+            tuple((aspect["degree"], aspect["color"]) for aspect in self.aspects_settings),
+        )
+
+    def _create_static_layer(self) -> dict:
+        """
+        The template variables that don't depend on the planets: theme, size, rings, circles, zodiac and colors.
+        Copied from kerykeion KERYKEION_VERSION, like _create_chart_layer.
+        """
+        template_dict: dict = {}
+
+        template_dict["color_style_tag"] = self.color_style_tag
+        template_dict["chart_height"] = self.height
+        template_dict["chart_width"] = self.width
+
+        if self.chart_type in ["Natal", "ExternalNatal", "Composite"]:
+            template_dict["viewbox"] = self._BASIC_CHART_VIEWBOX
+        elif self.double_chart_aspect_grid_type == "table" and self.chart_type == "Transit":
+            template_dict["viewbox"] = self._TRANSIT_CHART_WITH_TABLE_VIWBOX
+        else:
+            template_dict["viewbox"] = self._WIDE_CHART_VIEWBOX
+
+        if self.chart_type in ["Transit", "Synastry"]:
+            template_dict["transitRing"] = draw_transit_ring(self.main_radius, self.chart_colors_settings["paper_1"], self.chart_colors_settings["zodiac_transit_ring_3"])
+            template_dict["degreeRing"] = draw_transit_ring_degree_steps(self.main_radius, self.user.seventh_house.abs_pos)
+            template_dict["first_circle"] = draw_first_circle(self.main_radius, self.chart_colors_settings["zodiac_transit_ring_2"], self.chart_type)
+            template_dict["second_circle"] = draw_second_circle(self.main_radius, self.chart_colors_settings["zodiac_transit_ring_1"], self.chart_colors_settings["paper_1"], self.chart_type)
+            template_dict["third_circle"] = draw_third_circle(self.main_radius, self.chart_colors_settings["zodiac_transit_ring_0"], self.chart_colors_settings["paper_1"], self.chart_type, self.third_circle_radius)
+        else:
+            template_dict["transitRing"] = ""
+            template_dict["degreeRing"] = draw_degree_ring(self.main_radius, self.first_circle_radius, self.user.seventh_house.abs_pos, self.chart_colors_settings["paper_0"])
+            template_dict["first_circle"] = draw_first_circle(self.main_radius, self.chart_colors_settings["zodiac_radix_ring_2"], self.chart_type, self.first_circle_radius)
+            template_dict["second_circle"] = draw_second_circle(self.main_radius, self.chart_colors_settings["zodiac_radix_ring_1"], self.chart_colors_settings["paper_1"], self.chart_type, self.second_circle_radius)
+            template_dict["third_circle"] = draw_third_circle(self.main_radius, self.chart_colors_settings["zodiac_radix_ring_0"], self.chart_colors_settings["paper_1"], self.chart_type, self.third_circle_radius)
+
+        template_dict["paper_color_0"] = self.chart_colors_settings["paper_0"]
+        template_dict["paper_color_1"] = self.chart_colors_settings["paper_1"]
+        for planet in self.planets_settings:
+            template_dict[f"planets_color_{planet['id']}"] = planet["color"]
+        for i in range(12):
+            template_dict[f"zodiac_color_{i}"] = self.chart_colors_settings[f"zodiac_icon_{i}"]
+        for aspect in self.aspects_settings:
+            template_dict[f"orb_color_{aspect['degree']}"] = aspect["color"]
+
+        template_dict["makeZodiac"] = self._draw_zodiac_circle_slices(self.main_radius)
+
+        return template_dict
+
+    def _get_static_layer(self) -> dict:
+        """The static layer from the render cache, built on first use."""
+        key = self._get_static_layer_key()
+        layer = _static_layers.get(key)
+        if layer is not None:
+            _static_layers.move_to_end(key)
+            return layer
+
+        layer = self._create_static_layer()
+        _static_layers[key] = layer
+        if len(_static_layers) > STATIC_LAYERS_CACHE_SIZE:
+            _static_layers.popitem(last=False)
+        return layer
+
+    def _create_chart_layer(self) -> dict:
+        """
+        The template variables of this chart's subjects: aspects, grids, houses, planets and texts.
+        Copied from kerykeion KERYKEION_VERSION: compare with upstream's _create_template_dictionary before changing the pin.
+        """
+        template_dict: dict = {}
+
+        if self.chart_type in ["Transit", "Synastry"]:
+            if self.double_chart_aspect_grid_type == "list":
+                if self.chart_type == "Synastry":
+                    title = self.language_settings.get("couple_aspects", "Couple Aspects")
+                else:
+                    title = self.language_settings.get("transit_aspects", "Transit Aspects")
+
+                template_dict["makeAspectGrid"] = draw_transit_aspect_list(title, self.aspects_list, self.planets_settings, self.aspects_settings)
+            else:
+                template_dict["makeAspectGrid"] = draw_transit_aspect_grid(self.chart_colors_settings['paper_0'], self.available_planets_setting, self.aspects_list, 550, 450)
+
+            template_dict["makeAspects"] = self._draw_all_transit_aspects_lines(self.main_radius, self.main_radius - 160)
+        else:
+            template_dict["makeAspectGrid"] = draw_aspect_grid(self.chart_colors_settings['paper_0'], self.available_planets_setting, self.aspects_list)
+
+            template_dict["makeAspects"] = self._draw_all_aspects_lines(self.main_radius, self.main_radius - self.third_circle_radius)
+
+        # Set chart title
+        if self.chart_type == "Synastry":
+            template_dict["stringTitle"] = f"{self.user.name} {self.language_settings['and_word']} {self.t_user.name}"
+        elif self.chart_type == "Transit":
+            template_dict["stringTitle"] = f"{self.language_settings['transits']} {self.t_user.day}/{self.t_user.month}/{self.t_user.year}"
+        elif self.chart_type in ["Natal", "ExternalNatal"]:
+            template_dict["stringTitle"] = self.user.name
+        elif self.chart_type == "Composite":
+            template_dict["stringTitle"] = f"{self.user.first_subject.name} {self.language_settings['and_word']} {self.user.second_subject.name}"
+
+        # Zodiac Type Info
+        if self.user.zodiac_type == 'Tropic':
+            zodiac_info = f"{self.language_settings.get('zodiac', 'Zodiac')}: {self.language_settings.get('tropical', 'Tropical')}"
+        else:
+            mode_const = "SIDM_" + self.user.sidereal_mode # type: ignore
+            mode_name = swe.get_ayanamsa_name(getattr(swe, mode_const))
+            zodiac_info = f"{self.language_settings.get('ayanamsa', 'Ayanamsa')}: {mode_name}"
+
+        template_dict["bottom_left_0"] = f"{self.language_settings.get('houses_system_' + self.user.houses_system_identifier, self.user.houses_system_name)} {self.language_settings.get('houses', 'Houses')}"
+        template_dict["bottom_left_1"] = zodiac_info
+
+        if self.chart_type in ["Natal", "ExternalNatal", "Synastry"]:
+            template_dict["bottom_left_2"] = f'{self.language_settings.get("lunar_phase", "Lunar Phase")} {self.language_settings.get("day", "Day").lower()}: {self.user.lunar_phase.get("moon_phase", "")}'
+            template_dict["bottom_left_3"] = f'{self.language_settings.get("lunar_phase", "Lunar Phase")}: {self.language_settings.get(self.user.lunar_phase.moon_phase_name.lower().replace(" ", "_"), self.user.lunar_phase.moon_phase_name)}'
+            template_dict["bottom_left_4"] = f'{self.language_settings.get(self.user.perspective_type.lower().replace(" ", "_"), self.user.perspective_type)}'
+        elif self.chart_type == "Transit":
+            template_dict["bottom_left_2"] = f'{self.language_settings.get("lunar_phase", "Lunar Phase")}: {self.language_settings.get("day", "Day")} {self.t_user.lunar_phase.get("moon_phase", "")}'
+            template_dict["bottom_left_3"] = f'{self.language_settings.get("lunar_phase", "Lunar Phase")}: {self.t_user.lunar_phase.moon_phase_name}'
+            template_dict["bottom_left_4"] = f'{self.language_settings.get(self.t_user.perspective_type.lower().replace(" ", "_"), self.t_user.perspective_type)}'
+        elif self.chart_type == "Composite":
+            template_dict["bottom_left_2"] = f'{self.user.first_subject.perspective_type}'
+            template_dict["bottom_left_3"] = f'{self.language_settings.get("composite_chart", "Composite Chart")} - {self.language_settings.get("midpoints", "Midpoints")}'
+            template_dict["bottom_left_4"] = ""
+
+        # Draw moon phase
+        moon_phase_dict = calculate_moon_phase_chart_params(
+            self.user.lunar_phase["degrees_between_s_m"],
+            self.geolat
+        )
+
+        template_dict["lunar_phase_rotate"] = moon_phase_dict["lunar_phase_rotate"]
+        template_dict["lunar_phase_circle_center_x"] = moon_phase_dict["circle_center_x"]
+        template_dict["lunar_phase_circle_radius"] = moon_phase_dict["circle_radius"]
+
+        if self.chart_type == "Composite":
+            template_dict["top_left_1"] = f"{datetime.fromisoformat(self.user.first_subject.iso_formatted_local_datetime).strftime('%Y-%m-%d %H:%M')}"
+        # Set location string
+        elif len(self.location) > 35:
+            split_location = self.location.split(",")
+            if len(split_location) > 1:
+                template_dict["top_left_1"] = split_location[0] + ", " + split_location[-1]
+                if len(template_dict["top_left_1"]) > 35:
+                    template_dict["top_left_1"] = template_dict["top_left_1"][:35] + "..."
+            else:
+                template_dict["top_left_1"] = self.location[:35] + "..."
+        else:
+            template_dict["top_left_1"] = self.location
+
+        # Set chart name
+        if self.chart_type in ["Synastry", "Transit"]:
+            template_dict["top_left_0"] = f"{self.user.name}:"
+        elif self.chart_type in ["Natal", "ExternalNatal"]:
+            template_dict["top_left_0"] = f'{self.language_settings["info"]}:'
+        elif self.chart_type == "Composite":
+            template_dict["top_left_0"] = f'{self.user.first_subject.name}'
+
+        # Set additional information for Synastry chart type
+        if self.chart_type == "Synastry":
+            template_dict["top_left_3"] = f"{self.t_user.name}: "
+            template_dict["top_left_4"] = self.t_user.city
+            template_dict["top_left_5"] = f"{self.t_user.year}-{self.t_user.month}-{self.t_user.day} {self.t_user.hour:02d}:{self.t_user.minute:02d}"
+        elif self.chart_type == "Composite":
+            template_dict["top_left_3"] = self.user.second_subject.name
+            template_dict["top_left_4"] = f"{datetime.fromisoformat(self.user.second_subject.iso_formatted_local_datetime).strftime('%Y-%m-%d %H:%M')}"
+            latitude_string = convert_latitude_coordinate_to_string(self.user.second_subject.lat, self.language_settings['north_letter'], self.language_settings['south_letter'])
+            longitude_string = convert_longitude_coordinate_to_string(self.user.second_subject.lng, self.language_settings['east_letter'], self.language_settings['west_letter'])
+            template_dict["top_left_5"] = f"{latitude_string} / {longitude_string}"
+        else:
+            latitude_string = convert_latitude_coordinate_to_string(self.geolat, self.language_settings['north'], self.language_settings['south'])
+            longitude_string = convert_longitude_coordinate_to_string(self.geolon, self.language_settings['east'], self.language_settings['west'])
+            template_dict["top_left_3"] = f"{self.language_settings['latitude']}: {latitude_string}"
+            template_dict["top_left_4"] = f"{self.language_settings['longitude']}: {longitude_string}"
+            template_dict["top_left_5"] = f"{self.language_settings['type']}: {self.language_settings.get(self.chart_type, self.chart_type)}"
+
+        first_subject_houses_list = get_houses_list(self.user)
+
+        # Draw houses grid and cusps
+        if self.chart_type in ["Transit", "Synastry"]:
+            second_subject_houses_list = get_houses_list(self.t_user)
+
+            template_dict["makeHousesGrid"] = draw_house_grid(
+                main_subject_houses_list=first_subject_houses_list,
+                secondary_subject_houses_list=second_subject_houses_list,
+                chart_type=self.chart_type,
+                text_color=self.chart_colors_settings["paper_0"],
+                house_cusp_generale_name_label=self.language_settings["cusp"]
+            )
+
+            template_dict["makeHouses"] = draw_houses_cusps_and_text_number(
+                r=self.main_radius,
+                first_subject_houses_list=first_subject_houses_list,
+                standard_house_cusp_color=self.chart_colors_settings["houses_radix_line"],
+                first_house_color=self.planets_settings[12]["color"],
+                tenth_house_color=self.planets_settings[13]["color"],
+                seventh_house_color=self.planets_settings[14]["color"],
+                fourth_house_color=self.planets_settings[15]["color"],
+                c1=self.first_circle_radius,
+                c3=self.third_circle_radius,
+                chart_type=self.chart_type,
+                second_subject_houses_list=second_subject_houses_list,
+                transit_house_cusp_color=self.chart_colors_settings["houses_transit_line"],
+            )
+
+        else:
+            template_dict["makeHousesGrid"] = draw_house_grid(
+                main_subject_houses_list=first_subject_houses_list,
+                chart_type=self.chart_type,
+                text_color=self.chart_colors_settings["paper_0"],
+                house_cusp_generale_name_label=self.language_settings["cusp"]
+            )
+
+            template_dict["makeHouses"] = draw_houses_cusps_and_text_number(
+                r=self.main_radius,
+                first_subject_houses_list=first_subject_houses_list,
+                standard_house_cusp_color=self.chart_colors_settings["houses_radix_line"],
+                first_house_color=self.planets_settings[12]["color"],
+                tenth_house_color=self.planets_settings[13]["color"],
+                seventh_house_color=self.planets_settings[14]["color"],
+                fourth_house_color=self.planets_settings[15]["color"],
+                c1=self.first_circle_radius,
+                c3=self.third_circle_radius,
+                chart_type=self.chart_type,
+            )
+
+        # Draw planets
+        if self.chart_type in ["Transit", "Synastry"]:
+            template_dict["makePlanets"] = draw_planets(
+                available_kerykeion_celestial_points=self.available_kerykeion_celestial_points,
+                available_planets_setting=self.available_planets_setting,
+                second_subject_available_kerykeion_celestial_points=self.t_available_kerykeion_celestial_points,
+                radius=self.main_radius,
+                main_subject_first_house_degree_ut=self.user.first_house.abs_pos,
+                main_subject_seventh_house_degree_ut=self.user.seventh_house.abs_pos,
+                chart_type=self.chart_type,
+                third_circle_radius=self.third_circle_radius,
+            )
+        else:
+            template_dict["makePlanets"] = draw_planets(
+                available_planets_setting=self.available_planets_setting,
+                chart_type=self.chart_type,
+                radius=self.main_radius,
+                available_kerykeion_celestial_points=self.available_kerykeion_celestial_points,
+                third_circle_radius=self.third_circle_radius,
+                main_subject_first_house_degree_ut=self.user.first_house.abs_pos,
+                main_subject_seventh_house_degree_ut=self.user.seventh_house.abs_pos
+            )
+
+        # Draw elements percentages
+        total = self.fire + self.water + self.earth + self.air
+
+        fire_percentage = int(round(100 * self.fire / total))
+        earth_percentage = int(round(100 * self.earth / total))
+        air_percentage = int(round(100 * self.air / total))
+        water_percentage = int(round(100 * self.water / total))
+
+        template_dict["fire_string"] = f"{self.language_settings['fire']} {fire_percentage}%"
+        template_dict["earth_string"] = f"{self.language_settings['earth']} {earth_percentage}%"
+        template_dict["air_string"] = f"{self.language_settings['air']} {air_percentage}%"
+        template_dict["water_string"] = f"{self.language_settings['water']} {water_percentage}%"
+
+        # Draw planet grid
+        if self.chart_type in ["Transit", "Synastry"]:
+            if self.chart_type == "Transit":
+                second_subject_table_name = self.language_settings["transit_name"]
+            else:
+                second_subject_table_name = self.t_user.name
+
+            template_dict["makePlanetGrid"] = draw_planet_grid(
+                planets_and_houses_grid_title=self.language_settings["planets_and_house"],
+                subject_name=self.user.name,
+                available_kerykeion_celestial_points=self.available_kerykeion_celestial_points,
+                chart_type=self.chart_type,
+                text_color=self.chart_colors_settings["paper_0"],
+                celestial_point_language=self.language_settings["celestial_points"],
+                second_subject_name=second_subject_table_name,
+                second_subject_available_kerykeion_celestial_points=self.t_available_kerykeion_celestial_points,
+            )
+        else:
+            if self.chart_type == "Composite":
+                subject_name = f"{self.user.first_subject.name} {self.language_settings['and_word']} {self.user.second_subject.name}"
+            else:
+                subject_name = self.user.name
+
+            template_dict["makePlanetGrid"] = draw_planet_grid(
+                planets_and_houses_grid_title=self.language_settings["planets_and_house"],
+                subject_name=subject_name,
+                available_kerykeion_celestial_points=self.available_kerykeion_celestial_points,
+                chart_type=self.chart_type,
+                text_color=self.chart_colors_settings["paper_0"],
+                celestial_point_language=self.language_settings["celestial_points"],
+            )
+
+        # Set date time string
+        if self.chart_type in ["Composite"]:
+            # First Subject Latitude and Longitude
+            latitude = convert_latitude_coordinate_to_string(self.user.first_subject.lat, self.language_settings["north_letter"], self.language_settings["south_letter"])
+            longitude = convert_longitude_coordinate_to_string(self.user.first_subject.lng, self.language_settings["east_letter"], self.language_settings["west_letter"])
+            template_dict["top_left_2"] = f"{latitude} {longitude}"
+        else:
+            dt = datetime.fromisoformat(self.user.iso_formatted_local_datetime)
+            custom_format = dt.strftime('%Y-%m-%d %H:%M [%z]')
+            custom_format = custom_format[:-3] + ':' + custom_format[-3:]
+            template_dict["top_left_2"] = f"{custom_format}"
+
+
+        return template_dict
+
+    def _create_template_dictionary(self) -> ChartTemplateDictionary:
+        """Same dictionary as upstream's, from the cached static layer and this chart's layer."""
+        if INSTALLED_KERYKEION_VERSION != KERYKEION_VERSION:
+            return super()._create_template_dictionary()
+        return ChartTemplateDictionary(**self._get_static_layer(), **self._create_chart_layer())
+
+    def makeTemplate(self, minify: bool = False, remove_css_variables=False) -> str:
+        # Upstream builds the template dictionary a second time here and throws it away
+        template = get_template("chart.xml").render(self._create_template_dictionary())
+        return finish_template(template, minify, remove_css_variables)
+
+    def makeWheelOnlyTemplate(self, minify: bool = False, remove_css_variables=False) -> str:
+        template = get_template("wheel_only.xml").render(self._create_template_dictionary())
+        return finish_template(template, minify, remove_css_variables)
+
+    def makeAspectGridOnlyTemplate(self, minify: bool = False, remove_css_variables=False) -> str:
+        template_dict = self._create_template_dictionary()
+
+        if self.chart_type in ["Transit", "Synastry"]:
+            aspects_grid = draw_transit_aspect_grid(self.chart_colors_settings["paper_0"], self.available_planets_setting, self.aspects_list)
+        else:
+            aspects_grid = draw_aspect_grid(self.chart_colors_settings["paper_0"], self.available_planets_setting, self.aspects_list, x_start=50, y_start=250)
+
+        template = get_template("aspect_grid_only.xml").render({**template_dict, "makeAspectGrid": aspects_grid})
+        return finish_template(template, minify, remove_css_variables)
+
+
+class ChartRender:
+    """
+    A chart rendered once to memory, and the variants derived from it in memory.
+
+        render = ChartRender(FastKerykeionChartSVG(subject))
+        render.add_variant("Pastel", lambda svg: recolor_svg(svg, color_map))
+        render.add_variant("Pastel Minified", minify_svg, source="Pastel")
+        svg_bytes = render.to_bytes("Pastel")
+        render.save_all(variants=["Pastel"])
+
+    Nothing touches the disk until save or save_all, and then only the variants
+    asked for. The chart as rendered is the DEFAULT variant.
+    """
+
+    DEFAULT = ""
+
+    def __init__(self, chart: KerykeionChartSVG, minify: bool = False, remove_css_variables: bool = False) -> None:
+        self.chart = chart
+        self.variants: Dict[str, str] = {self.DEFAULT: chart.makeTemplate(minify, remove_css_variables)}
+
+    @property
+    def svg(self) -> str:
+        return self.variants[self.DEFAULT]
+
+    def add_variant(self, variant: str, *stages: Callable[[str], str], source: str = DEFAULT) -> str:
+        """Runs the source variant through the stages, in order, and keeps the result as variant."""
+        svg = self.variants[source]
+        for stage in stages:
+            svg = stage(svg)
+
+        self.variants[variant] = svg
+        return svg
+
+    def to_bytes(self, variant: str = DEFAULT) -> bytes:
+        return self.variants[variant].encode("utf-8", errors="ignore")
+
+    def get_file_name(self, variant: str = DEFAULT) -> str:
+        """makeSVG's file name, with the variant in brackets: "John - Natal Chart (Pastel).svg"."""
+        suffix = f" ({variant})" if variant else ""
+        return f"{self.chart.user.name} - {self.chart.chart_type} Chart{suffix}.svg"
+
+    def save(self, variant: str = DEFAULT, path: Union[str, Path, None] = None) -> Path:
+        """Writes one variant, by default as get_file_name in the chart's output directory."""
+        path = Path(path) if path is not None else self.chart.output_directory / self.get_file_name(variant)
+        with open(path, "w", encoding="utf-8", errors="ignore") as output_file:
+            output_file.write(self.variants[variant])
+        return path
+
+    def save_all(self, output_directory: Union[str, Path, None] = None, variants: Union[Sequence[str], None] = None) -> List[Path]:
+        """Writes the given variants (all of them by default) to output_directory, or the chart's."""
+        output_directory = Path(output_directory) if output_directory is not None else self.chart.output_directory
+        return [self.save(variant, output_directory / self.get_file_name(variant)) for variant in (self.variants if variants is None else variants)]
+
+
+if __name__ == "__main__":
+    from kerykeion.utilities import setup_logging
+
+    setup_logging(level="critical")
+
+    john = AstrologicalSubject("John", 1940, 10, 9, 18, 30, "Liverpool", "GB", lng=-2.98, lat=53.41, tz_str="Europe/London", online=False)
+    yoko = AstrologicalSubject("Yoko", 1933, 2, 18, 20, 30, "Tokyo", "JP", lng=139.69, lat=35.69, tz_str="Asia/Tokyo", online=False)
+
+    for chart_type, second in (("Natal", None), ("Synastry", yoko), ("Transit", yoko)):
+        assert FastKerykeionChartSVG(john, chart_type, second).makeTemplate() == KerykeionChartSVG(john, chart_type, second).makeTemplate()
+
+    upstream_ms = timeit.timeit(lambda: KerykeionChartSVG(john).makeTemplate(), number=20) / 20 * 1000
+    fast_ms = timeit.timeit(lambda: FastKerykeionChartSVG(john).makeTemplate(), number=20) / 20 * 1000
+    print(f"Natal chart: {upstream_ms:.2f} ms -> {fast_ms:.2f} ms")
+
+    # A year of transits of one natal subject: one static layer for all of them
+    transits = [AstrologicalSubject("Transit", 2024, month, day, 12, 0, "Greenwich", "GB", lng=0.0, lat=51.48, tz_str="Etc/UTC", online=False) for month in range(1, 13) for day in (1, 15)]
+    upstream_ms = timeit.timeit(lambda: [KerykeionChartSVG(john, "Transit", transit).makeTemplate() for transit in transits], number=1) / len(transits) * 1000
+    fast_ms = timeit.timeit(lambda: [FastKerykeionChartSVG(john, "Transit", transit).makeTemplate() for transit in transits], number=1) / len(transits) * 1000
+    print(f"Transit chart: {upstream_ms:.2f} ms -> {fast_ms:.2f} ms")
+
+    # Default and recolored variants of one chart without touching the disk
+    render = ChartRender(FastKerykeionChartSVG(john))
+    recolor_ms = timeit.timeit(lambda: render.add_variant("Inverted", lambda svg: recolor_svg(svg, {"#000000": "#ffffff", "#ffffff": "#000000"})), number=20) / 20 * 1000
+    print(f"In-memory recolor: {recolor_ms:.2f} ms, {len(render.to_bytes('Inverted'))} bytes")
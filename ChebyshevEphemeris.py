@@ -0,0 +1,388 @@
+"""
+Chebyshev-interpolated planetary longitudes.
+
+For animations and "what-if" sliders that need thousands of positions per
+second. ChebyshevEphemeris.fit samples swe.calc_ut once over a date range and
+keeps piecewise Chebyshev polynomials per body; after that a longitude (and its
+speed) at any instant in the range is a few multiply-adds, vectorized over
+arrays of Julian days.
+
+Every segment is checked against the Swiss Ephemeris between its fitting nodes
+and split in two until the error there is under half of max_error_arcseconds
+(1" by default), which leaves the instants between the checks a margin under
+the bound. Speeds get a fit of their own, on the Swiss Ephemeris' speeds (the
+True Node's longitude is too noisy to take the derivative of), checked the same
+way against max_speed_error_arcseconds per day; around a station the checks are
+dense and must all show the Swiss Ephemeris' direction of motion, so the
+retrograde flag is right wherever the speed is further than that from zero. Near a conjunction with the Sun the Swiss Ephemeris bends a planet's
+light around it, a spike of up to ~1" within a few hours, so those stretches
+are checked densely. The worst errors actually measured are kept per point in
+max_errors_arcseconds and max_speed_errors_arcseconds.
+
+Coefficients are saved to and loaded from .npz files, so a warm cache survives
+restarts (see load_or_fit).
+"""
+import json
+import math
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, Sequence, Union
+
+import numpy as np
+import swisseph as swe
+from kerykeion.astrological_subject import DEFAULT_PERSPECTIVE_TYPE, DEFAULT_ZODIAC_TYPE
+from kerykeion.kr_types import KerykeionException, PerspectiveType, SiderealMode, ZodiacType
+from numpy.polynomial import chebyshev
+
+from EphemerisEngine import get_planet_points, resolve_sidereal_mode, swiss_ephemeris_context
+
+
+DEFAULT_DEGREE = 12
+DEFAULT_MAX_ERROR_ARCSECONDS = 1.0
+# Arcseconds per day
+DEFAULT_MAX_SPEED_ERROR_ARCSECONDS = 0.5
+
+# First segment length tried per body, in days. Segments that miss the bound are halved.
+INITIAL_SEGMENT_DAYS = {
+    swe.MOON: 8.0,
+    swe.TRUE_NODE: 4.0,
+    swe.MEAN_APOG: 64.0,
+}
+DEFAULT_INITIAL_SEGMENT_DAYS = 32.0
+MIN_SEGMENT_DAYS = 1 / 64
+
+# Test points per segment, evenly spread between the fitting nodes
+CHECKS_PER_SEGMENT = 32
+# Share of the error bound the test points may use up
+CHECKED_ERROR_SHARE = 0.5
+
+# Light deflection by the Sun: test points every CONJUNCTION_CHECK_DAYS while
+# a body is within CONJUNCTION_ORB_DEGREES of it
+CONJUNCTION_ORB_DEGREES = 2.0
+CONJUNCTION_CHECK_DAYS = 1 / 96
+# Test points every STATION_CHECK_DAYS for STATION_CHECKS on each side of where
+# the fitted speed crosses zero
+STATION_CHECK_DAYS = 1 / 96
+STATION_CHECKS = 8
+# Points that aren't light from a body, so nothing bends them
+UNDEFLECTED_BODIES = (swe.SUN, swe.MOON, swe.MEAN_NODE, swe.TRUE_NODE, swe.MEAN_APOG)
+
+
+def evaluate_chebyshev(coefficients: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Clenshaw recurrence for one row of coefficients per x (both vectorized)."""
+    b1 = np.zeros_like(x)
+    b2 = np.zeros_like(x)
+    for index in range(coefficients.shape[1] - 1, 0, -1):
+        b1, b2 = 2 * x * b1 - b2 + coefficients[:, index], b1
+    return x * b1 - b2 + coefficients[:, 0]
+
+
+def evaluate_segments(boundaries: np.ndarray, coefficients: np.ndarray, julian_days: np.ndarray, speed_coefficients: Union[np.ndarray, None] = None) -> tuple:
+    """
+    (unwrapped longitudes, speeds) of a piecewise fit at a flat array of Julian days inside it.
+    Speeds come from speed_coefficients, the speed's own fit, when given, otherwise from the
+    longitude fit's derivative.
+    """
+    segment = np.clip(np.searchsorted(boundaries, julian_days, side="right") - 1, 0, len(coefficients) - 1)
+    segment_days = boundaries[segment + 1] - boundaries[segment]
+    x = 2 * (julian_days - boundaries[segment]) / segment_days - 1
+
+    longitudes = evaluate_chebyshev(coefficients[segment], x)
+    if speed_coefficients is None:
+        return longitudes, evaluate_chebyshev(chebyshev.chebder(coefficients, axis=1)[segment], x) * 2 / segment_days
+    return longitudes, evaluate_chebyshev(speed_coefficients[segment], x)
+
+
+class ChebyshevEphemeris:
+    """
+    Piecewise Chebyshev fits of ecliptic longitude for a set of points,
+    with the zodiac, ayanamsa and perspective settings they were fitted with.
+    """
+
+    def __init__(
+        self,
+        start: float,
+        end: float,
+        segments: Dict[str, tuple],
+        max_errors_arcseconds: Dict[str, float],
+        max_speed_errors_arcseconds: Dict[str, float],
+        zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+        sidereal_mode: Union[SiderealMode, None] = None,
+        perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+        lat: float = 0.0,
+        lng: float = 0.0,
+    ) -> None:
+        self.start = start
+        self.end = end
+        # Point name -> (segment boundaries (segments + 1,), longitude and speed coefficients (segments, degree + 1), is south node)
+        self.segments = segments
+        self.max_errors_arcseconds = max_errors_arcseconds
+        # Arcseconds per day
+        self.max_speed_errors_arcseconds = max_speed_errors_arcseconds
+        self.zodiac_type = zodiac_type
+        self.sidereal_mode = sidereal_mode
+        self.perspective_type = perspective_type
+        self.lat = lat
+        self.lng = lng
+
+    @classmethod
+    def fit(
+        cls,
+        start: float,
+        end: float,
+        points: Union[Sequence[str], None] = None,
+        zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+        sidereal_mode: Union[SiderealMode, None] = None,
+        perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+        lat: float = 0.0,
+        lng: float = 0.0,
+        degree: int = DEFAULT_DEGREE,
+        max_error_arcseconds: float = DEFAULT_MAX_ERROR_ARCSECONDS,
+        max_speed_error_arcseconds: float = DEFAULT_MAX_SPEED_ERROR_ARCSECONDS,
+    ) -> "ChebyshevEphemeris":
+        """Fits every point (all of them by default) between two UT Julian days."""
+        if end <= start:
+            raise KerykeionException("The end of the range must come after its start!")
+
+        sidereal_mode = resolve_sidereal_mode(zodiac_type, sidereal_mode)
+        planet_points = {name: (body_id, is_south_node) for name, body_id, is_south_node in get_planet_points()}
+        points = list(points) if points is not None else list(planet_points)
+        for point in points:
+            if point not in planet_points:
+                raise KerykeionException(f"'{point}' is not available! Available points are: {list(planet_points)}")
+
+        segments, max_errors, max_speed_errors = {}, {}, {}
+        with swiss_ephemeris_context(zodiac_type, sidereal_mode, perspective_type, lat, lng) as iflag:
+            # The Sun comes first: the other fits use it to find their conjunctions
+            fitted_bodies = {swe.SUN: _fit_body(swe.SUN, start, end, iflag, degree, max_error_arcseconds, max_speed_error_arcseconds)}
+
+            for point in points:
+                body_id, is_south_node = planet_points[point]
+                # A south node is its north node's fit shifted by 180 degrees
+                if body_id not in fitted_bodies:
+                    fitted_bodies[body_id] = _fit_body(body_id, start, end, iflag, degree, max_error_arcseconds, max_speed_error_arcseconds, fitted_bodies[swe.SUN])
+
+                boundaries, coefficients, speed_coefficients, max_error, max_speed_error = fitted_bodies[body_id]
+                segments[point] = (boundaries, coefficients, speed_coefficients, is_south_node)
+                max_errors[point] = max_error
+                max_speed_errors[point] = max_speed_error
+
+        return cls(start, end, segments, max_errors, max_speed_errors, zodiac_type, sidereal_mode, perspective_type, lat, lng)
+
+    def covers(self, julian_day: float, zodiac_type: ZodiacType, sidereal_mode: Union[SiderealMode, None], perspective_type: PerspectiveType, lat: float, lng: float) -> bool:
+        """Whether positions for this instant and these subject settings can come from the fit."""
+        if not self.start <= julian_day <= self.end:
+            return False
+        if (zodiac_type, sidereal_mode, perspective_type) != (self.zodiac_type, self.sidereal_mode, self.perspective_type):
+            return False
+        return perspective_type != "Topocentric" or (lat, lng) == (self.lat, self.lng)
+
+    def get_positions(self, point: str, julian_days: Union[float, Sequence[float], np.ndarray]) -> tuple:
+        """(longitudes in [0, 360), speeds in degrees per day) at the given UT Julian days."""
+        if point not in self.segments:
+            raise KerykeionException(f"'{point}' was not fitted! Fitted points are: {list(self.segments)}")
+
+        julian_days = np.asarray(julian_days, dtype=np.float64)
+        if julian_days.size and (julian_days.min() < self.start or julian_days.max() > self.end):
+            raise KerykeionException(f"Julian days outside of the fitted range {self.start} - {self.end}!")
+
+        boundaries, coefficients, speed_coefficients, is_south_node = self.segments[point]
+        longitudes, speeds = evaluate_segments(boundaries, coefficients, julian_days.reshape(-1), speed_coefficients)
+
+        if is_south_node:
+            longitudes = longitudes + 180
+        longitudes = np.mod(longitudes, 360)
+        # np.mod rounds a tiny negative longitude up to 360.0
+        longitudes[longitudes >= 360] = 0.0
+
+        return longitudes.reshape(julian_days.shape), speeds.reshape(julian_days.shape)
+
+    def get_position(self, point: str, julian_day: float) -> tuple:
+        """(longitude, speed) of one point at one UT Julian day."""
+        longitudes, speeds = self.get_positions(point, julian_day)
+        return float(longitudes), float(speeds)
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Writes the coefficients and settings to a compressed .npz file."""
+        metadata = {
+            "start": self.start,
+            "end": self.end,
+            "zodiac_type": self.zodiac_type,
+            "sidereal_mode": self.sidereal_mode,
+            "perspective_type": self.perspective_type,
+            "lat": self.lat,
+            "lng": self.lng,
+            "points": {
+                point: {
+                    "is_south_node": is_south_node,
+                    "max_error_arcseconds": self.max_errors_arcseconds[point],
+                    "max_speed_error_arcseconds": self.max_speed_errors_arcseconds[point],
+                }
+                for point, (_, _, _, is_south_node) in self.segments.items()
+            },
+        }
+        arrays = {}
+        for point, (boundaries, coefficients, speed_coefficients, _) in self.segments.items():
+            arrays[f"boundaries_{point}"] = boundaries
+            arrays[f"coefficients_{point}"] = coefficients
+            arrays[f"speed_coefficients_{point}"] = speed_coefficients
+
+        np.savez_compressed(path, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "ChebyshevEphemeris":
+        with np.load(path) as data:
+            metadata = json.loads(str(data["metadata"]))
+            if any(f"speed_coefficients_{point}" not in data for point in metadata["points"]):
+                raise KerykeionException(f"{path} was fitted by an older version without speed fits, fit it again!")
+
+            segments = {
+                point: (data[f"boundaries_{point}"], data[f"coefficients_{point}"], data[f"speed_coefficients_{point}"], info["is_south_node"])
+                for point, info in metadata["points"].items()
+            }
+
+        return cls(
+            metadata["start"],
+            metadata["end"],
+            segments,
+            {point: info["max_error_arcseconds"] for point, info in metadata["points"].items()},
+            {point: info["max_speed_error_arcseconds"] for point, info in metadata["points"].items()},
+            metadata["zodiac_type"],
+            metadata["sidereal_mode"],
+            metadata["perspective_type"],
+            metadata["lat"],
+            metadata["lng"],
+        )
+
+    @classmethod
+    def load_or_fit(cls, path: Union[str, Path], start: float, end: float, **fit_options) -> "ChebyshevEphemeris":
+        """
+        The fit saved at path if it covers the range with the same settings and bounds,
+        otherwise a new fit saved there.
+        """
+        try:
+            ephemeris = cls.load(path) if Path(path).exists() else None
+        except KerykeionException:
+            ephemeris = None
+
+        if ephemeris is not None:
+            zodiac_type = fit_options.get("zodiac_type", DEFAULT_ZODIAC_TYPE)
+            settings = (
+                zodiac_type,
+                resolve_sidereal_mode(zodiac_type, fit_options.get("sidereal_mode")),
+                fit_options.get("perspective_type", DEFAULT_PERSPECTIVE_TYPE),
+                fit_options.get("lat", 0.0),
+                fit_options.get("lng", 0.0),
+            )
+            points = fit_options.get("points") or [name for name, _, _ in get_planet_points()]
+            max_error_arcseconds = fit_options.get("max_error_arcseconds", DEFAULT_MAX_ERROR_ARCSECONDS)
+            max_speed_error_arcseconds = fit_options.get("max_speed_error_arcseconds", DEFAULT_MAX_SPEED_ERROR_ARCSECONDS)
+
+            if (
+                ephemeris.covers(start, *settings)
+                and ephemeris.covers(end, *settings)
+                and all(
+                    point in ephemeris.segments
+                    and ephemeris.max_errors_arcseconds[point] <= max_error_arcseconds
+                    and ephemeris.max_speed_errors_arcseconds[point] <= max_speed_error_arcseconds
+                    for point in points
+                )
+            ):
+                return ephemeris
+
+        ephemeris = cls.fit(start, end, **fit_options)
+        ephemeris.save(path)
+        return ephemeris
+
+
+def _get_checks(body_id: int, first: float, last: float, coefficients: np.ndarray, speed_coefficients: np.ndarray, sun_fit: Union[tuple, None]) -> np.ndarray:
+    """
+    Test points of one segment, in [-1, 1]: evenly spread, plus dense ones around
+    where the fitted speed crosses zero and near a conjunction with the Sun.
+    """
+    checks = [np.linspace(-1, 1, CHECKS_PER_SEGMENT)]
+
+    half = (last - first) / 2
+    stations = chebyshev.chebroots(speed_coefficients)
+    stations = stations[(np.abs(stations.imag) < 1e-9) & (np.abs(stations.real) <= 1)].real
+    if stations.size:
+        around = (np.arange(-STATION_CHECKS, STATION_CHECKS + 1) * STATION_CHECK_DAYS / half)[:, None] + stations
+        checks.append(around[np.abs(around) <= 1])
+
+    if sun_fit is not None and body_id not in UNDEFLECTED_BODIES:
+        dense = np.linspace(-1, 1, max(CHECKS_PER_SEGMENT, math.ceil((last - first) / CONJUNCTION_CHECK_DAYS) + 1))
+        sun_longitudes, _ = evaluate_segments(sun_fit[0], sun_fit[1], first + (dense + 1) * half)
+        elongations = np.abs(np.mod(chebyshev.chebval(dense, coefficients) - sun_longitudes + 180, 360) - 180)
+        checks.append(dense[elongations < CONJUNCTION_ORB_DEGREES])
+
+    return np.concatenate(checks)
+
+
+def _fit_body(
+    body_id: int,
+    start: float,
+    end: float,
+    iflag: int,
+    degree: int,
+    max_error_arcseconds: float,
+    max_speed_error_arcseconds: float,
+    sun_fit: Union[tuple, None] = None,
+) -> tuple:
+    """
+    (segment boundaries, longitude coefficients, speed coefficients, worst error in
+    arcseconds, worst speed error in arcseconds per day) for one Swiss Ephemeris body.
+    """
+    nodes = np.cos(np.pi * (np.arange(degree + 1) + 0.5) / (degree + 1))
+    position_at: Callable[[float], tuple] = lambda julian_day: swe.calc_ut(julian_day, body_id, iflag)[0]
+
+    initial_count = max(1, math.ceil((end - start) / INITIAL_SEGMENT_DAYS.get(body_id, DEFAULT_INITIAL_SEGMENT_DAYS)))
+    initial_boundaries = np.linspace(start, end, initial_count + 1).tolist()
+    # Segments still to fit, the earliest on top, so the fitted ones come out in order
+    pending = list(zip(initial_boundaries[:-1], initial_boundaries[1:]))[::-1]
+
+    boundaries, coefficients, speed_coefficients, max_error, max_speed_error = [start], [], [], 0.0, 0.0
+    while pending:
+        first, last = pending.pop()
+        middle, half = (first + last) / 2, (last - first) / 2
+
+        positions = np.array([position_at(middle + node * half)[::3] for node in nodes])
+        # Unwrapped so a segment crossing 0° Aries stays a smooth curve
+        segment_coefficients = chebyshev.chebfit(nodes, np.unwrap(positions[:, 0], period=360), degree)
+        segment_speed_coefficients = chebyshev.chebfit(nodes, positions[:, 1], degree)
+
+        checks = _get_checks(body_id, first, last, segment_coefficients, segment_speed_coefficients, sun_fit)
+        expected = np.array([position_at(middle + check * half)[::3] for check in checks.tolist()])
+        error = float(np.max(np.abs(np.mod(chebyshev.chebval(checks, segment_coefficients) - expected[:, 0] + 180, 360) - 180))) * 3600
+        speeds = chebyshev.chebval(checks, segment_speed_coefficients)
+        speed_error = float(np.max(np.abs(speeds - expected[:, 1]))) * 3600
+        wrong_direction = bool(np.any((speeds < 0) != (expected[:, 1] < 0)))
+
+        if (error > max_error_arcseconds * CHECKED_ERROR_SHARE or speed_error > max_speed_error_arcseconds * CHECKED_ERROR_SHARE or wrong_direction) and half >= MIN_SEGMENT_DAYS:
+            pending += [(middle, last), (first, middle)]
+            continue
+
+        boundaries.append(last)
+        coefficients.append(segment_coefficients)
+        speed_coefficients.append(segment_speed_coefficients)
+        max_error = max(max_error, error)
+        max_speed_error = max(max_speed_error, speed_error)
+
+    return np.array(boundaries), np.array(coefficients), np.array(speed_coefficients), max_error, max_speed_error
+
+
+if __name__ == "__main__":
+    start, end = swe.julday(2024, 1, 1, 0), swe.julday(2026, 1, 1, 0)
+
+    fit_started = timeit.default_timer()
+    ephemeris = ChebyshevEphemeris.fit(start, end)
+    fit_seconds = timeit.default_timer() - fit_started
+
+    print(f"Fitted {len(ephemeris.segments)} points over 2 years in {fit_seconds:.1f} s")
+    for point, error in ephemeris.max_errors_arcseconds.items():
+        print(f"  {point}: {len(ephemeris.segments[point][1])} segments, max error {error:.3f}\", max speed error {ephemeris.max_speed_errors_arcseconds[point]:.3f}\"/day")
+
+    julian_days = np.random.default_rng(0).uniform(start, end, 10000)
+    fast = timeit.timeit(lambda: ephemeris.get_positions("Mars", julian_days), number=10) / 10
+    with swiss_ephemeris_context() as iflag:
+        slow = timeit.timeit(lambda: [swe.calc_ut(julian_day, swe.MARS, iflag) for julian_day in julian_days.tolist()], number=1)
+    print(f"10000 Mars longitudes: swe.calc_ut {slow * 1000:.0f} ms, Chebyshev {fast * 1000:.2f} ms")
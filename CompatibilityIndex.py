@@ -0,0 +1,248 @@
+"""
+Best matches search over a stored population.
+
+RelationshipScoreFactory only scores the aspects between the Sun, Moon,
+Ascendant, Venus and Mars of the two subjects, plus 5 points for Suns of the
+same quality. CompatibilityIndex keeps those five longitudes of every stored
+subject, grouped in one degree buckets, so a query only looks at the subjects
+with a point in a bucket that can be in a scoring aspect with the query's
+points. Their scores are computed in one go with the aspect matrix, every other
+subject scores the Sun quality points alone, and only the best k pairs go
+through the real RelationshipScoreFactory.
+"""
+import timeit
+from dataclasses import dataclass
+from typing import List, Sequence, Union
+
+import numpy as np
+from kerykeion import AstrologicalSubject
+from kerykeion.kr_types import AstrologicalSubjectModel, RelationshipScoreModel
+from kerykeion.relationship_score.relationship_score_factory import RelationshipScoreFactory
+from kerykeion.settings.config_constants import DEFAULT_ACTIVE_ASPECTS, DEFAULT_ACTIVE_POINTS
+
+from AspectEngine import filter_aspects_settings, get_aspect_matrix
+from SettingsCache import get_settings
+from SubjectRecord import QUALITY_NAMES, SubjectRecord, records_to_array
+
+
+# The points RelationshipScoreFactory looks at
+SCORED_POINTS = ("Sun", "Moon", "Ascendant", "Venus", "Mars")
+
+BUCKETS = 360
+
+# Point pairs with a RelationshipScoreFactory rule
+SCORED_PAIRS = ({"Sun"}, {"Sun", "Moon"}, {"Sun", "Ascendant"}, {"Moon", "Ascendant"}, {"Venus", "Mars"})
+
+# (first subject point, second subject point) pairs a rule scores, in both orders
+SCORED_POINT_PAIRS = [(first, second) for first in SCORED_POINTS for second in SCORED_POINTS if {first, second} in SCORED_PAIRS]
+
+DESTINY_SIGN_POINTS = 5
+
+
+@dataclass
+class CompatibilityMatch:
+    """One result of CompatibilityIndex.find_best_matches."""
+
+    index: int
+    name: str
+    relationship_score: RelationshipScoreModel
+
+    @property
+    def score_value(self) -> int:
+        return self.relationship_score.score_value
+
+
+class ModelRelationshipScoreFactory(RelationshipScoreFactory):
+    """RelationshipScoreFactory that also takes subject models: upstream only keeps AstrologicalSubject instances."""
+
+    def __init__(self, first_subject, second_subject, use_only_major_aspects: bool = True):
+        self.first_subject = first_subject.model() if isinstance(first_subject, AstrologicalSubject) else first_subject
+        self.second_subject = second_subject.model() if isinstance(second_subject, AstrologicalSubject) else second_subject
+        super().__init__(first_subject, second_subject, use_only_major_aspects)
+
+
+def get_aspect_points(first_point: str, second_point: str, aspect: str, orbit: np.ndarray) -> np.ndarray:
+    """Points the RelationshipScoreFactory rules give an aspect between first_point and second_point."""
+    points = {first_point, second_point}
+
+    if points == {"Sun"}:
+        if aspect in ("conjunction", "opposition", "square"):
+            return np.where(orbit <= 2, 11, 8)
+        return np.full(orbit.shape, 4)
+
+    if points == {"Sun", "Moon"}:
+        if aspect == "conjunction":
+            return np.where(orbit <= 2, 11, 8)
+        return np.full(orbit.shape, 4)
+
+    if points in SCORED_PAIRS:
+        return np.full(orbit.shape, 4)
+
+    return np.zeros(orbit.shape, dtype=np.int64)
+
+
+def get_scored_positions(subjects: np.ndarray) -> dict:
+    """{point: longitudes} of the scored points among the active points, from a SUBJECT_RECORD_DTYPE array."""
+    return {
+        point: np.ascontiguousarray(subjects[f"{point.lower()}_abs_pos"], dtype=np.float64)
+        for point in SCORED_POINTS
+        if point in DEFAULT_ACTIVE_POINTS
+    }
+
+
+def get_scoring_aspects(aspects_settings: list, use_only_major_aspects: bool = True) -> List[int]:
+    """Indexes of the aspects RelationshipScoreFactory gives points for."""
+    return [
+        index for index, aspect in enumerate(aspects_settings)
+        if not use_only_major_aspects or aspect["name"] in RelationshipScoreFactory.MAJOR_ASPECTS
+    ]
+
+
+def get_relationship_scores(
+    first_positions: dict,
+    first_sun_qualities: np.ndarray,
+    second_positions: dict,
+    second_sun_qualities: np.ndarray,
+    aspects_settings: list,
+    scoring_aspects: List[int],
+) -> np.ndarray:
+    """
+    (N, M) RelationshipScoreFactory score values of every first subject with every
+    second subject, from their scored points' longitudes ({point: array}) and Sun
+    quality codes.
+    """
+    scores = np.where(first_sun_qualities[:, None] == second_sun_qualities[None, :], DESTINY_SIGN_POINTS, 0)
+
+    for first, second in SCORED_POINT_PAIRS:
+        if first not in first_positions or second not in second_positions:
+            continue
+
+        aspect_indexes, distances = get_aspect_matrix(first_positions[first], second_positions[second], aspects_settings)
+        for index in scoring_aspects:
+            hits = aspect_indexes == index
+            if hits.any():
+                aspect = aspects_settings[index]
+                scores[hits] += get_aspect_points(first, second, aspect["name"], distances[hits] - aspect["degree"])
+
+    return scores
+
+
+class CompatibilityIndex:
+    """
+    Index of a population stored as a SUBJECT_RECORD_DTYPE array (see
+    SubjectRecord.records_to_array), or built from subjects with from_subjects.
+
+    Scores are those of RelationshipScoreFactory(query, subject) with the
+    default kerykeion settings, active points and active aspects.
+    """
+
+    def __init__(self, subjects: np.ndarray, use_only_major_aspects: bool = True) -> None:
+        self.subjects = subjects
+        self.use_only_major_aspects = use_only_major_aspects
+
+        settings = get_settings()
+        self.aspects_settings = filter_aspects_settings(settings.aspects, DEFAULT_ACTIVE_ASPECTS, first_match_only=False)
+        self.scoring_aspects = get_scoring_aspects(self.aspects_settings, use_only_major_aspects)
+
+        self.sun_qualities = subjects["sun_quality"]
+        self.positions = get_scored_positions(subjects)
+
+        # Subjects sorted by bucket, and where every bucket starts in that order
+        self._orders, self._bucket_starts = {}, {}
+        for point, positions in self.positions.items():
+            buckets = np.floor(positions).astype(np.int64) % BUCKETS
+            self._orders[point] = np.argsort(buckets, kind="stable")
+            self._bucket_starts[point] = np.searchsorted(buckets[self._orders[point]], np.arange(BUCKETS + 1))
+
+    @classmethod
+    def from_subjects(cls, subjects: Sequence[Union[AstrologicalSubject, AstrologicalSubjectModel, SubjectRecord]], use_only_major_aspects: bool = True) -> "CompatibilityIndex":
+        records = [subject if isinstance(subject, SubjectRecord) else SubjectRecord.from_subject(subject) for subject in subjects]
+        return cls(records_to_array(records), use_only_major_aspects)
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    def _get_reachable_buckets(self, longitude: float) -> np.ndarray:
+        """Buckets holding every longitude that can be in a scoring aspect with longitude."""
+        reachable = np.zeros(BUCKETS, dtype=bool)
+
+        for index in self.scoring_aspects:
+            aspect = self.aspects_settings[index]
+            # get_aspect_from_two_points accepts int(distance) in [degree - orb, degree + orb]
+            nearest, farthest = aspect["degree"] - aspect["orb"], aspect["degree"] + aspect["orb"] + 1
+            for first, last in ((longitude + nearest, longitude + farthest), (longitude - farthest, longitude - nearest)):
+                reachable[np.arange(int(np.floor(first)) - 1, int(np.floor(last)) + 1) % BUCKETS] = True
+
+        return reachable
+
+    def _get_candidates(self, point: str, reachable: np.ndarray) -> np.ndarray:
+        """Indexes of the subjects whose point is in one of the reachable buckets."""
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], reachable, [False])).astype(np.int8)))
+        starts = self._bucket_starts[point]
+        order = self._orders[point]
+        return np.concatenate([order[starts[first]:starts[last]] for first, last in zip(edges[::2], edges[1::2])] or [np.empty(0, dtype=np.int64)])
+
+    def get_scores(self, subject: Union[AstrologicalSubject, AstrologicalSubjectModel]) -> np.ndarray:
+        """RelationshipScoreFactory(subject, stored subject) score value of every stored subject."""
+        sun_quality = QUALITY_NAMES.index(subject["sun"]["quality"])
+        scores = np.where(self.sun_qualities == sun_quality, DESTINY_SIGN_POINTS, 0)
+
+        reachable = {point: self._get_reachable_buckets(subject[point.lower()]["abs_pos"]) for point in self.positions}
+        for first, second in SCORED_POINT_PAIRS:
+            if first not in self.positions or second not in self.positions:
+                continue
+
+            candidates = self._get_candidates(second, reachable[first])
+            if not len(candidates):
+                continue
+
+            aspect_indexes, distances = get_aspect_matrix([subject[first.lower()]["abs_pos"]], self.positions[second][candidates], self.aspects_settings)
+            aspect_indexes, distances = aspect_indexes[0], distances[0]
+            for index in self.scoring_aspects:
+                hits = aspect_indexes == index
+                if hits.any():
+                    aspect = self.aspects_settings[index]
+                    orbits = distances[hits] - aspect["degree"]
+                    np.add.at(scores, candidates[hits], get_aspect_points(first, second, aspect["name"], orbits))
+
+        return scores
+
+    def get_subject(self, index: int) -> AstrologicalSubjectModel:
+        return SubjectRecord.from_row(self.subjects[index]).to_model()
+
+    def find_best_matches(self, subject: Union[AstrologicalSubject, AstrologicalSubjectModel], k: int = 10) -> List[CompatibilityMatch]:
+        """The k best scoring stored subjects for subject, best first (ties in storage order)."""
+        scores = self.get_scores(subject)
+        best = np.argsort(-scores, kind="stable")[:k]
+
+        matches = []
+        for index in best.tolist():
+            stored_subject = self.get_subject(index)
+            relationship_score = ModelRelationshipScoreFactory(subject, stored_subject, self.use_only_major_aspects).get_relationship_score()
+            matches.append(CompatibilityMatch(index=index, name=stored_subject.name, relationship_score=relationship_score))
+
+        return matches
+
+
+if __name__ == "__main__":
+    from kerykeion.utilities import setup_logging
+
+    setup_logging(level="critical")
+
+    rng = np.random.default_rng(0)
+    population = [
+        AstrologicalSubject(f"Subject {index}", int(rng.integers(1950, 2005)), int(rng.integers(1, 13)), int(rng.integers(1, 29)), int(rng.integers(0, 24)), int(rng.integers(0, 60)), "Rome", "IT", lng=12.49, lat=41.89, tz_str="Europe/Rome", online=False)
+        for index in range(1000)
+    ]
+    john = AstrologicalSubject("John", 1940, 10, 9, 18, 30, "Liverpool", "GB", lng=-2.98, lat=53.41, tz_str="Europe/London", online=False)
+
+    index = CompatibilityIndex.from_subjects(population)
+    brute_force_started = timeit.default_timer()
+    expected = [RelationshipScoreFactory(john, subject).get_relationship_score().score_value for subject in population]
+    brute_force_seconds = timeit.default_timer() - brute_force_started
+    assert index.get_scores(john).tolist() == expected
+
+    query_seconds = timeit.timeit(lambda: index.find_best_matches(john, k=10), number=10) / 10
+    print(f"{len(index)} subjects: pair by pair {brute_force_seconds:.2f} s, index {query_seconds * 1000:.1f} ms")
+    for match in index.find_best_matches(john, k=5):
+        print(f"  {match.name}: {match.score_value} ({match.relationship_score.score_description})")
@@ -0,0 +1,237 @@
+"""
+Columnar ephemeris archive.
+
+write_ephemeris_archive streams a BatchEphemerisDataFactory range into one zip
+file of .npy arrays, one per column and chunk: julian_day/00000.npy,
+Sun/longitude/00000.npy, Sun/speed/00000.npy, ..., First_House/cusp/00000.npy.
+Only one chunk is in memory while writing.
+
+EphemerisArchive reads it back by column and Julian day range, touching only
+the chunks that overlap it. Archives written with compress=False keep every
+array uncompressed in the zip, so the reader memory-maps them instead of
+reading them.
+"""
+import json
+import logging
+import timeit
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Sequence, Union
+
+import numpy as np
+from kerykeion.kr_types import KerykeionException
+
+from EphemerisEngine import HOUSE_NAMES, BatchEphemerisDataFactory, EphemerisColumns
+from TimeConversion import datetime_to_julian_day, localize_datetime
+
+
+# Per point columns, named after the EphemerisColumns attributes
+POINT_FIELDS = ("longitude", "speed", "sign", "house")
+
+METADATA_NAME = "metadata.json"
+
+# Fixed part of a zip local file header, before the file name and extra field
+_LOCAL_HEADER_SIZE = 30
+
+
+def _member_name(column: str, chunk: int) -> str:
+    return f"{column}/{chunk:05d}.npy"
+
+
+def _write_array(archive: zipfile.ZipFile, name: str, array: np.ndarray) -> None:
+    with archive.open(name, "w", force_zip64=True) as member:
+        np.lib.format.write_array(member, np.ascontiguousarray(array), allow_pickle=False)
+
+
+def write_ephemeris_archive(
+    path: Union[str, Path],
+    factory: BatchEphemerisDataFactory,
+    chunk_size: Union[int, None] = None,
+    compress: bool = True,
+) -> int:
+    """
+    Writes the factory's whole range, chunk_size dates per chunk (the factory's
+    STREAM_CHUNK_SIZE by default). Returns the rows written.
+    """
+    chunks, points = [], None
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+
+    with zipfile.ZipFile(path, "w", compression=compression, allowZip64=True) as archive:
+        for chunk, columns in enumerate(factory.iter_ephemeris_columns(chunk_size)):
+            points = columns.points
+            _write_array(archive, _member_name("julian_day", chunk), columns.julian_day)
+            _write_array(archive, _member_name("date", chunk), np.array(columns.dates))
+
+            for column, point in enumerate(points):
+                for field in POINT_FIELDS:
+                    _write_array(archive, _member_name(f"{point}/{field}", chunk), getattr(columns, field)[:, column])
+
+            for house, house_name in enumerate(HOUSE_NAMES):
+                _write_array(archive, _member_name(f"{house_name}/cusp", chunk), columns.houses[:, house])
+
+            chunks.append({"rows": len(columns), "first_julian_day": float(columns.julian_day[0]), "last_julian_day": float(columns.julian_day[-1])})
+
+        metadata = {
+            "points": points or [],
+            "chunks": chunks,
+            "tz_str": factory.tz_str,
+            "lat": factory.lat,
+            "lng": factory.lng,
+            "zodiac_type": factory.zodiac_type,
+            "sidereal_mode": factory.sidereal_mode,
+            "houses_system_identifier": factory.houses_system_identifier,
+            "perspective_type": factory.perspective_type,
+        }
+        archive.writestr(METADATA_NAME, json.dumps(metadata, indent=2))
+
+    rows_count = sum(chunk["rows"] for chunk in chunks)
+    logging.info(f"{rows_count} ephemeris rows written to {path} in {len(chunks)} chunks")
+    return rows_count
+
+
+class EphemerisArchive:
+    """
+    Reader for a file written by write_ephemeris_archive.
+
+    start and end are UT Julian days or datetimes (aware, or naive in UTC),
+    both included; leaving them out reads from the first or up to the last row.
+    """
+
+    def __init__(self, path: Union[str, Path], mmap: bool = True) -> None:
+        self.path = str(path)
+        self.mmap = mmap
+        self._archive = zipfile.ZipFile(self.path)
+
+        self.metadata = json.loads(self._archive.read(METADATA_NAME))
+        self.points: List[str] = self.metadata["points"]
+        self.chunks: List[dict] = self.metadata["chunks"]
+
+    def __len__(self) -> int:
+        return sum(chunk["rows"] for chunk in self.chunks)
+
+    def __enter__(self) -> "EphemerisArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._archive.close()
+
+    def _read_array(self, name: str) -> np.ndarray:
+        info = self._archive.getinfo(name)
+        if not (self.mmap and info.compress_type == zipfile.ZIP_STORED):
+            with self._archive.open(info) as member:
+                return np.lib.format.read_array(member, allow_pickle=False)
+
+        # Stored members are plain .npy bytes inside the zip: map them where they are
+        with open(self.path, "rb") as archive_file:
+            archive_file.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(archive_file.read(4), dtype="<u2")
+            archive_file.seek(info.header_offset + _LOCAL_HEADER_SIZE + int(name_length) + int(extra_length))
+
+            if np.lib.format.read_magic(archive_file) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(archive_file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(archive_file)
+            offset = archive_file.tell()
+
+        if not shape or 0 in shape:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran_order else "C")
+
+    def _get_selection(self, start, end) -> Iterator[tuple]:
+        """(chunk, row slice) for every chunk overlapping [start, end]."""
+        start = datetime_to_julian_day(start) if isinstance(start, datetime) else start
+        end = datetime_to_julian_day(end) if isinstance(end, datetime) else end
+
+        for chunk, info in enumerate(self.chunks):
+            if (start is not None and info["last_julian_day"] < start) or (end is not None and info["first_julian_day"] > end):
+                continue
+
+            if (start is None or start <= info["first_julian_day"]) and (end is None or info["last_julian_day"] <= end):
+                yield chunk, slice(None)
+                continue
+
+            julian_days = self._read_array(_member_name("julian_day", chunk))
+            first = np.searchsorted(julian_days, start, side="left") if start is not None else 0
+            last = np.searchsorted(julian_days, end, side="right") if end is not None else len(julian_days)
+            yield chunk, slice(int(first), int(last))
+
+    def column(self, point: str, field: str = "longitude", start: Union[float, datetime, None] = None, end: Union[float, datetime, None] = None) -> np.ndarray:
+        """
+        One column over [start, end], e.g. column("Mars", "speed", start, end).
+        point can also be "julian_day" or "date" (no field), or a house name with the "cusp" field.
+        """
+        column = point if point in ("julian_day", "date") else f"{point}/{field}"
+        parts = [self._read_array(_member_name(column, chunk))[rows] for chunk, rows in self._get_selection(start, end)]
+
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def read(self, start: Union[float, datetime, None] = None, end: Union[float, datetime, None] = None, points: Union[Sequence[str], None] = None) -> EphemerisColumns:
+        """
+        Every field of the points (all of them by default) over [start, end], as EphemerisColumns.
+        With no points, the point fields have no columns.
+        """
+        points = list(points) if points is not None else self.points
+        for point in points:
+            if point not in self.points:
+                raise KerykeionException(f"'{point}' is not in the archive! Archived points are: {self.points}")
+
+        selection = list(self._get_selection(start, end))
+
+        def read_column(column: str) -> np.ndarray:
+            parts = [self._read_array(_member_name(column, chunk))[rows] for chunk, rows in selection]
+            return np.concatenate(parts) if parts else np.empty(0)
+
+        julian_day = read_column("julian_day")
+
+        def read_field(field: str) -> np.ndarray:
+            if points:
+                return np.stack([read_column(f"{point}/{field}") for point in points], axis=1)
+            # np.stack needs at least one column: an empty one of the archived type
+            dtype = self._read_array(_member_name(f"{self.points[0]}/{field}", 0)).dtype if self.points and self.chunks else np.float64
+            return np.empty((len(julian_day), 0), dtype=dtype)
+
+        return EphemerisColumns(
+            dates=read_column("date").tolist(),
+            julian_day=julian_day,
+            points=points,
+            **{field: read_field(field) for field in POINT_FIELDS},
+            houses=np.stack([read_column(f"{house_name}/cusp") for house_name in HOUSE_NAMES], axis=1),
+        )
+
+
+if __name__ == "__main__":
+    factory = BatchEphemerisDataFactory(
+        start_datetime=datetime(2015, 1, 1),
+        end_datetime=datetime(2024, 12, 31),
+        step_type="days",
+        lat=37.9838,
+        lng=23.7275,
+        tz_str="Europe/Athens",
+    )
+
+    write_seconds = timeit.timeit(lambda: write_ephemeris_archive("ephemeris_archive.npz", factory), number=1)
+    ndjson_rows = factory.write_ephemeris_ndjson("ephemeris_archive.ndjson")
+    print(f"{ndjson_rows} days written in {write_seconds:.2f} s: "
+          f"archive {Path('ephemeris_archive.npz').stat().st_size / 1e6:.2f} MB, NDJSON {Path('ephemeris_archive.ndjson').stat().st_size / 1e6:.2f} MB")
+
+    def load_from_ndjson():
+        with open("ephemeris_archive.ndjson", encoding="utf-8") as ndjson_file:
+            return [json.loads(line)["Sun_abs_pos"] for line in ndjson_file]
+
+    with EphemerisArchive("ephemeris_archive.npz") as archive:
+        assert archive.column("Sun").tolist() == load_from_ndjson()
+        print(f"Sun longitude column: NDJSON {timeit.timeit(load_from_ndjson, number=3) / 3 * 1000:.1f} ms, "
+              f"archive {timeit.timeit(lambda: archive.column('Sun'), number=3) / 3 * 1000:.1f} ms")
+
+        # The dates are Athens wall-clock times, so the range is too
+        january = archive.read(localize_datetime(datetime(2020, 1, 1), "Europe/Athens")[0], localize_datetime(datetime(2020, 1, 31), "Europe/Athens")[0], points=["Sun", "Moon"])
+        print(f"January 2020: {len(january)} days, Moon signs {january.column('Moon', 'sign').tolist()}")
+
+        no_points = archive.read(points=[])
+        assert no_points.longitude.shape == (len(archive), 0) and no_points.sign.dtype == january.sign.dtype
@@ -0,0 +1,710 @@
+"""
+Batch ephemeris engine.
+
+Computes planet and axis positions for a whole range of dates straight from the
+Swiss Ephemeris into column arrays, without building an AstrologicalSubject
+(and its ~30 pydantic models) for every step. The numbers are the same ones
+kerykeion's per-subject path produces.
+"""
+import csv
+import json
+import logging
+import math
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Literal, NamedTuple, Sequence, Union, get_args
+
+import kerykeion
+import numpy as np
+import swisseph as swe
+from kerykeion import AstrologicalSubject
+from kerykeion.astrological_subject import (
+    DEFAULT_HOUSES_SYSTEM_IDENTIFIER,
+    DEFAULT_PERSPECTIVE_TYPE,
+    DEFAULT_SIDEREAL_MODE,
+    DEFAULT_ZODIAC_TYPE,
+)
+from kerykeion.ephemeris_data import EphemerisDataFactory
+from kerykeion.kr_types import (
+    EphemerisDictModel,
+    Houses,
+    HousesSystemIdentifier,
+    KerykeionException,
+    PerspectiveType,
+    SiderealMode,
+    Sign,
+    ZodiacType,
+)
+from kerykeion.utilities import check_and_adjust_polar_latitude, get_available_astrological_points_list, get_houses_list
+
+from TimeConversion import local_datetimes_to_julian_days
+
+if TYPE_CHECKING:
+    from ChebyshevEphemeris import ChebyshevEphemeris
+
+
+# Same ephemeris files kerykeion uses, so our numbers line up with AstrologicalSubject
+SWEPH_PATH = str(Path(kerykeion.__file__).parent.absolute() / "sweph")
+
+# The Swiss Ephemeris keeps the ayanamsa, topocentric position and ephemeris path as
+# global state: per thread in builds with thread-local storage (pyswisseph's default),
+# per process otherwise. Anything that sets it and then calculates holds this lock, so
+# a sidereal subject can never read a tropical one's settings either way.
+SWISS_EPHEMERIS_LOCK = threading.RLock()
+# Ephemeris path each thread has already set, so repeated setups skip it (~45 µs each)
+_swiss_ephemeris_thread_state = threading.local()
+
+# (name, Swiss Ephemeris id, is south node) in the same order as AstrologicalSubject.planets_names_list.
+# South nodes have no Swiss Ephemeris id: they're the north node shifted by 180 degrees.
+PLANET_POINTS = [
+    ("Sun", swe.SUN, False),
+    ("Moon", swe.MOON, False),
+    ("Mercury", swe.MERCURY, False),
+    ("Venus", swe.VENUS, False),
+    ("Mars", swe.MARS, False),
+    ("Jupiter", swe.JUPITER, False),
+    ("Saturn", swe.SATURN, False),
+    ("Uranus", swe.URANUS, False),
+    ("Neptune", swe.NEPTUNE, False),
+    ("Pluto", swe.PLUTO, False),
+    ("Mean_Node", swe.MEAN_NODE, False),
+    ("True_Node", swe.TRUE_NODE, False),
+    ("Mean_South_Node", swe.MEAN_NODE, True),
+    ("True_South_Node", swe.TRUE_NODE, True),
+]
+CHIRON_AND_LILITH_POINTS = [
+    ("Chiron", swe.CHIRON, False),
+    ("Mean_Lilith", swe.MEAN_APOG, False),
+]
+AXIAL_CUSPS = ["Ascendant", "Descendant", "Medium_Coeli", "Imum_Coeli"]
+HOUSE_NAMES = list(get_args(Houses))
+SIGN_NAMES = list(get_args(Sign))
+
+
+def get_planet_points(disable_chiron_and_lilith: bool = False) -> list:
+    """Planet table for a run, with or without Chiron and Lilith."""
+    if disable_chiron_and_lilith:
+        return list(PLANET_POINTS)
+    return PLANET_POINTS + CHIRON_AND_LILITH_POINTS
+
+
+def get_swe_flags(zodiac_type: ZodiacType, perspective_type: PerspectiveType) -> int:
+    """Swiss Ephemeris calc flags, built the same way AstrologicalSubject builds them."""
+    if perspective_type not in get_args(PerspectiveType):
+        raise KerykeionException(f"'{perspective_type}' is NOT a valid chart perspective! Available perspectives are: {get_args(PerspectiveType)}")
+    if zodiac_type not in get_args(ZodiacType):
+        raise KerykeionException(f"'{zodiac_type}' is NOT a valid zodiac type! Available types are: {get_args(ZodiacType)}")
+
+    iflag = swe.FLG_SWIEPH + swe.FLG_SPEED
+    if perspective_type == "True Geocentric":
+        iflag += swe.FLG_TRUEPOS
+    elif perspective_type == "Heliocentric":
+        iflag += swe.FLG_HELCTR
+    elif perspective_type == "Topocentric":
+        iflag += swe.FLG_TOPOCTR
+
+    if zodiac_type == "Sidereal":
+        iflag += swe.FLG_SIDEREAL
+
+    return iflag
+
+
+def resolve_sidereal_mode(zodiac_type: ZodiacType, sidereal_mode: Union[SiderealMode, None]) -> Union[SiderealMode, None]:
+    """Validates the zodiac/sidereal mode combination and fills in the default ayanamsa."""
+    if sidereal_mode and zodiac_type == "Tropic":
+        raise KerykeionException("You can't set a sidereal mode with a Tropic zodiac type!")
+
+    if zodiac_type == "Sidereal":
+        sidereal_mode = sidereal_mode or DEFAULT_SIDEREAL_MODE
+        if sidereal_mode not in get_args(SiderealMode):
+            raise KerykeionException(f"'{sidereal_mode}' is NOT a valid sidereal mode! Available modes are: {get_args(SiderealMode)}")
+
+    return sidereal_mode
+
+
+def setup_swiss_ephemeris(
+    zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+    sidereal_mode: Union[SiderealMode, None] = None,
+    perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+    lat: float = 0.0,
+    lng: float = 0.0,
+) -> int:
+    """
+    Sets the global Swiss Ephemeris state (path, ayanamsa, topocentric position)
+    once for a whole batch and returns the calc flags to use with it.
+
+    The ephemeris path is only set the first time on each thread. Call this with
+    SWISS_EPHEMERIS_LOCK held (see swiss_ephemeris_context) when other threads
+    may be calculating too.
+    """
+    iflag = get_swe_flags(zodiac_type, perspective_type)
+    sidereal_mode = resolve_sidereal_mode(zodiac_type, sidereal_mode)
+
+    with SWISS_EPHEMERIS_LOCK:
+        if getattr(_swiss_ephemeris_thread_state, "ephe_path", None) != SWEPH_PATH:
+            swe.set_ephe_path(SWEPH_PATH)
+            _swiss_ephemeris_thread_state.ephe_path = SWEPH_PATH
+
+        if perspective_type == "Topocentric":
+            swe.set_topo(lng, lat, 0)
+
+        if zodiac_type == "Sidereal":
+            swe.set_sid_mode(getattr(swe, "SIDM_" + sidereal_mode))
+
+    return iflag
+
+
+@contextmanager
+def swiss_ephemeris_context(
+    zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+    sidereal_mode: Union[SiderealMode, None] = None,
+    perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+    lat: float = 0.0,
+    lng: float = 0.0,
+) -> Iterator[int]:
+    """
+    Holds the Swiss Ephemeris lock with the global state set up for one
+    configuration, and yields the calc flags:
+
+        with swiss_ephemeris_context("Sidereal", "LAHIRI") as iflag:
+            swe.calc_ut(julian_day, swe.SUN, iflag)
+
+    Calculations for different zodiacs and perspectives can then run on a
+    thread pool without seeing each other's settings. They're serialized, not
+    parallel: the Swiss Ephemeris is not re-entrant.
+    """
+    with SWISS_EPHEMERIS_LOCK:
+        yield setup_swiss_ephemeris(zodiac_type, sidereal_mode, perspective_type, lat, lng)
+
+
+def create_astrological_subject(*args, **kwargs) -> AstrologicalSubject:
+    """AstrologicalSubject built while holding SWISS_EPHEMERIS_LOCK, safe to call from worker threads."""
+    with SWISS_EPHEMERIS_LOCK:
+        return AstrologicalSubject(*args, **kwargs)
+
+
+class PointCalculation(NamedTuple):
+    """The full six-value swe.calc_ut result for one point."""
+
+    longitude: float
+    latitude: float
+    distance: float
+    longitude_speed: float
+    latitude_speed: float
+    distance_speed: float
+
+
+def calculate_point(julian_day: float, body_id: int, iflag: int, is_south_node: bool = False) -> PointCalculation:
+    """One swe.calc_ut call; south nodes are the north node mirrored through the Earth."""
+    position = swe.calc_ut(julian_day, body_id, iflag)[0]
+    if not is_south_node:
+        return PointCalculation(*position)
+
+    # Same direction of motion as the north node, opposite side of the ecliptic
+    return PointCalculation(math.fmod(position[0] + 180, 360), -position[1], position[2], position[3], -position[4], position[5])
+
+
+def calculate_declination(calculation: PointCalculation, julian_day: float, zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE) -> float:
+    """Declination from an ecliptic calc result, using the true obliquity of the date."""
+    longitude = calculation.longitude
+    if zodiac_type == "Sidereal":
+        # Back to tropical longitude, ayanamsa includes nutation like FLG_SIDEREAL does
+        longitude = math.fmod(longitude + swe.get_ayanamsa_ex_ut(julian_day, swe.FLG_SWIEPH)[1], 360)
+
+    obliquity = swe.calc_ut(julian_day, swe.ECL_NUT, 0)[0][0]
+    return swe.cotrans((longitude, calculation.latitude, calculation.distance), -obliquity)[1]
+
+
+def calculate_houses(julian_day: float, lat: float, lng: float, houses_system_identifier: HousesSystemIdentifier, zodiac_type: ZodiacType):
+    """House cusps and (ascendant, medium coeli) for one Julian day."""
+    if zodiac_type == "Sidereal":
+        cusps, ascmc = swe.houses_ex(tjdut=julian_day, lat=lat, lon=lng, hsys=str.encode(houses_system_identifier), flags=swe.FLG_SIDEREAL)
+    else:
+        cusps, ascmc = swe.houses(tjdut=julian_day, lat=lat, lon=lng, hsys=str.encode(houses_system_identifier))
+
+    return cusps, ascmc
+
+
+def assign_houses(longitudes: np.ndarray, cusps: np.ndarray) -> np.ndarray:
+    """
+    House index (0 = First_House) for every longitude against its own row of cusps:
+    longitudes (n, p) with cusps (n, 12), or any array of longitudes against one
+    set of cusps (12,).
+
+    Mirrors kerykeion.utilities.get_planet_house: a point sitting exactly on a cusp
+    belongs to that house, a point on the next cusp does not.
+    """
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    cusps = np.asarray(cusps, dtype=np.float64)
+    if cusps.ndim == 1:
+        return assign_houses(longitudes.reshape(1, -1), cusps.reshape(1, -1)).reshape(longitudes.shape)
+
+    widths = np.fmod(np.roll(cusps, -1, axis=1) - cusps + 360, 360)
+
+    # Rotate every cusp set to start at 0, then a point's house is the number of cusps at or before it
+    rotated_cusps = np.fmod(cusps - cusps[:, :1] + 360, 360)
+    distances = np.fmod(longitudes - cusps[:, :1] + 360, 360)
+    houses = (rotated_cusps[:, None, :] <= distances[:, :, None]).sum(axis=2) - 1
+
+    # Confirm with get_planet_house's own test, which also settles points a rounding error away from a cusp
+    rows = np.arange(len(cusps))[:, None]
+    in_house = np.fmod(longitudes - cusps[rows, houses] + 360, 360) < widths[rows, houses]
+    previous = np.clip(houses - 1, 0, None)
+    in_previous_house = (houses > 0) & (np.fmod(longitudes - cusps[rows, previous] + 360, 360) < widths[rows, previous])
+    unsure = ~in_house | in_previous_house
+
+    if unsure.any():
+        unsure_rows, unsure_points = np.nonzero(unsure)
+        offsets = np.fmod(longitudes[unsure_rows, unsure_points][:, None] - cusps[unsure_rows] + 360, 360)
+        inside = offsets < widths[unsure_rows]
+        if not inside.any(axis=1).all():
+            raise ValueError("Error in house calculation, a point does not fall within any house range")
+        houses[unsure_rows, unsure_points] = inside.argmax(axis=1)
+
+    return houses.astype(np.int8)
+
+
+@dataclass
+class EphemerisColumns:
+    """
+    Column arrays for a date range: one row per date, one column per point.
+
+    Sign and house are stored as indexes (0 = Ari, 0 = First_House), the axes
+    have a speed of 0 because the Swiss Ephemeris doesn't give them one here.
+    """
+
+    dates: List[str]
+    julian_day: np.ndarray
+    points: List[str]
+    longitude: np.ndarray
+    speed: np.ndarray
+    sign: np.ndarray
+    house: np.ndarray
+    houses: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.julian_day)
+
+    def column(self, point: str, field: str = "longitude") -> np.ndarray:
+        """One point's values over the whole range, e.g. column("Sun", "speed")."""
+        return getattr(self, field)[:, self.points.index(point)]
+
+    def iter_rows(self) -> Iterator[dict]:
+        """
+        One flat dict per date: date, julian_day, then <Point>_abs_pos, <Point>_speed,
+        <Point>_sign and <Point>_house for every point, then the twelve house cusps.
+        """
+        for row in range(len(self)):
+            data = {"date": self.dates[row], "julian_day": float(self.julian_day[row])}
+
+            for column, point in enumerate(self.points):
+                data[f"{point}_abs_pos"] = float(self.longitude[row, column])
+                data[f"{point}_speed"] = float(self.speed[row, column])
+                data[f"{point}_sign"] = SIGN_NAMES[self.sign[row, column]]
+                data[f"{point}_house"] = HOUSE_NAMES[self.house[row, column]]
+
+            for house, house_name in enumerate(HOUSE_NAMES):
+                data[house_name] = float(self.houses[row, house])
+
+            yield data
+
+    @classmethod
+    def concatenate(cls, parts: List["EphemerisColumns"]) -> "EphemerisColumns":
+        """Joins consecutive chunks of the same range back into one set of columns."""
+        return cls(
+            dates=[date for part in parts for date in part.dates],
+            julian_day=np.concatenate([part.julian_day for part in parts]),
+            points=parts[0].points,
+            longitude=np.concatenate([part.longitude for part in parts]),
+            speed=np.concatenate([part.speed for part in parts]),
+            sign=np.concatenate([part.sign for part in parts]),
+            house=np.concatenate([part.house for part in parts]),
+            houses=np.concatenate([part.houses for part in parts]),
+        )
+
+
+def compute_ephemeris_columns(
+    julian_days: Sequence[float],
+    lat: float,
+    lng: float,
+    zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+    sidereal_mode: Union[SiderealMode, None] = None,
+    houses_system_identifier: HousesSystemIdentifier = DEFAULT_HOUSES_SYSTEM_IDENTIFIER,
+    perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+    disable_chiron_and_lilith: bool = False,
+    dates: Union[List[str], None] = None,
+    iflag: Union[int, None] = None,
+    chebyshev_ephemeris: Union["ChebyshevEphemeris", None] = None,
+) -> EphemerisColumns:
+    """
+    Computes every point for every Julian day in one pass.
+    One swe.calc_ut per body and one house calculation per step, nothing else.
+
+    Pass iflag when the Swiss Ephemeris has already been set up for this run
+    (e.g. once per worker process), otherwise it's set up here and held for
+    the whole run.
+
+    With a chebyshev_ephemeris fitted for the same settings, planet longitudes
+    and speeds are evaluated from its polynomials for the whole array at once
+    (within its max_errors_arcseconds of the Swiss Ephemeris), leaving only the
+    houses to compute per step.
+    """
+    if houses_system_identifier not in get_args(HousesSystemIdentifier):
+        raise KerykeionException(f"'{houses_system_identifier}' is NOT a valid house system! Available systems are: {get_args(HousesSystemIdentifier)}")
+
+    lat = check_and_adjust_polar_latitude(lat)
+    if iflag is None:
+        with swiss_ephemeris_context(zodiac_type, sidereal_mode, perspective_type, lat, lng) as iflag:
+            return compute_ephemeris_columns(
+                julian_days, lat, lng, zodiac_type, sidereal_mode, houses_system_identifier, perspective_type, disable_chiron_and_lilith, dates, iflag, chebyshev_ephemeris
+            )
+
+    planet_points = get_planet_points(disable_chiron_and_lilith)
+    points = [name for name, _, _ in planet_points] + AXIAL_CUSPS
+
+    julian_days = np.asarray(julian_days, dtype=np.float64)
+    rows, planets_count = len(julian_days), len(planet_points)
+
+    longitude = np.zeros((rows, len(points)))
+    speed = np.zeros((rows, len(points)))
+    houses = np.zeros((rows, 12))
+
+    if chebyshev_ephemeris is not None and rows:
+        settings = (zodiac_type, resolve_sidereal_mode(zodiac_type, sidereal_mode), perspective_type, lat, lng)
+        if not (chebyshev_ephemeris.covers(julian_days.min(), *settings) and chebyshev_ephemeris.covers(julian_days.max(), *settings)):
+            raise KerykeionException("The Chebyshev ephemeris wasn't fitted for these dates and settings!")
+
+        for column, (name, _, _) in enumerate(planet_points):
+            longitude[:, column], speed[:, column] = chebyshev_ephemeris.get_positions(name, julian_days)
+
+    for row, julian_day in enumerate(julian_days.tolist()):
+        results = {}
+        for column, (_, body_id, is_south_node) in enumerate(planet_points if chebyshev_ephemeris is None else ()):
+            if body_id not in results:
+                results[body_id] = swe.calc_ut(julian_day, body_id, iflag)[0]
+            position = results[body_id]
+
+            longitude[row, column] = math.fmod(position[0] + 180, 360) if is_south_node else position[0]
+            speed[row, column] = position[3]
+
+        cusps, ascmc = calculate_houses(julian_day, lat, lng, houses_system_identifier, zodiac_type)
+        houses[row] = cusps
+        longitude[row, planets_count:] = (ascmc[0], math.fmod(ascmc[0] + 180, 360), ascmc[1], math.fmod(ascmc[1] + 180, 360))
+
+    return EphemerisColumns(
+        dates=dates if dates is not None else [str(julian_day) for julian_day in julian_days.tolist()],
+        julian_day=julian_days,
+        points=points,
+        longitude=longitude,
+        speed=speed,
+        sign=(longitude // 30).astype(np.int8),
+        house=assign_houses(longitude, houses),
+        houses=houses,
+    )
+
+
+# Flags of the current worker process, set once by _init_ephemeris_worker
+_worker_iflag: Union[int, None] = None
+
+
+def _init_ephemeris_worker(zodiac_type, sidereal_mode, perspective_type, lat, lng) -> None:
+    """Process pool initializer: every worker sets up its own Swiss Ephemeris state once."""
+    global _worker_iflag
+    _worker_iflag = setup_swiss_ephemeris(zodiac_type, sidereal_mode, perspective_type, check_and_adjust_polar_latitude(lat), lng)
+
+
+def _compute_columns_chunk(julian_days: np.ndarray, dates: List[str], options: dict) -> EphemerisColumns:
+    return compute_ephemeris_columns(julian_days, dates=dates, iflag=_worker_iflag, **options)
+
+
+def _compute_ephemeris_data_chunk(dates: List[datetime], subject_options: dict) -> list:
+    """The per-subject path of EphemerisDataFactory.get_ephemeris_data, for one chunk of dates."""
+    ephemeris_data_list = []
+    for date in dates:
+        subject = create_astrological_subject(
+            year=date.year,
+            month=date.month,
+            day=date.day,
+            hour=date.hour,
+            minute=date.minute,
+            city="Placeholder",
+            nation="Placeholder",
+            online=False,
+            **subject_options,
+        )
+        ephemeris_data_list.append({"date": date.isoformat(), "planets": get_available_astrological_points_list(subject), "houses": get_houses_list(subject)})
+
+    return ephemeris_data_list
+
+
+def split_into_chunks(items: Sequence, chunks_count: int) -> list:
+    """Splits a sequence into at most chunks_count contiguous, nearly equal chunks."""
+    chunks_count = max(1, min(chunks_count, len(items)))
+    size, remainder = divmod(len(items), chunks_count)
+
+    chunks, start = [], 0
+    for i in range(chunks_count):
+        end = start + size + (1 if i < remainder else 0)
+        chunks.append(items[start:end])
+        start = end
+
+    return chunks
+
+
+class BatchEphemerisDataFactory(EphemerisDataFactory):
+    """
+    EphemerisDataFactory with a batch mode and optional process pool.
+
+    Takes the same arguments as EphemerisDataFactory, with the same max_days,
+    max_hours and max_minutes guards. The dates are generated lazily, and the
+    guards only apply to the methods that build an AstrologicalSubject per step
+    into a list (get_ephemeris_data and get_ephemeris_data_as_astrological_subjects,
+    through dates_list): get_ephemeris_columns, the iter_* generators and the
+    file sinks skip them.
+
+    Extra parameters:
+    - workers: number of worker processes. None or 1 computes everything in this process.
+        With more workers the range is split into contiguous chunks that are computed
+        in a process pool and merged back in order.
+    - chebyshev_ephemeris: a ChebyshevEphemeris fitted over the range with the same settings.
+        The batch engine then evaluates planet longitudes and speeds from it instead of
+        the Swiss Ephemeris (see compute_ephemeris_columns). The per-subject methods ignore it.
+    """
+
+    # Chunks per worker, so a slow chunk doesn't leave the other workers idle at the end
+    CHUNKS_PER_WORKER = 4
+
+    # Dates computed together by the streaming generators and sinks
+    STREAM_CHUNK_SIZE = 1000
+
+    def __init__(
+        self,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        step_type: Literal["days", "hours", "minutes"] = "days",
+        step: int = 1,
+        lat: float = 51.4769,
+        lng: float = 0.0005,
+        tz_str: str = "Etc/UTC",
+        is_dst: bool = False,
+        disable_chiron_and_lilith: bool = False,
+        zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+        sidereal_mode: Union[SiderealMode, None] = None,
+        houses_system_identifier: HousesSystemIdentifier = DEFAULT_HOUSES_SYSTEM_IDENTIFIER,
+        perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+        max_days: Union[int, None] = 730,
+        max_hours: Union[int, None] = 8760,
+        max_minutes: Union[int, None] = 525600,
+        workers: Union[int, None] = None,
+        chebyshev_ephemeris: Union["ChebyshevEphemeris", None] = None,
+    ):
+        # EphemerisDataFactory.__init__ builds the whole dates_list up front, so it isn't called here
+        self.start_datetime = start_datetime
+        self.end_datetime = end_datetime
+        self.step_type = step_type
+        self.step = step
+        self.lat = lat
+        self.lng = lng
+        self.tz_str = tz_str
+        self.is_dst = is_dst
+        self.disable_chiron_and_lilith = disable_chiron_and_lilith
+        self.zodiac_type = zodiac_type
+        self.sidereal_mode = sidereal_mode
+        self.houses_system_identifier = houses_system_identifier
+        self.perspective_type = perspective_type
+        self.max_days = max_days
+        self.max_hours = max_hours
+        self.max_minutes = max_minutes
+        self.workers = workers
+        self.chebyshev_ephemeris = chebyshev_ephemeris
+        self._dates_list: Union[List[datetime], None] = None
+
+        if self.step_type == "days":
+            self.dates_count = (self.end_datetime - self.start_datetime).days // self.step + 1
+        elif self.step_type == "hours":
+            self.dates_count = int((self.end_datetime - self.start_datetime).total_seconds() / 3600) // self.step + 1
+        elif self.step_type == "minutes":
+            self.dates_count = int((self.end_datetime - self.start_datetime).total_seconds() / 60) // self.step + 1
+        else:
+            raise ValueError(f"Invalid step type: {self.step_type}")
+
+        if self.dates_count <= 0:
+            raise ValueError("No dates found. Check the date range and step values.")
+
+    def iter_dates(self) -> Iterator[datetime]:
+        """Every date of the range, one at a time."""
+        for i in range(self.dates_count):
+            yield self.start_datetime + timedelta(**{self.step_type: i * self.step})
+
+    @property
+    def dates_list(self) -> List[datetime]:
+        """The whole range as a list, for the per-subject methods: the max_* guards apply here."""
+        limit = {"days": self.max_days, "hours": self.max_hours, "minutes": self.max_minutes}[self.step_type]
+        if limit and self.dates_count > limit:
+            raise ValueError(f"Too many {self.step_type}: {self.dates_count} > {limit}. To prevent this error, set max_{self.step_type} to a higher value, reduce the date range or use get_ephemeris_columns or the iter_* methods.")
+
+        if self.dates_count > 1000:
+            logging.warning(f"Large number of dates: {self.dates_count}. The calculation may take a while.")
+
+        return self._get_dates_list()
+
+    def _get_dates_list(self) -> List[datetime]:
+        """The whole range as a list, built on first use, without the max_* guards."""
+        if self._dates_list is None:
+            self._dates_list = list(self.iter_dates())
+        return self._dates_list
+
+    def _use_pool(self) -> bool:
+        return bool(self.workers) and self.workers > 1 and self.dates_count > 1
+
+    def _get_subject_options(self) -> dict:
+        return {
+            "lng": self.lng,
+            "lat": self.lat,
+            "tz_str": self.tz_str,
+            "disable_chiron_and_lilith": self.disable_chiron_and_lilith,
+            "zodiac_type": self.zodiac_type,
+            "sidereal_mode": self.sidereal_mode,
+            "houses_system_identifier": self.houses_system_identifier,
+            "perspective_type": self.perspective_type,
+            "is_dst": self.is_dst,
+        }
+
+    def get_ephemeris_data(self, as_model: bool = False) -> list:
+        """
+        Same output as EphemerisDataFactory.get_ephemeris_data, computed in a
+        process pool when workers > 1.
+        """
+        if not self._use_pool():
+            return super().get_ephemeris_data(as_model=as_model)
+
+        chunks = split_into_chunks(self.dates_list, self.workers * self.CHUNKS_PER_WORKER)
+        subject_options = self._get_subject_options()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            parts = executor.map(_compute_ephemeris_data_chunk, chunks, [subject_options] * len(chunks))
+            ephemeris_data_list = [data for part in parts for data in part]
+
+        if as_model:
+            return [EphemerisDictModel(**data) for data in ephemeris_data_list]
+
+        return ephemeris_data_list
+
+    def _get_columns_options(self) -> dict:
+        return {
+            "lat": self.lat,
+            "lng": self.lng,
+            "zodiac_type": self.zodiac_type,
+            "sidereal_mode": self.sidereal_mode,
+            "houses_system_identifier": self.houses_system_identifier,
+            "perspective_type": self.perspective_type,
+            "disable_chiron_and_lilith": self.disable_chiron_and_lilith,
+            "chebyshev_ephemeris": self.chebyshev_ephemeris,
+        }
+
+    def get_julian_days(self) -> np.ndarray:
+        """UT Julian day for every date in the range."""
+        return local_datetimes_to_julian_days(self._get_dates_list(), self.tz_str, self.is_dst)
+
+    def get_ephemeris_columns(self) -> EphemerisColumns:
+        """
+        Ephemeris for the whole range as column arrays (date x point -> longitude,
+        speed, sign index, house index), in one pass.
+        """
+        logging.debug(f"Computing batch ephemeris for {self.dates_count} dates")
+
+        julian_days = self.get_julian_days()
+        dates = [date.isoformat() for date in self._get_dates_list()]
+        options = self._get_columns_options()
+
+        if not self._use_pool():
+            return compute_ephemeris_columns(julian_days, dates=dates, **options)
+
+        chunks_count = self.workers * self.CHUNKS_PER_WORKER
+        initargs = (self.zodiac_type, self.sidereal_mode, self.perspective_type, self.lat, self.lng)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_ephemeris_worker, initargs=initargs) as executor:
+            parts = list(executor.map(
+                _compute_columns_chunk,
+                split_into_chunks(julian_days, chunks_count),
+                split_into_chunks(dates, chunks_count),
+                [options] * chunks_count,
+            ))
+
+        return EphemerisColumns.concatenate(parts)
+
+    def iter_ephemeris_data(self, as_model: bool = False) -> Iterator[Union[dict, EphemerisDictModel]]:
+        """
+        Generator version of get_ephemeris_data: yields the same items one date at a
+        time, so only one AstrologicalSubject is alive at once.
+        """
+        subject_options = self._get_subject_options()
+
+        for date in self.iter_dates():
+            data = _compute_ephemeris_data_chunk([date], subject_options)[0]
+            yield EphemerisDictModel(**data) if as_model else data
+
+    def iter_ephemeris_columns(self, chunk_size: Union[int, None] = None) -> Iterator[EphemerisColumns]:
+        """Batch-engine columns for consecutive chunks of the range."""
+        chunk_size = chunk_size or self.STREAM_CHUNK_SIZE
+        options = self._get_columns_options()
+        dates = self.iter_dates()
+
+        while True:
+            chunk = list(islice(dates, chunk_size))
+            if not chunk:
+                break
+
+            julian_days = local_datetimes_to_julian_days(chunk, self.tz_str, self.is_dst)
+            yield compute_ephemeris_columns(julian_days, dates=[date.isoformat() for date in chunk], **options)
+
+    def iter_ephemeris_rows(self, chunk_size: Union[int, None] = None) -> Iterator[dict]:
+        """Flat rows (see EphemerisColumns.iter_rows) for the whole range, computed chunk by chunk."""
+        for columns in self.iter_ephemeris_columns(chunk_size):
+            yield from columns.iter_rows()
+
+    def write_ephemeris_ndjson(self, path: Union[str, Path], chunk_size: Union[int, None] = None) -> int:
+        """Streams the range to a newline-delimited JSON file, one flat row per line. Returns the rows written."""
+        rows_count = 0
+        with open(path, "w", encoding="utf-8") as output_file:
+            for row in self.iter_ephemeris_rows(chunk_size):
+                output_file.write(json.dumps(row) + "\n")
+                rows_count += 1
+
+        logging.info(f"{rows_count} ephemeris rows written to {path}")
+        return rows_count
+
+    def write_ephemeris_csv(self, path: Union[str, Path], chunk_size: Union[int, None] = None) -> int:
+        """Streams the range to a CSV file, one flat row per line. Returns the rows written."""
+        rows_count = 0
+        with open(path, "w", encoding="utf-8", newline="") as output_file:
+            writer = None
+            for row in self.iter_ephemeris_rows(chunk_size):
+                if writer is None:
+                    writer = csv.DictWriter(output_file, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+                rows_count += 1
+
+        logging.info(f"{rows_count} ephemeris rows written to {path}")
+        return rows_count
+
+
+if __name__ == "__main__":
+    factory = BatchEphemerisDataFactory(
+        start_datetime=datetime(2020, 1, 1),
+        end_datetime=datetime(2020, 1, 3),
+        step_type="hours",
+        lat=37.9838,
+        lng=23.7275,
+        tz_str="Europe/Athens",
+        workers=2,
+    )
+    columns = factory.get_ephemeris_columns()
+    print(f"{len(columns)} dates x {len(columns.points)} points")
+    print(f"Sun longitude on {columns.dates[0]}: {columns.column('Sun')[0]}")
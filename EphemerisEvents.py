@@ -0,0 +1,527 @@
+"""
+Ingress and station search.
+
+Instead of stepping an ephemeris minute by minute and diffing rows, each body is
+sampled at a coarse step that is safely shorter than the time between two of its
+ingresses. Steps where the speed is too low to rule out a station are halved
+until they either show one or can't hold one, and every bracket where the sign
+or the direction of motion changes is then refined on longitude and speed until
+it is narrower than a tenth of a second, all brackets of a point at once.
+
+Positions come from swe.calc_ut, or for whole arrays of instants at once from a
+ChebyshevEphemeris fitted over the range.
+"""
+import math
+import timeit
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Literal, Sequence, Union
+
+import numpy as np
+import swisseph as swe
+from kerykeion.astrological_subject import DEFAULT_PERSPECTIVE_TYPE, DEFAULT_ZODIAC_TYPE
+from kerykeion.kr_types import KerykeionException, PerspectiveType, SiderealMode, Sign, ZodiacType
+
+from ChebyshevEphemeris import ChebyshevEphemeris
+from EphemerisEngine import SIGN_NAMES, get_planet_points, resolve_sidereal_mode, swiss_ephemeris_context
+from TimeConversion import datetime_to_julian_day, julian_day_to_utc_datetime
+
+
+EventKind = Literal["ingress", "station_retrograde", "station_direct"]
+
+# Coarse sampling step in days, shorter than the time a point takes through a
+# sign. Stations don't depend on it (see MAX_ACCELERATIONS).
+DEFAULT_STEP_DAYS = 1.0
+STEP_DAYS = {
+    "Sun": 5.0,
+    "Moon": 1.0,
+    "Mercury": 2.0,
+    "Venus": 4.0,
+    "Mars": 5.0,
+    "Jupiter": 10.0,
+    "Saturn": 10.0,
+    "Uranus": 10.0,
+    "Neptune": 10.0,
+    "Pluto": 10.0,
+    "Mean_Node": 10.0,
+    "Mean_South_Node": 10.0,
+    "True_Node": 2.0,
+    "True_South_Node": 2.0,
+    "Chiron": 10.0,
+    "Mean_Lilith": 5.0,
+}
+
+# Largest change of speed per day (degrees per day²) over 1900-2100, with a
+# margin. Over a step of h days the speed can only reach zero and come back when
+# its values at both ends add up to at most this times h, so only those steps
+# are halved to look for stations (the True Node turns around twice within
+# three days at times).
+DEFAULT_MAX_ACCELERATION = 0.8
+MAX_ACCELERATIONS = {
+    "Sun": 0.001,
+    "Moon": 0.8,
+    "Mercury": 0.3,
+    "Venus": 0.07,
+    "Mars": 0.03,
+    "Jupiter": 0.015,
+    "Saturn": 0.01,
+    "Uranus": 0.01,
+    "Neptune": 0.01,
+    "Pluto": 0.005,
+    "Mean_Node": 0.001,
+    "Mean_South_Node": 0.001,
+    "True_Node": 0.09,
+    "True_South_Node": 0.09,
+    "Chiron": 0.01,
+    "Mean_Lilith": 0.001,
+}
+
+# Refine until the bracket is this narrow (~0.09 seconds)
+TOLERANCE_DAYS = 1e-6
+# Newton steps tried on an ingress before falling back to find_roots
+NEWTON_STEPS = 6
+# Steps are halved down to an hour. Sign changes of the speed closer together than
+# that are noise: the True Node's speed flickers around zero for minutes on end
+STATION_RESOLUTION_DAYS = 1 / 24
+
+
+@dataclass
+class EphemerisEvent:
+    """
+    A sign ingress or a station of one point.
+
+    sign is the sign entered for an ingress, the sign the point stands in for a
+    station. retrograde is the direction of motion right after the event.
+    """
+
+    kind: EventKind
+    point: str
+    julian_day: float
+    longitude: float
+    sign: Sign
+    retrograde: bool
+
+    @property
+    def utc_datetime(self) -> datetime:
+        return julian_day_to_utc_datetime(self.julian_day)
+
+
+@dataclass
+class RetrogradeWindow:
+    """
+    One retrograde period of a point, from its station retrograde to its station
+    direct. station_retrograde is None when the point was already retrograde at
+    the start of the range, station_direct when it still is at its end.
+    """
+
+    point: str
+    station_retrograde: Union[EphemerisEvent, None]
+    station_direct: Union[EphemerisEvent, None]
+
+    @property
+    def start_julian_day(self) -> Union[float, None]:
+        return self.station_retrograde.julian_day if self.station_retrograde is not None else None
+
+    @property
+    def end_julian_day(self) -> Union[float, None]:
+        return self.station_direct.julian_day if self.station_direct is not None else None
+
+
+def find_root(function: Callable[[float], float], start: float, end: float, start_value: float, end_value: float, tolerance: float = TOLERANCE_DAYS) -> float:
+    """
+    Root of function between start and end, where it changes sign.
+    Secant steps kept inside the bracket (false position, Illinois variant), so a
+    smooth function like a longitude or a speed converges in a handful of calls.
+    """
+    side = 0
+    for _ in range(100):
+        if end - start <= tolerance:
+            break
+
+        middle = (start * end_value - end * start_value) / (end_value - start_value)
+        if not start < middle < end:
+            middle = (start + end) / 2
+
+        value = function(middle)
+        if value == 0:
+            return middle
+
+        if (value < 0) == (start_value < 0):
+            start, start_value = middle, value
+            # The same end kept twice in a row: halve its weight so it moves too
+            if side == -1:
+                end_value /= 2
+            side = -1
+        else:
+            end, end_value = middle, value
+            if side == 1:
+                start_value /= 2
+            side = 1
+
+    return (start + end) / 2
+
+
+def find_roots(
+    function: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    starts: np.ndarray,
+    ends: np.ndarray,
+    start_values: np.ndarray,
+    end_values: np.ndarray,
+    tolerance: float = TOLERANCE_DAYS,
+) -> np.ndarray:
+    """
+    find_root on many brackets at once. function(julian_days, brackets) gives the
+    values at julian_days of the brackets with those indexes; every round calls it
+    once for all the brackets still wider than tolerance.
+    """
+    starts, ends = np.array(starts, dtype=np.float64), np.array(ends, dtype=np.float64)
+    start_values, end_values = np.array(start_values, dtype=np.float64), np.array(end_values, dtype=np.float64)
+    sides = np.zeros(len(starts), dtype=np.int8)
+    brackets = np.arange(len(starts))
+
+    for _ in range(100):
+        brackets = brackets[ends[brackets] - starts[brackets] > tolerance]
+        if not brackets.size:
+            break
+
+        start, end, start_value, end_value = starts[brackets], ends[brackets], start_values[brackets], end_values[brackets]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            middles = (start * end_value - end * start_value) / (end_value - start_value)
+        outside = ~((start < middles) & (middles < end))
+        middles[outside] = (start[outside] + end[outside]) / 2
+
+        values = function(middles, brackets)
+        # A bracket that hit its root closes on it
+        found = values == 0
+        starts[brackets[found]] = ends[brackets[found]] = middles[found]
+
+        moves_start = ~found & ((values < 0) == (start_value < 0))
+        moved = brackets[moves_start]
+        starts[moved], start_values[moved] = middles[moves_start], values[moves_start]
+        # The same end kept twice in a row: halve its weight so it moves too
+        end_values[moved[sides[moved] == -1]] /= 2
+        sides[moved] = -1
+
+        moves_end = ~found & ~moves_start
+        moved = brackets[moves_end]
+        ends[moved], end_values[moved] = middles[moves_end], values[moves_end]
+        start_values[moved[sides[moved] == 1]] /= 2
+        sides[moved] = 1
+
+    return (starts + ends) / 2
+
+
+def _wrap(angles: np.ndarray) -> np.ndarray:
+    """Angles in [-180, 180)."""
+    return np.mod(angles + 180, 360) - 180
+
+
+class EphemerisEventFinder:
+    """
+    Ingresses and stations for any point over a range of dates, with the same
+    zodiac, ayanamsa and perspective settings as an AstrologicalSubject.
+
+        finder = EphemerisEventFinder.from_subject(subject)
+        events = finder.find_events(datetime(2024, 1, 1), datetime(2025, 1, 1))
+
+    - chebyshev_ephemeris: a ChebyshevEphemeris fitted over the searched ranges
+        with the same settings. Positions are then evaluated from its polynomials
+        (within its max_errors_arcseconds of the Swiss Ephemeris), so a year of
+        every point takes milliseconds instead of most of a second.
+    """
+
+    def __init__(
+        self,
+        zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+        sidereal_mode: Union[SiderealMode, None] = None,
+        perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+        lat: float = 0.0,
+        lng: float = 0.0,
+        disable_chiron_and_lilith: bool = False,
+        chebyshev_ephemeris: Union[ChebyshevEphemeris, None] = None,
+    ) -> None:
+        self.zodiac_type = zodiac_type
+        self.sidereal_mode = sidereal_mode
+        self.perspective_type = perspective_type
+        self.lat = lat
+        self.lng = lng
+        self.points = {name: (body_id, is_south_node) for name, body_id, is_south_node in get_planet_points(disable_chiron_and_lilith)}
+        self.chebyshev_ephemeris = chebyshev_ephemeris
+
+    @classmethod
+    def from_subject(cls, subject, chebyshev_ephemeris: Union[ChebyshevEphemeris, None] = None) -> "EphemerisEventFinder":
+        """Finder with an AstrologicalSubject's (or model's) settings."""
+        return cls(
+            zodiac_type=subject.zodiac_type,
+            sidereal_mode=subject.sidereal_mode,
+            perspective_type=subject.perspective_type,
+            lat=subject.lat,
+            lng=subject.lng,
+            disable_chiron_and_lilith=subject.chiron is None,
+            chebyshev_ephemeris=chebyshev_ephemeris,
+        )
+
+    def _check_chebyshev_ephemeris(self, start: float, end: float, points: Sequence[str]) -> None:
+        settings = (self.zodiac_type, resolve_sidereal_mode(self.zodiac_type, self.sidereal_mode), self.perspective_type, self.lat, self.lng)
+        if not (self.chebyshev_ephemeris.covers(start, *settings) and self.chebyshev_ephemeris.covers(end, *settings)):
+            raise KerykeionException("The Chebyshev ephemeris wasn't fitted for these dates and settings!")
+
+        missing = [point for point in points if point not in self.chebyshev_ephemeris.segments]
+        if missing:
+            raise KerykeionException(f"The Chebyshev ephemeris wasn't fitted for {missing}!")
+
+    def _calculate(self, point: str, julian_day: float, iflag: int) -> tuple:
+        if self.chebyshev_ephemeris is not None:
+            return self.chebyshev_ephemeris.get_position(point, julian_day)
+
+        body_id, is_south_node = self.points[point]
+        position = swe.calc_ut(julian_day, body_id, iflag)[0]
+        longitude = math.fmod(position[0] + 180, 360) if is_south_node else position[0]
+        return longitude, position[3]
+
+    def _calculate_all(self, point: str, julian_days: np.ndarray, iflag: int) -> tuple:
+        """(longitudes, speeds) of a point at an array of Julian days."""
+        if self.chebyshev_ephemeris is not None:
+            return self.chebyshev_ephemeris.get_positions(point, julian_days)
+
+        body_id, is_south_node = self.points[point]
+        positions = np.array([swe.calc_ut(julian_day, body_id, iflag)[0][::3] for julian_day in julian_days.tolist()]).reshape(-1, 2)
+        longitudes = np.mod(positions[:, 0] + 180, 360) if is_south_node else positions[:, 0]
+        return longitudes, positions[:, 1]
+
+    def _find_stations(self, julian_days: np.ndarray, speeds: np.ndarray, speeds_at: Callable[[np.ndarray], np.ndarray], max_acceleration: float) -> tuple:
+        """
+        (stations, retrograde right after each) in time order. A step whose speeds
+        at both ends add up to more than max_acceleration times its length holds at
+        most one station, where the speed changes sign (see MAX_ACCELERATIONS).
+        The other steps are halved until they do, or are STATION_RESOLUTION_DAYS
+        short.
+        """
+        starts, ends, start_speeds, end_speeds = julian_days[:-1], julian_days[1:], speeds[:-1], speeds[1:]
+        brackets = []
+        while starts.size:
+            steps = ends - starts
+            unresolved = (np.abs(start_speeds) + np.abs(end_speeds) <= max_acceleration * steps) & (steps > STATION_RESOLUTION_DAYS)
+            changes = ~unresolved & ((start_speeds < 0) != (end_speeds < 0))
+            brackets.append((starts[changes], ends[changes], start_speeds[changes], end_speeds[changes]))
+
+            starts, ends, start_speeds, end_speeds = starts[unresolved], ends[unresolved], start_speeds[unresolved], end_speeds[unresolved]
+            middles = (starts + ends) / 2
+            middle_speeds = speeds_at(middles) if middles.size else middles
+            starts, ends = np.concatenate([starts, middles]), np.concatenate([middles, ends])
+            start_speeds, end_speeds = np.concatenate([start_speeds, middle_speeds]), np.concatenate([middle_speeds, end_speeds])
+
+        starts, ends, start_speeds, end_speeds = (np.concatenate(columns) for columns in zip(*brackets))
+        stations = find_roots(lambda julian_days, _: speeds_at(julian_days), starts, ends, start_speeds, end_speeds)
+        # The direction after a station is the one at its bracket's end: right
+        # next to it the speed may still be noise
+        order = np.argsort(stations)
+        return stations[order], end_speeds[order] < 0
+
+    def _get_timeline_arrays(self, point: str, start: float, end: float, iflag: int, samples_cache: dict) -> tuple:
+        """
+        (julian days, longitudes, retrograde right after, speeds, is a station) of
+        every sample and station in time order, so between two consecutive entries
+        the point moves one way only. A node and its south node share one search.
+        """
+        body_id, is_south_node = self.points[point]
+        step = STEP_DAYS.get(point, DEFAULT_STEP_DAYS)
+        if (body_id, step) not in samples_cache:
+            steps_count = max(2, math.ceil((end - start) / step))
+            julian_days = start + (end - start) * np.arange(steps_count + 1) / steps_count
+            longitudes, speeds = self._calculate_all(point, julian_days, iflag)
+            stations, retrograde = self._find_stations(
+                julian_days, speeds, lambda julian_days: self._calculate_all(point, julian_days, iflag)[1], MAX_ACCELERATIONS.get(point, DEFAULT_MAX_ACCELERATION)
+            )
+            station_longitudes = self._calculate_all(point, stations, iflag)[0] if stations.size else stations
+            if is_south_node:
+                # Kept as the north node's
+                longitudes, station_longitudes = np.mod(longitudes + 180, 360), np.mod(station_longitudes + 180, 360)
+
+            order = np.argsort(np.concatenate([julian_days, stations]), kind="stable")
+            samples_cache[(body_id, step)] = tuple(column[order] for column in (
+                np.concatenate([julian_days, stations]),
+                np.concatenate([longitudes, station_longitudes]),
+                np.concatenate([speeds < 0, retrograde]),
+                np.concatenate([speeds, np.zeros(len(stations))]),
+                np.concatenate([np.zeros(len(julian_days), dtype=bool), np.ones(len(stations), dtype=bool)]),
+            ))
+
+        julian_days, longitudes, retrograde, speeds, is_station = samples_cache[(body_id, step)]
+        if is_south_node:
+            longitudes = np.mod(longitudes + 180, 360)
+        return julian_days, longitudes, retrograde, speeds, is_station
+
+    def _get_timeline(self, point: str, start: float, end: float, iflag: int, samples_cache: dict) -> tuple:
+        """
+        (timeline, stations): timeline has (julian day, longitude, retrograde right after it,
+        speed) for every sample and station in time order, so between two consecutive entries
+        the point moves one way only. stations are the timeline entries where it turns around.
+        """
+        julian_days, longitudes, retrograde, speeds, is_station = self._get_timeline_arrays(point, start, end, iflag, samples_cache)
+        timeline = list(zip(julian_days.tolist(), longitudes.tolist(), retrograde.tolist(), speeds.tolist()))
+        return timeline, [entry for entry, station in zip(timeline, is_station.tolist()) if station]
+
+    def _find_point_events(self, point: str, start: float, end: float, iflag: int, kinds: Sequence[EventKind], samples_cache: dict) -> List[EphemerisEvent]:
+        julian_days, longitudes, retrograde, _, is_station = self._get_timeline_arrays(point, start, end, iflag, samples_cache)
+
+        events = []
+        for station, station_longitude, station_retrograde in zip(julian_days[is_station].tolist(), longitudes[is_station].tolist(), retrograde[is_station].tolist()):
+            kind = "station_retrograde" if station_retrograde else "station_direct"
+            if kind in kinds:
+                events.append(EphemerisEvent(kind, point, station, station_longitude, SIGN_NAMES[int(station_longitude // 30)], station_retrograde))
+
+        if "ingress" in kinds:
+            events += self._find_ingresses(point, julian_days, longitudes, retrograde, iflag)
+
+        return events
+
+    def _find_ingresses(self, point: str, julian_days: np.ndarray, longitudes: np.ndarray, retrograde: np.ndarray, iflag: int) -> List[EphemerisEvent]:
+        """Sign ingresses between consecutive timeline entries, refined all at once."""
+        starts, ends, start_longitudes, end_longitudes, retrograde = julian_days[:-1], julian_days[1:], longitudes[:-1], longitudes[1:], retrograde[:-1]
+        directions = np.where(retrograde, -1, 1)
+        travelled = np.mod(directions * (end_longitudes - start_longitudes), 360)
+
+        # Sign boundaries (as multiples of 30, not wrapped) crossed on the way: from
+        # first, one direction step at a time. More than 180 degrees is a hair the
+        # other way right at a station, not a trip around the zodiac
+        first = np.floor(start_longitudes / 30).astype(np.int64) + (directions > 0)
+        counts = np.abs(np.floor((start_longitudes + directions * travelled) / 30).astype(np.int64) - first + (directions > 0)) * (travelled <= 180)
+
+        pieces = np.repeat(np.arange(len(starts)), counts)
+        offsets = np.arange(len(pieces)) - np.repeat(np.cumsum(counts) - counts, counts)
+        boundary_indexes = first[pieces] + directions[pieces] * offsets
+        boundaries = np.mod(boundary_indexes, 12) * 30.0
+
+        start_distances, end_distances = _wrap(start_longitudes[pieces] - boundaries), _wrap(end_longitudes[pieces] - boundaries)
+        # Already counted as the previous piece's end
+        kept = start_distances != 0
+        pieces, boundary_indexes, boundaries, start_distances, end_distances = pieces[kept], boundary_indexes[kept], boundaries[kept], start_distances[kept], end_distances[kept]
+
+        piece_starts, piece_ends, piece_directions = starts[pieces], ends[pieces], directions[pieces]
+        # Newton steps on the speed, all ingresses at once, from where a steady speed
+        # would reach the boundary; find_roots takes the ones that don't settle inside their piece
+        ingresses = piece_starts + (piece_ends - piece_starts) * start_distances / (start_distances - end_distances)
+        unsettled, failed = np.flatnonzero(end_distances != 0), []
+        for _ in range(NEWTON_STEPS):
+            if not unsettled.size:
+                break
+            longitudes, speeds = self._calculate_all(point, ingresses[unsettled], iflag)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                steps = _wrap(longitudes - boundaries[unsettled]) / speeds
+            ingresses[unsettled] -= steps
+            stepped = ingresses[unsettled]
+            lost = (speeds * piece_directions[unsettled] <= 0) | ~((piece_starts[unsettled] <= stepped) & (stepped <= piece_ends[unsettled]))
+            failed.append(unsettled[lost])
+            unsettled = unsettled[~lost & (np.abs(steps) >= TOLERANCE_DAYS)]
+
+        failed = np.concatenate(failed + [unsettled]).astype(np.int64)
+        if failed.size:
+            ingresses[failed] = find_roots(
+                lambda julian_days, brackets: _wrap(self._calculate_all(point, julian_days, iflag)[0] - boundaries[failed[brackets]]),
+                piece_starts[failed],
+                piece_ends[failed],
+                start_distances[failed],
+                end_distances[failed],
+            )
+
+        entered_signs = np.mod(np.where(retrograde[pieces], boundary_indexes - 1, boundary_indexes), 12)
+        return [
+            EphemerisEvent("ingress", point, ingress, boundary, SIGN_NAMES[entered_sign], is_retrograde)
+            for ingress, boundary, entered_sign, is_retrograde in zip(ingresses.tolist(), boundaries.tolist(), entered_signs.tolist(), retrograde[pieces].tolist())
+        ]
+
+    def _get_range(self, start: Union[datetime, float], end: Union[datetime, float], points: Union[Sequence[str], None]) -> tuple:
+        start = start if isinstance(start, (int, float)) else datetime_to_julian_day(start)
+        end = end if isinstance(end, (int, float)) else datetime_to_julian_day(end)
+        if end <= start:
+            raise KerykeionException("The end of the range must come after its start!")
+
+        points = list(points) if points is not None else list(self.points)
+        for point in points:
+            if point not in self.points:
+                raise KerykeionException(f"'{point}' is not available! Available points are: {list(self.points)}")
+
+        if self.chebyshev_ephemeris is not None:
+            self._check_chebyshev_ephemeris(start, end, points)
+        return start, end, points
+
+    def find_events(
+        self,
+        start: Union[datetime, float],
+        end: Union[datetime, float],
+        points: Union[Sequence[str], None] = None,
+        kinds: Sequence[EventKind] = ("ingress", "station_retrograde", "station_direct"),
+    ) -> List[EphemerisEvent]:
+        """
+        Every event between start and end (datetimes, naive ones in UTC, or UT
+        Julian days), for the given points or all of them, in time order.
+        """
+        start, end, points = self._get_range(start, end, points)
+
+        events, samples_cache = [], {}
+        with swiss_ephemeris_context(self.zodiac_type, self.sidereal_mode, self.perspective_type, self.lat, self.lng) as iflag:
+            for point in points:
+                events += self._find_point_events(point, start, end, iflag, kinds, samples_cache)
+
+        return sorted(events, key=lambda event: event.julian_day)
+
+    def find_ingresses(self, start, end, points: Union[Sequence[str], None] = None) -> List[EphemerisEvent]:
+        return self.find_events(start, end, points, kinds=("ingress",))
+
+    def find_stations(self, start, end, points: Union[Sequence[str], None] = None) -> List[EphemerisEvent]:
+        return self.find_events(start, end, points, kinds=("station_retrograde", "station_direct"))
+
+    def find_retrograde_windows(
+        self,
+        start: Union[datetime, float],
+        end: Union[datetime, float],
+        points: Union[Sequence[str], None] = None,
+    ) -> List[RetrogradeWindow]:
+        """
+        Every retrograde period overlapping start - end, for the given points or all
+        of them, ordered by start (the ones already running at start first).
+        """
+        start, end, points = self._get_range(start, end, points)
+
+        windows, samples_cache = [], {}
+        with swiss_ephemeris_context(self.zodiac_type, self.sidereal_mode, self.perspective_type, self.lat, self.lng) as iflag:
+            for point in points:
+                _, _, retrograde, _, _ = self._get_timeline_arrays(point, start, end, iflag, samples_cache)
+                window = RetrogradeWindow(point, None, None) if retrograde[0] else None
+
+                # Stations alternate, each one turning the point the other way
+                for event in self._find_point_events(point, start, end, iflag, ("station_retrograde", "station_direct"), samples_cache):
+                    if event.retrograde:
+                        window = RetrogradeWindow(point, event, None)
+                    elif window is not None:
+                        window.station_direct = event
+                        windows.append(window)
+                        window = None
+
+                if window is not None:
+                    windows.append(window)
+
+        return sorted(windows, key=lambda window: start if window.station_retrograde is None else window.station_retrograde.julian_day)
+
+
+if __name__ == "__main__":
+    finder = EphemerisEventFinder()
+    start, end = datetime(2024, 1, 1), datetime(2025, 1, 1)
+
+    for event in finder.find_events(start, end, points=["Mercury"]):
+        print(f"{event.utc_datetime:%Y-%m-%d %H:%M:%S} {event.point} {event.kind} {event.sign}")
+
+    for window in finder.find_retrograde_windows(start, end, points=["Mercury", "Mars", "Jupiter"]):
+        retrograde = f"{window.station_retrograde.utc_datetime:%Y-%m-%d}" if window.station_retrograde else "(retrograde)"
+        direct = f"{window.station_direct.utc_datetime:%Y-%m-%d}" if window.station_direct else "(retrograde)"
+        print(f"{window.point} retrograde: {retrograde} -> {direct}")
+
+    seconds = timeit.timeit(lambda: finder.find_events(start, end), number=3) / 3
+    print(f"All points, one year: {len(finder.find_events(start, end))} events in {seconds * 1000:.0f} ms")
+
+    fitted = EphemerisEventFinder(chebyshev_ephemeris=ChebyshevEphemeris.fit(datetime_to_julian_day(start), datetime_to_julian_day(end)))
+    fitted_events = fitted.find_events(start, end)
+    assert [(event.kind, event.point, event.sign) for event in fitted_events] == [(event.kind, event.point, event.sign) for event in finder.find_events(start, end)]
+    seconds = timeit.timeit(lambda: fitted.find_events(start, end), number=10) / 10
+    print(f"All points, one year, from the Chebyshev ephemeris: {len(fitted_events)} events in {seconds * 1000:.1f} ms")
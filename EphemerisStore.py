@@ -0,0 +1,329 @@
+"""
+Memory-mapped precomputed ephemeris.
+
+build_ephemeris_store runs the Swiss Ephemeris once over a span (e.g. 1800-2200,
+one row per day or hour) and writes every point's longitude and speed to a flat
+binary file. EphemerisStore opens that file with numpy.memmap and interpolates
+between rows, so a fresh worker process starts without computing anything, and
+all processes reading the same file share its pages through the OS cache.
+
+Near a conjunction with the Sun the Swiss Ephemeris bends a planet's light
+within a few hours, faster than daily rows can follow, so the store also keeps
+denser rows (every DENSE_STEP_DAYS) of each planet around its conjunctions.
+The Sun is always stored to find them.
+
+File layout: a HEADER_SIZE byte header (MAGIC, then the JSON metadata padded with
+spaces), then little-endian arrays:
+- float64 (rows, points, 2): the longitude and speed of every point at
+  start + row * step_days;
+- float64 (dense rows, 2): the dense rows of every block below, one after the other;
+- int64 (blocks, 4): column, first row, last row and offset of the block's first
+  dense row, for every run of rows with dense_steps dense rows between two rows.
+"""
+import argparse
+import json
+import math
+import timeit
+from pathlib import Path
+from typing import Sequence, Union
+
+import numpy as np
+import swisseph as swe
+from kerykeion.astrological_subject import DEFAULT_PERSPECTIVE_TYPE, DEFAULT_ZODIAC_TYPE
+from kerykeion.kr_types import KerykeionException, PerspectiveType, SiderealMode, ZodiacType
+
+from ChebyshevEphemeris import UNDEFLECTED_BODIES
+from EphemerisEngine import get_planet_points, resolve_sidereal_mode, swiss_ephemeris_context
+
+
+MAGIC = b"KRSTORE2"
+HEADER_SIZE = 4096
+STORE_DTYPE = np.dtype("<f8")
+BLOCK_DTYPE = np.dtype("<i8")
+
+# Rows computed and written at a time while building
+BUILD_CHUNK_ROWS = 4096
+
+# Rows closer to the Sun than this (or a conjunction between two rows) get dense rows between them
+NEAR_SUN_DEGREES = 2.0
+# Step of the dense rows: within 0.03" of the Swiss Ephemeris right next to the Sun
+DENSE_STEP_DAYS = 1 / 24
+
+# Worst interpolation errors with daily rows, in arcseconds, DEFAULT_MAX_ERROR_ARCSECONDS for the other points
+MAX_ERRORS_ARCSECONDS = {"Moon": 0.7, "True_Node": 0.4, "True_South_Node": 0.4}
+DEFAULT_MAX_ERROR_ARCSECONDS = 0.1
+
+
+def _calculate(body_id: int, is_south_node: bool, julian_days: Sequence[float], iflag: int) -> np.ndarray:
+    """(longitude, speed) rows of one point from the Swiss Ephemeris."""
+    rows = np.empty((len(julian_days), 2), dtype=STORE_DTYPE)
+    for row, julian_day in enumerate(julian_days):
+        position = swe.calc_ut(julian_day, body_id, iflag)[0]
+        rows[row] = (math.fmod(position[0] + 180, 360) if is_south_node else position[0], position[3])
+    return rows
+
+
+def _get_conjunction_blocks(longitudes: np.ndarray, sun: np.ndarray) -> list:
+    """
+    (first row, last row) of every run of rows whose neighbours are both within
+    NEAR_SUN_DEGREES of the Sun, or have a conjunction between them.
+    """
+    elongations = np.mod(longitudes - sun + 180, 360) - 180
+    before, after = elongations[:-1], elongations[1:]
+
+    near = np.minimum(np.abs(before), np.abs(after)) < NEAR_SUN_DEGREES
+    # A sign change across 0°, not across the opposition at ±180°
+    crossing = (before * after < 0) & (np.abs(before) + np.abs(after) < 180)
+
+    flagged = np.concatenate([[False], near | crossing, [False]]).astype(np.int8)
+    changes = np.diff(flagged)
+    return list(zip(np.flatnonzero(changes == 1).tolist(), np.flatnonzero(changes == -1).tolist()))
+
+
+def build_ephemeris_store(
+    path: Union[str, Path],
+    start: float,
+    end: float,
+    step_days: float = 1.0,
+    points: Union[Sequence[str], None] = None,
+    zodiac_type: ZodiacType = DEFAULT_ZODIAC_TYPE,
+    sidereal_mode: Union[SiderealMode, None] = None,
+    perspective_type: PerspectiveType = DEFAULT_PERSPECTIVE_TYPE,
+    lat: float = 0.0,
+    lng: float = 0.0,
+) -> "EphemerisStore":
+    """
+    Writes longitudes and speeds of the points (all of them by default) from
+    start to end (UT Julian days, end included when it falls on a step) and
+    returns the store opened on the new file.
+    """
+    if end <= start or step_days <= 0:
+        raise KerykeionException("The end of the span must come after its start, with a positive step!")
+
+    sidereal_mode = resolve_sidereal_mode(zodiac_type, sidereal_mode)
+    planet_points = {name: (body_id, is_south_node) for name, body_id, is_south_node in get_planet_points()}
+    points = list(points) if points is not None else list(planet_points)
+    for point in points:
+        if point not in planet_points:
+            raise KerykeionException(f"'{point}' is not available! Available points are: {list(planet_points)}")
+    if "Sun" not in points:
+        points.append("Sun")
+
+    rows = math.floor((end - start) / step_days + 1e-9) + 1
+    # Rows already DENSE_STEP_DAYS apart need nothing denser
+    dense_steps = max(1, math.ceil(step_days / DENSE_STEP_DAYS - 1e-9))
+    metadata = {
+        "start": start,
+        "step_days": step_days,
+        "rows": rows,
+        "points": points,
+        "zodiac_type": zodiac_type,
+        "sidereal_mode": sidereal_mode,
+        "perspective_type": perspective_type,
+        "lat": lat,
+        "lng": lng,
+        "dense_steps": dense_steps,
+    }
+
+    with open(path, "w+b") as store_file, swiss_ephemeris_context(zodiac_type, sidereal_mode, perspective_type, lat, lng) as iflag:
+        # Written again once the dense rows are counted
+        store_file.write(b" " * HEADER_SIZE)
+
+        for first_row in range(0, rows, BUILD_CHUNK_ROWS):
+            julian_days = [start + row * step_days for row in range(first_row, min(first_row + BUILD_CHUNK_ROWS, rows))]
+            chunk, results = np.empty((len(julian_days), len(points), 2), dtype=STORE_DTYPE), {}
+            for column, point in enumerate(points):
+                body_id, is_south_node = planet_points[point]
+                # A south node is its north node shifted by 180 degrees
+                if body_id not in results:
+                    results[body_id] = _calculate(body_id, False, julian_days, iflag)
+                chunk[:, column] = results[body_id]
+                if is_south_node:
+                    chunk[:, column, 0] = np.fmod(chunk[:, column, 0] + 180, 360)
+
+            store_file.write(chunk.tobytes())
+
+        store_file.flush()
+        positions = np.memmap(store_file, dtype=STORE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(rows, len(points), 2))
+        sun = np.asarray(positions[:, points.index("Sun"), 0])
+
+        blocks, dense_rows = [], 0
+        for column, point in enumerate(points):
+            body_id, is_south_node = planet_points[point]
+            if body_id in UNDEFLECTED_BODIES or dense_steps == 1:
+                continue
+
+            for first_row, last_row in _get_conjunction_blocks(np.asarray(positions[:, column, 0]), sun):
+                steps = np.arange((last_row - first_row) * dense_steps + 1)
+                julian_days = (start + (first_row + steps / dense_steps) * step_days).tolist()
+                store_file.write(_calculate(body_id, is_south_node, julian_days, iflag).tobytes())
+
+                blocks.append((column, first_row, last_row, dense_rows))
+                dense_rows += len(julian_days)
+        del positions
+
+        store_file.write(np.array(blocks, dtype=BLOCK_DTYPE).reshape(-1, 4).tobytes())
+
+        metadata.update(dense_rows=dense_rows, blocks=len(blocks))
+        header = MAGIC + json.dumps(metadata).encode("utf-8")
+        if len(header) > HEADER_SIZE:
+            raise KerykeionException(f"Store metadata doesn't fit in {HEADER_SIZE} bytes!")
+        store_file.seek(0)
+        store_file.write(header.ljust(HEADER_SIZE, b" "))
+
+    return EphemerisStore(path)
+
+
+def _interpolate(before: np.ndarray, after: np.ndarray, t: np.ndarray, step_days: Union[float, np.ndarray]) -> tuple:
+    """Cubic Hermite (longitudes, speeds) between (longitude, speed) rows step_days apart, at t in [0, 1]."""
+    # Longitude travelled between the two rows, across 0° Aries if need be
+    travelled = np.mod(after[:, 0] - before[:, 0] + 180, 360) - 180
+    start_slope, end_slope = before[:, 1] * step_days, after[:, 1] * step_days
+
+    t2, t3 = t * t, t * t * t
+    longitudes = before[:, 0] + (t3 - 2 * t2 + t) * start_slope + (3 * t2 - 2 * t3) * travelled + (t3 - t2) * end_slope
+    speeds = ((3 * t2 - 4 * t + 1) * start_slope + (6 * t - 6 * t2) * travelled + (3 * t2 - 2 * t) * end_slope) / step_days
+    return longitudes, speeds
+
+
+class EphemerisStore:
+    """
+    Read-only view of a file written by build_ephemeris_store.
+
+    Positions between rows come from cubic Hermite interpolation of the
+    stored longitudes and speeds: with daily rows that's within
+    MAX_ERRORS_ARCSECONDS of the Swiss Ephemeris (0.6" for the Moon, under 0.1"
+    for the planets). Near a conjunction with the Sun, where daily rows would
+    miss the bending of a planet's light by up to ~13" (Neptune), positions are
+    interpolated between the planet's dense rows instead. The Moon and the
+    lunar points (UNDEFLECTED_BODIES) aren't bent and have none.
+
+    Pickling a store (e.g. to send it to a process pool) only sends its path:
+    the worker maps the same file.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = str(path)
+
+        with open(self.path, "rb") as store_file:
+            header = store_file.read(HEADER_SIZE)
+        if not header.startswith(MAGIC):
+            raise KerykeionException(f"{self.path} is not an ephemeris store (or was built by an older version, build it again)!")
+
+        metadata = json.loads(header[len(MAGIC):].decode("utf-8"))
+        self.start = metadata["start"]
+        self.step_days = metadata["step_days"]
+        self.rows = metadata["rows"]
+        self.points = metadata["points"]
+        self.zodiac_type = metadata["zodiac_type"]
+        self.sidereal_mode = metadata["sidereal_mode"]
+        self.perspective_type = metadata["perspective_type"]
+        self.lat = metadata["lat"]
+        self.lng = metadata["lng"]
+        self.dense_steps = metadata["dense_steps"]
+        self.end = self.start + (self.rows - 1) * self.step_days
+
+        self._columns = {point: column for column, point in enumerate(self.points)}
+        self.positions = np.memmap(self.path, dtype=STORE_DTYPE, mode="r", offset=HEADER_SIZE, shape=(self.rows, len(self.points), 2))
+
+        dense_offset = HEADER_SIZE + self.positions.nbytes
+        dense_shape = (metadata["dense_rows"], 2)
+        self.dense_positions = np.memmap(self.path, dtype=STORE_DTYPE, mode="r", offset=dense_offset, shape=dense_shape) if metadata["dense_rows"] else np.empty(dense_shape, dtype=STORE_DTYPE)
+
+        # Column -> (first rows, last rows, dense row offsets) of its blocks, in row order
+        blocks = np.fromfile(self.path, dtype=BLOCK_DTYPE, count=metadata["blocks"] * 4, offset=dense_offset + self.dense_positions.nbytes).reshape(-1, 4)
+        self._blocks = {
+            column: (blocks[blocks[:, 0] == column, 1], blocks[blocks[:, 0] == column, 2], blocks[blocks[:, 0] == column, 3])
+            for column in np.unique(blocks[:, 0]).tolist()
+        }
+
+    def __reduce__(self):
+        return (type(self), (self.path,))
+
+    def covers(self, julian_day: float, zodiac_type: ZodiacType, sidereal_mode: Union[SiderealMode, None], perspective_type: PerspectiveType, lat: float, lng: float) -> bool:
+        """Whether positions for this instant and these subject settings can come from the store."""
+        if not self.start <= julian_day <= self.end:
+            return False
+        if (zodiac_type, sidereal_mode, perspective_type) != (self.zodiac_type, self.sidereal_mode, self.perspective_type):
+            return False
+        return perspective_type != "Topocentric" or (lat, lng) == (self.lat, self.lng)
+
+    def get_positions(self, point: str, julian_days: Union[float, Sequence[float], np.ndarray]) -> tuple:
+        """(longitudes in [0, 360), speeds in degrees per day) at the given UT Julian days."""
+        if point not in self._columns:
+            raise KerykeionException(f"'{point}' is not in the store! Stored points are: {self.points}")
+
+        julian_days = np.asarray(julian_days, dtype=np.float64)
+        if julian_days.size and (julian_days.min() < self.start or julian_days.max() > self.end):
+            raise KerykeionException(f"Julian days outside of the stored span {self.start} - {self.end}!")
+
+        offsets = (julian_days.reshape(-1) - self.start) / self.step_days
+        row = np.clip(np.floor(offsets).astype(np.int64), 0, max(self.rows - 2, 0))
+        t = offsets - row
+
+        # Only the rows around the requested instants are read from the file
+        column = self._columns[point]
+        before, after = self.positions[row, column], self.positions[np.minimum(row + 1, self.rows - 1), column]
+        step_days = np.full(len(row), float(self.step_days))
+
+        if column in self._blocks:
+            first_rows, last_rows, dense_offsets = self._blocks[column]
+            block = np.maximum(np.searchsorted(first_rows, row, side="right") - 1, 0)
+            dense = np.flatnonzero((first_rows[block] <= row) & (row < last_rows[block]))
+            if dense.size:
+                block = block[dense]
+                dense_offsets_in_block = (offsets[dense] - first_rows[block]) * self.dense_steps
+                dense_row = np.minimum(np.floor(dense_offsets_in_block).astype(np.int64), (last_rows[block] - first_rows[block]) * self.dense_steps - 1)
+                t[dense] = dense_offsets_in_block - dense_row
+                before[dense] = self.dense_positions[dense_offsets[block] + dense_row]
+                after[dense] = self.dense_positions[dense_offsets[block] + dense_row + 1]
+                step_days[dense] = self.step_days / self.dense_steps
+
+        longitudes, speeds = _interpolate(before, after, t, step_days)
+        longitudes = np.mod(longitudes, 360)
+        # np.mod rounds a tiny negative longitude up to 360.0
+        longitudes[longitudes >= 360] = 0.0
+
+        return longitudes.reshape(julian_days.shape), speeds.reshape(julian_days.shape)
+
+    def get_position(self, point: str, julian_day: float) -> tuple:
+        """(longitude, speed) of one point at one UT Julian day."""
+        longitudes, speeds = self.get_positions(point, julian_day)
+        return float(longitudes), float(speeds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute a memory-mapped ephemeris store.")
+    parser.add_argument("path", help="File to write")
+    parser.add_argument("--start-year", type=int, default=1800)
+    parser.add_argument("--end-year", type=int, default=2200)
+    parser.add_argument("--step-hours", type=float, default=24.0)
+    arguments = parser.parse_args()
+
+    build_started = timeit.default_timer()
+    store = build_ephemeris_store(
+        arguments.path,
+        swe.julday(arguments.start_year, 1, 1, 0),
+        swe.julday(arguments.end_year, 1, 1, 0),
+        step_days=arguments.step_hours / 24,
+    )
+    print(f"{store.rows} rows x {len(store.points)} points written to {store.path} "
+          f"({Path(store.path).stat().st_size / 1e6:.1f} MB) in {timeit.default_timer() - build_started:.1f} s")
+
+    random_days = np.random.default_rng(0).uniform(store.start, store.end, 2000)
+    sun = np.asarray(store.positions[:, store.points.index("Sun"), 0])
+    with swiss_ephemeris_context() as iflag:
+        for name, body_id, is_south_node in get_planet_points():
+            if is_south_node:
+                continue
+            # Every 15 minutes around the first conjunctions with the Sun, where interpolation would be furthest off
+            elongations = np.abs(np.mod(store.positions[:, store.points.index(name), 0] - sun + 180, 360) - 180)
+            conjunction_rows = np.flatnonzero(elongations < 1)[:100]
+            conjunction_days = (store.start + store.step_days * (conjunction_rows[:, None] + np.arange(-96, 96)[None, :] / 96)).reshape(-1)
+            julian_days = np.concatenate([random_days, conjunction_days[(conjunction_days >= store.start) & (conjunction_days <= store.end)]])
+
+            expected = np.array([swe.calc_ut(julian_day, body_id, iflag)[0][0] for julian_day in julian_days.tolist()])
+            errors = np.abs(np.mod(store.get_positions(name, julian_days)[0] - expected + 180, 360) - 180) * 3600
+            print(f"  {name}: max interpolation error {errors.max():.3f}\" over {len(julian_days)} instants")
+            if store.step_days <= 1:
+                assert errors.max() <= MAX_ERRORS_ARCSECONDS.get(name, DEFAULT_MAX_ERROR_ARCSECONDS), name
@@ -0,0 +1,281 @@
+"""
+Drop-in replacements for kerykeion hot spots.
+
+kerykeion isn't vendored here, so the faster versions live in this module and
+apply_speedups() points kerykeion's own modules at them. Every replacement
+returns exactly what the function it replaces returns.
+
+get_settings is SettingsCache's, whose models are shared and read-only, so the
+two places kerykeion writes into its settings are replaced too: NatalAspects
+and SynastryAspects set the aspects' orbs (their all_aspects are AspectEngine's,
+which copy the aspects they change), KerykeionChartSVG marks its active points
+(parse_json_settings gives each chart its own copies of the points).
+"""
+import math
+import timeit
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Sequence, Union, get_args
+
+import kerykeion.aspects.aspects_utils
+import kerykeion.aspects.natal_aspects
+import kerykeion.aspects.synastry_aspects
+import kerykeion.astrological_subject
+import kerykeion.charts.kerykeion_chart_svg
+import kerykeion.composite_subject_factory
+import kerykeion.settings
+import kerykeion.settings.kerykeion_settings
+import kerykeion.utilities
+import swisseph as swe
+from kerykeion.aspects.aspects_utils import get_active_points_list as _upstream_get_active_points_list
+from kerykeion.aspects.aspects_utils import get_aspect_from_two_points as _upstream_get_aspect_from_two_points
+from kerykeion.aspects.aspects_utils import planet_id_decoder as _upstream_planet_id_decoder
+from kerykeion.kr_types import AxialCusps, Houses, KerykeionException, KerykeionPointModel, Planet, PointType, ZodiacSignModel
+from kerykeion.settings.config_constants import DEFAULT_ACTIVE_ASPECTS
+
+from AspectEngine import NO_ASPECT, AspectSettings, FastNatalAspects, FastSynastryAspects, filter_aspects_settings
+from SettingsCache import get_registered_entry, get_settings, get_writable_copy
+
+
+HOUSE_NAMES = get_args(Houses)
+
+# Built once at import, upstream builds these 12 validated models on every call
+ZODIAC_SIGNS = (
+    ZodiacSignModel(sign="Ari", quality="Cardinal", element="Fire", emoji="♈️", sign_num=0),
+    ZodiacSignModel(sign="Tau", quality="Fixed", element="Earth", emoji="♉️", sign_num=1),
+    ZodiacSignModel(sign="Gem", quality="Mutable", element="Air", emoji="♊️", sign_num=2),
+    ZodiacSignModel(sign="Can", quality="Cardinal", element="Water", emoji="♋️", sign_num=3),
+    ZodiacSignModel(sign="Leo", quality="Fixed", element="Fire", emoji="♌️", sign_num=4),
+    ZodiacSignModel(sign="Vir", quality="Mutable", element="Earth", emoji="♍️", sign_num=5),
+    ZodiacSignModel(sign="Lib", quality="Cardinal", element="Air", emoji="♎️", sign_num=6),
+    ZodiacSignModel(sign="Sco", quality="Fixed", element="Water", emoji="♏️", sign_num=7),
+    ZodiacSignModel(sign="Sag", quality="Mutable", element="Fire", emoji="♐️", sign_num=8),
+    ZodiacSignModel(sign="Cap", quality="Cardinal", element="Earth", emoji="♑️", sign_num=9),
+    ZodiacSignModel(sign="Aqu", quality="Fixed", element="Air", emoji="♒️", sign_num=10),
+    ZodiacSignModel(sign="Pis", quality="Mutable", element="Water", emoji="♓️", sign_num=11),
+)
+
+# The KerykeionPointModel fields that only depend on the sign, ready to splat
+_SIGN_FIELDS = tuple(
+    {"quality": sign.quality, "element": sign.element, "sign": sign.sign, "sign_num": sign.sign_num, "emoji": sign.emoji}
+    for sign in ZODIAC_SIGNS
+)
+
+# Original kerykeion functions, kept by apply_speedups() so remove_speedups() can put them back
+_ORIGINALS = {}
+
+
+def get_kerykeion_point_from_degree(degree: Union[int, float], name: Union[Planet, Houses, AxialCusps], point_type: PointType) -> KerykeionPointModel:
+    """
+    Same result as kerykeion.utilities.get_kerykeion_point_from_degree.
+
+    The sign fields come from the prebuilt table and the model is built with
+    model_construct: name and point type come from our own code and the rest from
+    the table, so there's nothing left for pydantic to validate.
+    """
+    if degree < 0 or degree >= 360:
+        raise KerykeionException(f"Error in calculating positions! Degrees: {degree}")
+
+    degree = float(degree)
+    return KerykeionPointModel.model_construct(
+        name=name,
+        position=degree % 30,
+        abs_pos=degree,
+        point_type=point_type,
+        **_SIGN_FIELDS[int(degree // 30)],
+    )
+
+
+class HouseLookup:
+    """
+    House cusps of one subject, rotated once so that finding a point's house is
+    a bisection instead of a scan over all 12 cusps.
+
+    Gives the same answers as kerykeion.utilities.get_planet_house: a point on a
+    cusp belongs to the house starting there, and when rounding makes a point
+    fall in two houses (or none) the linear scan decides, like upstream.
+    """
+
+    __slots__ = ("cusps", "widths", "offsets", "use_bisection")
+
+    def __init__(self, houses_degree_ut_list: Sequence[float]) -> None:
+        self.cusps = [cusp % 360 for cusp in houses_degree_ut_list]
+        self.widths = [math.fmod(self.cusps[(index + 1) % 12] - cusp + 360, 360) for index, cusp in enumerate(self.cusps)]
+        # Distance of every cusp from the first one, increasing around the circle
+        self.offsets = [math.fmod(cusp - self.cusps[0] + 360, 360) for cusp in self.cusps]
+        self.use_bisection = max(self.widths) <= 180 and self.offsets == sorted(self.offsets)
+
+    def _in_house(self, index: int, degree: float) -> bool:
+        # kerykeion.utilities.is_point_between for this house, without re-normalizing the cusps
+        start, end = self.cusps[index], self.cusps[(index + 1) % 12]
+        if degree == start:
+            return True
+        if degree == end:
+            return False
+        return math.fmod(degree - start + 360, 360) < self.widths[index]
+
+    def _scan(self, degree: float) -> Houses:
+        for index in range(12):
+            if self.widths[index] > 180:
+                raise KerykeionException(f"The angle between start and end point is not allowed to exceed 180°, yet is: {self.widths[index]}")
+            if self._in_house(index, degree):
+                return HOUSE_NAMES[index]
+
+        raise ValueError(f"Error in house calculation, planet: {degree}, houses: {self.cusps}")
+
+    def get_house(self, planet_position_degree: Union[int, float]) -> Houses:
+        degree = planet_position_degree % 360
+        if not self.use_bisection:
+            return self._scan(degree)
+
+        index = bisect_right(self.offsets, math.fmod(degree - self.cusps[0] + 360, 360)) - 1
+        if self._in_house(index, degree) and not (index > 0 and self._in_house(index - 1, degree)):
+            return HOUSE_NAMES[index]
+
+        # Right on a cusp, up to rounding: let the scan pick the same house upstream would
+        return self._scan(degree)
+
+
+@lru_cache(maxsize=256)
+def get_house_lookup(houses_degree_ut: tuple) -> HouseLookup:
+    """HouseLookup per set of cusps, so a subject's ~20 house lookups share one."""
+    return HouseLookup(houses_degree_ut)
+
+
+def get_planet_house(planet_position_degree: Union[int, float], houses_degree_ut_list: Sequence[float]) -> Houses:
+    """Same result as kerykeion.utilities.get_planet_house, by bisection."""
+    return get_house_lookup(tuple(houses_degree_ut_list)).get_house(planet_position_degree)
+
+
+def get_aspect_from_two_points(aspects_settings: list, point_one: Union[int, float], point_two: Union[int, float]) -> dict:
+    """
+    Same result as kerykeion.aspects.aspects_utils.get_aspect_from_two_points.
+
+    The aspect settings filter_aspects_settings returns (all NatalAspects and
+    SynastryAspects use once patched) carry their compiled AspectTable, so the
+    aspect is one lookup instead of a scan over the settings. Any other list is
+    scanned by upstream.
+    """
+    if type(aspects_settings) is not AspectSettings:
+        return _upstream_get_aspect_from_two_points(aspects_settings, point_one, point_two)
+
+    table = aspects_settings.aspect_table
+    distance = abs(swe.difdeg2n(point_one, point_two))
+
+    aspect_id = table.ids[int(distance)]
+    if aspect_id == NO_ASPECT:
+        verdict, name, aspect_degrees = False, None, 0
+    else:
+        verdict = True
+        name, aspect_degrees, _ = table.aspects[aspect_id]
+
+    return {
+        "verdict": verdict,
+        "name": name,
+        "orbit": distance - aspect_degrees,
+        "distance": distance - aspect_degrees,
+        "aspect_degrees": aspect_degrees,
+        "diff": abs(point_one - point_two),
+    }
+
+
+def planet_id_decoder(planets_settings: list, name: str) -> int:
+    """Same result as kerykeion.aspects.aspects_utils.planet_id_decoder, from the settings cache index when there is one."""
+    entry = get_registered_entry(planets_settings)
+    if entry is None:
+        return _upstream_planet_id_decoder(planets_settings, name)
+
+    point_id = entry.point_ids.get(str(name))
+    if point_id is None:
+        raise ValueError(f"Planet {name} not found in the settings")
+    return point_id
+
+
+def get_active_points_list(subject, settings, active_points: list = []) -> list:
+    """Same result as kerykeion.aspects.aspects_utils.get_active_points_list, from the settings cache index when there is one."""
+    entry = get_registered_entry(settings)
+    if entry is None:
+        return _upstream_get_active_points_list(subject, settings, active_points)
+
+    return [subject[name.lower()] for name in entry.get_active_points(active_points)]
+
+
+def parse_json_settings(self, settings_file_or_dict) -> None:
+    """KerykeionChartSVG.parse_json_settings, with points of its own for the chart to mark active."""
+    settings = get_settings(settings_file_or_dict)
+
+    self.language_settings = settings["language_settings"][self.chart_language]
+    self.chart_colors_settings = settings["chart_colors"]
+    self.planets_settings = [get_writable_copy(point) for point in settings["celestial_points"]]
+    self.aspects_settings = settings["aspects"]
+
+
+def _patch(module, attribute: str, replacement) -> None:
+    _ORIGINALS.setdefault((module, attribute), getattr(module, attribute))
+    setattr(module, attribute, replacement)
+
+
+def apply_speedups() -> None:
+    """Points kerykeion (and the modules that imported from it by name) at the fast versions."""
+    for module in (kerykeion.utilities, kerykeion.astrological_subject, kerykeion.composite_subject_factory):
+        _patch(module, "get_kerykeion_point_from_degree", get_kerykeion_point_from_degree)
+        _patch(module, "get_planet_house", get_planet_house)
+    for module in (kerykeion.aspects.aspects_utils, kerykeion.aspects.natal_aspects, kerykeion.aspects.synastry_aspects):
+        _patch(module, "get_aspect_from_two_points", get_aspect_from_two_points)
+        _patch(module, "planet_id_decoder", planet_id_decoder)
+        _patch(module, "get_active_points_list", get_active_points_list)
+    for module in (
+        kerykeion,
+        kerykeion.settings,
+        kerykeion.settings.kerykeion_settings,
+        kerykeion.aspects.natal_aspects,
+        kerykeion.aspects.synastry_aspects,
+        kerykeion.charts.kerykeion_chart_svg,
+    ):
+        _patch(module, "get_settings", get_settings)
+    # The writers of the settings, see the module docstring
+    _patch(kerykeion.NatalAspects, "all_aspects", FastNatalAspects.__dict__["all_aspects"])
+    _patch(kerykeion.SynastryAspects, "all_aspects", FastSynastryAspects.__dict__["all_aspects"])
+    _patch(kerykeion.charts.kerykeion_chart_svg.KerykeionChartSVG, "parse_json_settings", parse_json_settings)
+
+
+def remove_speedups() -> None:
+    """Restores the original kerykeion functions."""
+    for (module, attribute), original in _ORIGINALS.items():
+        setattr(module, attribute, original)
+    _ORIGINALS.clear()
+
+
+def benchmark_subject(number: int = 200) -> float:
+    """Milliseconds to build one offline AstrologicalSubject, with whatever is currently patched in."""
+    def build_subject():
+        kerykeion.AstrologicalSubject("Benchmark", 1990, 6, 15, 12, 30, "Rome", "IT", lng=12.49, lat=41.89, tz_str="Europe/Rome", online=False)
+
+    build_subject()
+    return timeit.timeit(build_subject, number=number) / number * 1000
+
+
+if __name__ == "__main__":
+    points_per_subject = 30
+
+    upstream_point = timeit.timeit(lambda: kerykeion.utilities.get_kerykeion_point_from_degree(123.45, "Sun", "Planet"), number=20000) / 20000 * 1e6
+    fast_point = timeit.timeit(lambda: get_kerykeion_point_from_degree(123.45, "Sun", "Planet"), number=20000) / 20000 * 1e6
+    print(f"get_kerykeion_point_from_degree: {upstream_point:.1f} µs -> {fast_point:.1f} µs ({points_per_subject * (upstream_point - fast_point) / 1000:.2f} ms saved per subject)")
+
+    cusps = (10.5, 38.2, 66.9, 97.3, 128.8, 159.1, 190.5, 218.2, 246.9, 277.3, 308.8, 339.1)
+    upstream_house = timeit.timeit(lambda: kerykeion.utilities.get_planet_house(300.0, cusps), number=20000) / 20000 * 1e6
+    fast_house = timeit.timeit(lambda: get_planet_house(300.0, cusps), number=20000) / 20000 * 1e6
+    print(f"get_planet_house: {upstream_house:.1f} µs -> {fast_house:.1f} µs")
+
+    aspects_settings = filter_aspects_settings(get_settings().aspects, DEFAULT_ACTIVE_ASPECTS)
+    for label, settings in (("models", aspects_settings), ("dicts", filter_aspects_settings([aspect.model_dump() for aspect in aspects_settings], DEFAULT_ACTIVE_ASPECTS))):
+        assert get_aspect_from_two_points(settings, 10.5, 131.25) == kerykeion.aspects.aspects_utils.get_aspect_from_two_points(settings, 10.5, 131.25)
+        upstream_aspect = timeit.timeit(lambda: kerykeion.aspects.aspects_utils.get_aspect_from_two_points(settings, 10.5, 131.25), number=20000) / 20000 * 1e6
+        fast_aspect = timeit.timeit(lambda: get_aspect_from_two_points(settings, 10.5, 131.25), number=20000) / 20000 * 1e6
+        print(f"get_aspect_from_two_points ({label}): {upstream_aspect:.1f} µs -> {fast_aspect:.1f} µs")
+
+    before = benchmark_subject()
+    apply_speedups()
+    after = benchmark_subject()
+    remove_speedups()
+    print(f"AstrologicalSubject: {before:.2f} ms -> {after:.2f} ms")
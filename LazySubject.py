@@ -0,0 +1,302 @@
+"""
+Lazy astrological subject.
+
+LazyAstrologicalSubject has the same attributes as kerykeion's AstrologicalSubject,
+but it only works out the time zone and Julian day up front. Planets, axes, houses
+and the lunar phase are computed the first time they're read, so a Sun sign or
+Ascendant lookup doesn't pay for the ~30 other points.
+"""
+import logging
+import math
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Sequence, Union, get_args
+
+import swisseph as swe
+from kerykeion import AstrologicalSubject
+from kerykeion.astrological_subject import (
+    DEFAULT_GEONAMES_CACHE_EXPIRE_AFTER_DAYS,
+    DEFAULT_GEONAMES_USERNAME,
+    DEFAULT_HOUSES_SYSTEM_IDENTIFIER,
+    DEFAULT_PERSPECTIVE_TYPE,
+    DEFAULT_ZODIAC_TYPE,
+    GEONAMES_DEFAULT_USERNAME_WARNING,
+    NOW,
+)
+from kerykeion.kr_types import (
+    HousesSystemIdentifier,
+    KerykeionException,
+    PerspectiveType,
+    SiderealMode,
+    ZodiacType,
+)
+from kerykeion.utilities import calculate_moon_phase, check_and_adjust_polar_latitude
+
+from ChebyshevEphemeris import ChebyshevEphemeris
+from EphemerisEngine import (
+    AXIAL_CUSPS,
+    CHIRON_AND_LILITH_POINTS,
+    HOUSE_NAMES,
+    PLANET_POINTS,
+    PointCalculation,
+    calculate_declination,
+    calculate_houses,
+    calculate_point,
+    get_swe_flags,
+    resolve_sidereal_mode,
+    swiss_ephemeris_context,
+)
+from KerykeionSpeedups import get_kerykeion_point_from_degree, get_planet_house
+from TimeConversion import localize_datetime, utc_datetime_to_julian_day
+
+
+# Attribute name -> (point name, Swiss Ephemeris id, is south node)
+PLANET_ATTRIBUTES = {name.lower(): (name, body_id, is_south_node) for name, body_id, is_south_node in PLANET_POINTS + CHIRON_AND_LILITH_POINTS}
+AXIS_ATTRIBUTES = {name.lower(): name for name in AXIAL_CUSPS}
+HOUSE_ATTRIBUTES = {name.lower(): index for index, name in enumerate(HOUSE_NAMES)}
+
+
+class LazyAstrologicalSubject(AstrologicalSubject):
+    """
+    Drop-in AstrologicalSubject that computes each point on first access.
+
+    Takes the same arguments as AstrologicalSubject. Reading subject.sun (or
+    subject["sun"], subject.get("sun")) runs one swe.calc_ut and builds one
+    KerykeionPointModel; house cusps are computed once, the first time a point
+    needs them. model() and json() compute whatever is still missing.
+
+    Every swe.calc_ut result is kept whole in a per-subject table, so speed,
+    latitude, distance and declination come for free with the position:
+    subject.get_calculation("Mars").longitude_speed, subject.get_declination("Moon").
+
+    With a chebyshev_ephemeris fitted for the subject's settings and date, planet
+    positions and retrograde flags come from its polynomials instead (within its
+    max_errors_arcseconds), unless the fitted speed is within the fit's
+    max_speed_errors_arcseconds of zero; get_calculation and the values derived
+    from it are always computed with the Swiss Ephemeris.
+    """
+
+    def __init__(
+        self,
+        name="Now",
+        year: int = NOW.year,
+        month: int = NOW.month,
+        day: int = NOW.day,
+        hour: int = NOW.hour,
+        minute: int = NOW.minute,
+        city: Union[str, None] = None,
+        nation: Union[str, None] = None,
+        lng: Union[int, float, None] = None,
+        lat: Union[int, float, None] = None,
+        tz_str: Union[str, None] = None,
+        geonames_username: Union[str, None] = None,
+        zodiac_type: Union[ZodiacType, None] = DEFAULT_ZODIAC_TYPE,
+        online: bool = True,
+        disable_chiron: Union[None, bool] = None,
+        sidereal_mode: Union[SiderealMode, None] = None,
+        houses_system_identifier: Union[HousesSystemIdentifier, None] = DEFAULT_HOUSES_SYSTEM_IDENTIFIER,
+        perspective_type: Union[PerspectiveType, None] = DEFAULT_PERSPECTIVE_TYPE,
+        cache_expire_after_days: Union[int, None] = DEFAULT_GEONAMES_CACHE_EXPIRE_AFTER_DAYS,
+        is_dst: Union[None, bool] = None,
+        disable_chiron_and_lilith: bool = False,
+        chebyshev_ephemeris: Union[ChebyshevEphemeris, None] = None,
+    ) -> None:
+        # Deprecated upstream, where it only warns and is otherwise ignored
+        if disable_chiron is not None:
+            warnings.warn(
+                "The 'disable_chiron' argument is deprecated and will be removed in a future version. "
+                "Please use 'disable_chiron' instead.",
+                DeprecationWarning
+            )
+
+            if disable_chiron_and_lilith:
+                raise ValueError("Cannot specify both 'disable_chiron' and 'disable_chiron_and_lilith'. Use 'disable_chiron_and_lilith' only.")
+
+        self.name = name
+        self.year = year
+        self.month = month
+        self.day = day
+        self.hour = hour
+        self.minute = minute
+        self.online = online
+        self.json_dir = Path.home()
+        self.disable_chiron = disable_chiron
+        self.is_dst = is_dst
+        self.disable_chiron_and_lilith = disable_chiron_and_lilith
+        self.chebyshev_ephemeris = chebyshev_ephemeris
+        self.city = city or "London"
+        self.nation = nation or "GB"
+        self.lat = lat if lat or online else 51.5074
+        self.lng = lng if lng or online else 0
+        self.tz_str = tz_str
+        self.zodiac_type = zodiac_type or DEFAULT_ZODIAC_TYPE
+        self.perspective_type = perspective_type or DEFAULT_PERSPECTIVE_TYPE
+        self.houses_system_identifier = houses_system_identifier or DEFAULT_HOUSES_SYSTEM_IDENTIFIER
+        self.cache_expire_after_days = cache_expire_after_days or DEFAULT_GEONAMES_CACHE_EXPIRE_AFTER_DAYS
+
+        if geonames_username is None and online and (not lat or not lng or not tz_str):
+            logging.warning(GEONAMES_DEFAULT_USERNAME_WARNING)
+            self.geonames_username = DEFAULT_GEONAMES_USERNAME
+        else:
+            self.geonames_username = geonames_username # type: ignore
+
+        if (not self.online) and (not tz_str):
+            raise KerykeionException("You need to set the coordinates and timezone if you want to use the offline mode!")
+
+        if self.houses_system_identifier not in get_args(HousesSystemIdentifier):
+            raise KerykeionException(f"'{self.houses_system_identifier}' is NOT a valid house system! Available systems are: {get_args(HousesSystemIdentifier)}")
+
+        self.houses_system_name = swe.house_name(self.houses_system_identifier.encode("ascii"))
+        self.sidereal_mode = resolve_sidereal_mode(self.zodiac_type, sidereal_mode)
+
+        if (self.online) and (not self.tz_str) and (not self.lat) and (not self.lng):
+            self._fetch_and_set_tz_and_coordinates_from_geonames()
+
+        self.lat = check_and_adjust_polar_latitude(self.lat)
+        self._iflag = get_swe_flags(self.zodiac_type, self.perspective_type)
+
+        local_datetime, utc_object = localize_datetime(datetime(self.year, self.month, self.day, self.hour, self.minute), self.tz_str, self.is_dst)
+        self.iso_formatted_local_datetime = local_datetime.isoformat()
+        self.iso_formatted_utc_datetime = utc_object.isoformat()
+        self.julian_day = utc_datetime_to_julian_day(utc_object)
+        self._calculations = {}
+
+        self.houses_names_list = list(HOUSE_NAMES)
+        self.axial_cusps_names_list = list(AXIAL_CUSPS)
+        self.planets_names_list = [name for name, _, _ in PLANET_POINTS]
+        if not self.disable_chiron_and_lilith:
+            self.planets_names_list += [name for name, _, _ in CHIRON_AND_LILITH_POINTS]
+
+    def __getattr__(self, item):
+        # Only called when the attribute isn't set yet: compute it, cache it in __dict__.
+        if item.startswith("__"):
+            raise AttributeError(item)
+
+        if item in PLANET_ATTRIBUTES:
+            value = self._compute_planet(*PLANET_ATTRIBUTES[item])
+        elif item in AXIS_ATTRIBUTES:
+            value = self._compute_axis(AXIS_ATTRIBUTES[item])
+        elif item in HOUSE_ATTRIBUTES:
+            value = get_kerykeion_point_from_degree(self._houses_degree_ut[HOUSE_ATTRIBUTES[item]], HOUSE_NAMES[HOUSE_ATTRIBUTES[item]], point_type="House")
+        elif item in ("_houses_degree_ut", "_ascmc"):
+            self._compute_houses()
+            return self.__dict__[item]
+        elif item == "_houses_list":
+            value = [getattr(self, house_name.lower()) for house_name in HOUSE_NAMES]
+        elif item == "lunar_phase":
+            value = calculate_moon_phase(self.moon.abs_pos, self.sun.abs_pos)
+        else:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{item}'")
+
+        self.__dict__[item] = value
+        return value
+
+    def _swiss_ephemeris_context(self):
+        # Another subject (or thread) may have changed the global ayanamsa or topocentric position since __init__
+        return swiss_ephemeris_context(self.zodiac_type, self.sidereal_mode, self.perspective_type, self.lat, self.lng)
+
+    def _compute_houses(self) -> None:
+        with self._swiss_ephemeris_context():
+            self._houses_degree_ut, self._ascmc = calculate_houses(self.julian_day, self.lat, self.lng, self.houses_system_identifier, self.zodiac_type)
+
+    def get_calculation(self, point_name: str) -> PointCalculation:
+        """Longitude, latitude, distance and their speeds for a planet, computed once per subject."""
+        if point_name not in self._calculations:
+            if point_name.lower() not in PLANET_ATTRIBUTES:
+                raise KerykeionException(f"'{point_name}' has no Swiss Ephemeris calculation!")
+
+            name, body_id, is_south_node = PLANET_ATTRIBUTES[point_name.lower()]
+            if self.disable_chiron_and_lilith and body_id in (swe.CHIRON, swe.MEAN_APOG):
+                raise KerykeionException(f"'{name}' is disabled for this subject!")
+
+            with self._swiss_ephemeris_context():
+                self._calculations[point_name] = calculate_point(self.julian_day, body_id, self._iflag, is_south_node)
+
+        return self._calculations[point_name]
+
+    def get_speed(self, point_name: str) -> float:
+        """Longitude speed in degrees per day, negative when retrograde."""
+        return self.get_calculation(point_name).longitude_speed
+
+    def get_latitude(self, point_name: str) -> float:
+        """Ecliptic latitude in degrees."""
+        return self.get_calculation(point_name).latitude
+
+    def get_declination(self, point_name: str) -> float:
+        """Equatorial declination in degrees."""
+        calculation = self.get_calculation(point_name)
+        with self._swiss_ephemeris_context():
+            return calculate_declination(calculation, self.julian_day, self.zodiac_type)
+
+    def _compute_planet(self, name: str, body_id: int, is_south_node: bool):
+        if self.disable_chiron_and_lilith and body_id in (swe.CHIRON, swe.MEAN_APOG):
+            return None
+
+        fitted = self.chebyshev_ephemeris is not None and name in self.chebyshev_ephemeris.segments and self.chebyshev_ephemeris.covers(
+            self.julian_day, self.zodiac_type, self.sidereal_mode, self.perspective_type, self.lat, self.lng
+        )
+        if fitted:
+            longitude, longitude_speed = self.chebyshev_ephemeris.get_position(name, self.julian_day)
+            # Right at a station only the Swiss Ephemeris can tell which way the point moves
+            fitted = abs(longitude_speed) * 3600 > self.chebyshev_ephemeris.max_speed_errors_arcseconds[name]
+
+        if not fitted:
+            calculation = self.get_calculation(name)
+            longitude, longitude_speed = calculation.longitude, calculation.longitude_speed
+
+        point = get_kerykeion_point_from_degree(longitude, name, point_type="Planet")
+        point.house = get_planet_house(longitude, self._houses_degree_ut)
+        # Retrograde comes from the same result as the position, no second swe.calc_ut
+        point.retrograde = longitude_speed < 0
+        return point
+
+    def _compute_axis(self, name: str):
+        ascendant, medium_coeli = self._ascmc[0], self._ascmc[1]
+        degree = {
+            "Ascendant": ascendant,
+            "Descendant": math.fmod(ascendant + 180, 360),
+            "Medium_Coeli": medium_coeli,
+            "Imum_Coeli": math.fmod(medium_coeli + 180, 360),
+        }[name]
+
+        point = get_kerykeion_point_from_degree(degree, name, point_type="AxialCusps")
+        point.house = get_planet_house(degree, self._houses_degree_ut)
+        point.retrograde = False
+        return point
+
+    def compute_all(self) -> None:
+        """Computes every point that hasn't been read yet."""
+        for attribute in list(PLANET_ATTRIBUTES) + list(AXIS_ATTRIBUTES) + list(HOUSE_ATTRIBUTES) + ["_houses_list", "lunar_phase", "utc_time", "local_time"]:
+            getattr(self, attribute)
+
+    def json(self, dump=False, destination_folder: Union[str, None] = None, indent: Union[int, None] = None) -> str:
+        self.compute_all()
+        return super().json(dump=dump, destination_folder=destination_folder, indent=indent)
+
+    def model(self):
+        self.compute_all()
+        return super().model()
+
+
+def compute_subjects_concurrently(subjects_options: Sequence[dict], max_workers: Union[int, None] = None) -> List[LazyAstrologicalSubject]:
+    """
+    Fully computed subjects for a list of LazyAstrologicalSubject keyword
+    arguments, on a thread pool. Zodiac types and perspectives can be mixed:
+    every calculation runs inside swiss_ephemeris_context.
+    """
+    def compute_subject(options: dict) -> LazyAstrologicalSubject:
+        subject = LazyAstrologicalSubject(**options)
+        subject.compute_all()
+        return subject
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(compute_subject, subjects_options))
+
+
+if __name__ == "__main__":
+    subject = LazyAstrologicalSubject("Johnny Depp", 1963, 6, 9, 0, 0, "Owensboro", "US", lng=-87.11, lat=37.77, tz_str="America/Chicago", online=False)
+    print(f"Sun sign: {subject.sun.sign}, Ascendant: {subject['ascendant'].sign}")
+    print(f"Mars speed: {subject.get_speed('Mars'):.4f} deg/day, Moon declination: {subject.get_declination('Moon'):.2f}")
+    print(f"Computed so far: {[key for key in subject.__dict__ if key in PLANET_ATTRIBUTES or key in AXIS_ATTRIBUTES]}")
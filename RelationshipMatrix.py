@@ -0,0 +1,175 @@
+"""
+Relationship scores of a whole group.
+
+Scoring every pair of a group with RelationshipScoreFactory builds one
+SynastryAspects per pair: 250k of them for 500 people. RelationshipMatrix
+reads each subject's scored points once and scores blocks of rows at a time
+with the aspect matrix, in a process pool for large groups. A pair scores the
+same both ways round, so only the upper triangle is scored and mirrored. The
+aspects behind one pair's score come from the real RelationshipScoreFactory,
+on demand.
+"""
+import timeit
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence, Union
+
+import numpy as np
+from kerykeion import AstrologicalSubject
+from kerykeion.kr_types import AstrologicalSubjectModel, RelationshipScoreModel
+from kerykeion.relationship_score.relationship_score_factory import RelationshipScoreFactory
+from kerykeion.settings.config_constants import DEFAULT_ACTIVE_ASPECTS
+
+from AspectEngine import filter_aspects_settings
+from CompatibilityIndex import ModelRelationshipScoreFactory, get_relationship_scores, get_scored_positions, get_scoring_aspects
+from SettingsCache import get_settings
+from SubjectRecord import SubjectRecord, records_to_array
+
+
+# Rows scored together, so the intermediate arrays stay around ROWS_PER_BLOCK x N
+ROWS_PER_BLOCK = 256
+
+# Below this many subjects the whole matrix takes less than starting the workers
+MIN_POOL_SUBJECTS = 2000
+
+
+def _score_upper_rows(positions: dict, sun_qualities: np.ndarray, rows_count: int, aspects_settings: list, scoring_aspects: List[int]) -> List[np.ndarray]:
+    """
+    The upper triangle of the first rows_count rows, a block of rows at a time:
+    each block of ROWS_PER_BLOCK rows is scored against every subject from its first row on.
+    """
+    blocks = []
+    for start in range(0, rows_count, ROWS_PER_BLOCK):
+        rows = slice(start, min(start + ROWS_PER_BLOCK, rows_count))
+        blocks.append(get_relationship_scores(
+            {point: point_positions[rows] for point, point_positions in positions.items()},
+            sun_qualities[rows],
+            {point: point_positions[start:] for point, point_positions in positions.items()},
+            sun_qualities[start:],
+            aspects_settings,
+            scoring_aspects,
+        ).astype(np.int16))
+
+    return blocks
+
+
+def _split_triangle(rows_count: int, chunks_count: int) -> List[int]:
+    """First rows of at most chunks_count row chunks with about the same share of the upper triangle."""
+    chunks_count = max(1, min(chunks_count, rows_count))
+    shares = np.arange(chunks_count) / chunks_count
+    return sorted(set(np.floor(rows_count * (1 - np.sqrt(1 - shares))).astype(int).tolist()))
+
+
+class RelationshipMatrix:
+    """
+    Scores of every ordered pair of a group stored as a SUBJECT_RECORD_DTYPE
+    array, or built from subjects with from_subjects.
+
+    get_score_matrix()[i, j] is RelationshipScoreFactory(subject i, subject j)
+    score value, with the default kerykeion settings, active points and active
+    aspects (the diagonal pairs each subject with itself).
+
+    - workers: number of worker processes for groups of at least MIN_POOL_SUBJECTS.
+        None or 1 scores everything in this process.
+    """
+
+    # Row chunks per worker, like BatchEphemerisDataFactory
+    CHUNKS_PER_WORKER = 4
+
+    def __init__(self, subjects: np.ndarray, use_only_major_aspects: bool = True, workers: Union[int, None] = None) -> None:
+        self.subjects = subjects
+        self.use_only_major_aspects = use_only_major_aspects
+        self.workers = workers
+
+        settings = get_settings()
+        # Plain dicts: they go to the workers with every chunk
+        self.aspects_settings = [
+            {"name": aspect["name"], "degree": aspect["degree"], "orb": aspect["orb"]}
+            for aspect in filter_aspects_settings(settings.aspects, DEFAULT_ACTIVE_ASPECTS, first_match_only=False)
+        ]
+        self.scoring_aspects = get_scoring_aspects(self.aspects_settings, use_only_major_aspects)
+
+        self.sun_qualities = np.ascontiguousarray(subjects["sun_quality"])
+        self.positions = get_scored_positions(subjects)
+        self._score_matrix: Union[np.ndarray, None] = None
+
+    @classmethod
+    def from_subjects(
+        cls,
+        subjects: Sequence[Union[AstrologicalSubject, AstrologicalSubjectModel, SubjectRecord]],
+        use_only_major_aspects: bool = True,
+        workers: Union[int, None] = None,
+    ) -> "RelationshipMatrix":
+        records = [subject if isinstance(subject, SubjectRecord) else SubjectRecord.from_subject(subject) for subject in subjects]
+        return cls(records_to_array(records), use_only_major_aspects, workers)
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    def _use_pool(self) -> bool:
+        return bool(self.workers) and self.workers > 1 and len(self) >= MIN_POOL_SUBJECTS
+
+    def get_score_matrix(self) -> np.ndarray:
+        """(N, N) int16 score values, computed on first use."""
+        if self._score_matrix is not None:
+            return self._score_matrix
+
+        if not self._use_pool():
+            parts = [(0, _score_upper_rows(self.positions, self.sun_qualities, len(self), self.aspects_settings, self.scoring_aspects))]
+        else:
+            # The first rows have the most columns to score
+            first_rows = _split_triangle(len(self), self.workers * self.CHUNKS_PER_WORKER)
+            ends = first_rows[1:] + [len(self)]
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                parts = list(zip(first_rows, executor.map(
+                    _score_upper_rows,
+                    [{point: positions[first_row:] for point, positions in self.positions.items()} for first_row in first_rows],
+                    [self.sun_qualities[first_row:] for first_row in first_rows],
+                    [end - first_row for first_row, end in zip(first_rows, ends)],
+                    [self.aspects_settings] * len(first_rows),
+                    [self.scoring_aspects] * len(first_rows),
+                )))
+
+        score_matrix = np.empty((len(self), len(self)), dtype=np.int16)
+        for first_row, blocks in parts:
+            for index, block in enumerate(blocks):
+                start = first_row + index * ROWS_PER_BLOCK
+                stop = start + len(block)
+                # The block's own square whole, the columns after it mirrored below it
+                score_matrix[start:stop, start:] = block
+                score_matrix[stop:, start:stop] = block[:, stop - start:].T
+
+        self._score_matrix = score_matrix
+        return self._score_matrix
+
+    def get_subject(self, index: int) -> AstrologicalSubjectModel:
+        return SubjectRecord.from_row(self.subjects[index]).to_model()
+
+    def get_relationship_score(self, first: int, second: int) -> RelationshipScoreModel:
+        """The full RelationshipScoreFactory result of one pair, with the aspects behind its score."""
+        return ModelRelationshipScoreFactory(self.get_subject(first), self.get_subject(second), self.use_only_major_aspects).get_relationship_score()
+
+
+if __name__ == "__main__":
+    from kerykeion.utilities import setup_logging
+
+    setup_logging(level="critical")
+
+    rng = np.random.default_rng(0)
+    group = [
+        AstrologicalSubject(f"Member {index}", int(rng.integers(1950, 2005)), int(rng.integers(1, 13)), int(rng.integers(1, 29)), int(rng.integers(0, 24)), int(rng.integers(0, 60)), "Rome", "IT", lng=12.49, lat=41.89, tz_str="Europe/Rome", online=False)
+        for index in range(500)
+    ]
+
+    matrix = RelationshipMatrix.from_subjects(group)
+    matrix_seconds = timeit.timeit(lambda: RelationshipMatrix(matrix.subjects).get_score_matrix(), number=3) / 3
+    scores = matrix.get_score_matrix()
+
+    pairs = rng.integers(0, len(group), (100, 2)).tolist()
+    pair_seconds = timeit.timeit(lambda: [RelationshipScoreFactory(group[first], group[second]).get_relationship_score() for first, second in pairs], number=1) / len(pairs)
+    assert all(scores[first, second] == RelationshipScoreFactory(group[first], group[second]).get_relationship_score().score_value for first, second in pairs)
+
+    print(f"{len(group)} x {len(group)} scores: {matrix_seconds * 1000:.0f} ms, pair by pair ~{pair_seconds * len(group) ** 2:.0f} s")
+    first, second = np.unravel_index(np.argmax(scores - np.diag(np.diag(scores))), scores.shape)
+    best = matrix.get_relationship_score(int(first), int(second))
+    print(f"Best pair: {group[first].name} & {group[second].name}, {best.score_value} ({best.score_description}): "
+          f"{', '.join(f'{aspect.p1_name} {aspect.aspect} {aspect.p2_name}' for aspect in best.aspects)}")
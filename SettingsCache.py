@@ -0,0 +1,303 @@
+"""
+Process-wide kerykeion settings cache.
+
+kerykeion.settings.get_settings validates kr.config.json into a new
+KerykeionSettingsModel on every call, and a chart calls it at least twice
+(KerykeionChartSVG.parse_json_settings, then NatalAspects or
+SynastryAspects). Here every settings source is validated once: files are
+keyed by resolved path, modification time and size, dicts by a hash of their
+content.
+
+get_settings hands every caller the same cached model, made read-only: its
+models are frozen and its lists and dicts raise on any change, so no caller
+can change what the others see. The two places kerykeion writes into its
+settings get their own copies instead (see KerykeionSpeedups.apply_speedups),
+and get_writable_copy makes one of any cached model.
+
+What kerykeion derives from the settings again and again hangs off the cache
+entry (CachedSettings): point name -> id, the active points in settings order
+and the filtered aspects with their compiled tables (see AspectEngine).
+get_settings_entry finds the entry of any settings model get_settings returned.
+"""
+import hashlib
+import json
+import os
+import threading
+import timeit
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, List, Sequence, Union
+
+from kerykeion.kr_types import KerykeionSettingsModel
+from pydantic import BaseModel, ConfigDict
+
+import kerykeion.settings.kerykeion_settings
+
+
+# Settings sources kept validated
+SETTINGS_CACHE_SIZE = 32
+
+DEFAULT_SETTINGS_FILE = os.path.join(os.path.dirname(kerykeion.settings.kerykeion_settings.__file__), "kr.config.json")
+
+_entries: "OrderedDict[tuple, CachedSettings]" = OrderedDict()
+
+# id() of the settings models with an entry, and of their celestial points and aspects lists -> (object getter, entry)
+_handed_out = {}
+
+# get_settings is called from worker threads (LazyAstrologicalSubject, EphemerisEngine)
+_lock = threading.Lock()
+
+# Read-only model type -> the kerykeion model type it was made from
+_writable_types = {}
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError("Cached settings are read-only, change a copy from get_writable_copy")
+
+
+class ReadOnlyList(list):
+    """A list that raises on any change."""
+
+    __slots__ = ()
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+
+    def __reduce_ex__(self, protocol):
+        return type(self), (list(self),)
+
+
+class ReadOnlyDict(dict):
+    """A dict that raises on any change."""
+
+    __slots__ = ()
+
+    update = setdefault = pop = popitem = clear = _read_only
+    __setitem__ = __delitem__ = __ior__ = _read_only
+
+    def __reduce_ex__(self, protocol):
+        return type(self), (dict(self),)
+
+
+@lru_cache(maxsize=None)
+def _get_read_only_type(model_type: type) -> type:
+    """A frozen subclass of a pydantic model type: pydantic refuses to set its fields."""
+    read_only_type = type(model_type.__name__, (model_type,), {
+        "__slots__": (),
+        "__module__": model_type.__module__,
+        "__qualname__": model_type.__qualname__,
+        "model_config": ConfigDict(**model_type.model_config, frozen=True),
+        # Pickled as kerykeion's model, frozen again when loaded
+        "__reduce__": lambda model: (_freeze, (get_writable_copy(model),)),
+    })
+    _writable_types[read_only_type] = model_type
+    return read_only_type
+
+
+def _set_model_state(model: BaseModel, values: dict, source: BaseModel) -> BaseModel:
+    # What model_construct sets, without going through it
+    object.__setattr__(model, "__dict__", values)
+    object.__setattr__(model, "__pydantic_fields_set__", set(source.__pydantic_fields_set__))
+    object.__setattr__(model, "__pydantic_extra__", source.__pydantic_extra__)
+    object.__setattr__(model, "__pydantic_private__", source.__pydantic_private__)
+    return model
+
+
+def _freeze(value):
+    """A read-only copy of a settings value: every model frozen, every list and dict read-only."""
+    if type(value) in _writable_types:
+        return value
+    if isinstance(value, BaseModel):
+        values = {name: _freeze(item) for name, item in value.__dict__.items()}
+        return _set_model_state(object.__new__(_get_read_only_type(type(value))), values, value)
+    if isinstance(value, list):
+        return ReadOnlyList(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return ReadOnlyDict((key, _freeze(item)) for key, item in value.items())
+    return value
+
+
+def get_writable_copy(model: BaseModel, **update) -> BaseModel:
+    """
+    A shallow copy of a settings model, of the kerykeion model type, whose fields
+    can be set; update sets some of them, like model_copy's.
+    """
+    model_type = _writable_types.get(type(model), type(model))
+    copy = _set_model_state(object.__new__(model_type), {**model.__dict__, **update}, model)
+    copy.__pydantic_fields_set__.update(update)
+    return copy
+
+
+class CachedSettings:
+    """One validated settings source and the indexes derived from it."""
+
+    def __init__(self, settings: KerykeionSettingsModel, keep_alive: bool = True) -> None:
+        # Entries of models from elsewhere must not keep them alive (see _register_weakly)
+        self._get_settings = (lambda: settings) if keep_alive else weakref.ref(settings)
+
+        self.point_ids = {}
+        for point in settings.celestial_points:
+            # planet_id_decoder returns the first match
+            self.point_ids.setdefault(point["name"], point["id"])
+
+        self._indexes = {}
+
+    @property
+    def settings(self) -> KerykeionSettingsModel:
+        return self._get_settings()
+
+    def get_index(self, key: tuple, build: Callable[[], object]) -> object:
+        """What build derives from the settings, built once per key."""
+        index = self._indexes.get(key)
+        if index is None:
+            # Two threads may both build it; they keep the one stored first
+            index = self._indexes.setdefault(key, build())
+        return index
+
+    def get_active_points(self, active_points: Sequence[str]) -> List[str]:
+        """Names of the active points in settings order, like get_active_points_list."""
+        key = tuple(active_points)
+        return self.get_index(("active_points", key), lambda: [point["name"] for point in self.settings.celestial_points if point["name"] in key])
+
+    def _get_registered(self) -> tuple:
+        return self.settings, self.settings.celestial_points, self.settings.aspects
+
+
+def _register_cached(entry: CachedSettings) -> None:
+    # Kept alive by the entry, so the ids can't be reused until it's evicted
+    for registered in entry._get_registered():
+        _handed_out[id(registered)] = (lambda registered=registered: registered, entry)
+
+
+def _register_weakly(entry: CachedSettings) -> None:
+    # Dropped as soon as the model goes away; until then it keeps its lists alive, so no id can be reused
+    settings, *lists = entry._get_registered()
+    _handed_out[id(settings)] = (weakref.ref(settings), entry)
+    for registered in lists:
+        _handed_out[id(registered)] = (lambda registered=registered: registered, entry)
+    weakref.finalize(settings, _unregister, *map(id, entry._get_registered()))
+
+
+def _unregister(*ids: int) -> None:
+    for registered_id in ids:
+        _handed_out.pop(registered_id, None)
+
+
+def _get_entry(key: tuple, load) -> CachedSettings:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+
+        entry = CachedSettings(_freeze(KerykeionSettingsModel(**load())))
+        _entries[key] = entry
+        _register_cached(entry)
+        if len(_entries) > SETTINGS_CACHE_SIZE:
+            _, evicted = _entries.popitem(last=False)
+            _unregister(*map(id, evicted._get_registered()))
+        return entry
+
+
+@lru_cache(maxsize=64)
+def _resolve(settings_file: str) -> str:
+    return os.path.realpath(settings_file)
+
+
+def _load_settings_file(settings_file: str) -> dict:
+    with open(settings_file, "r", encoding="utf8") as settings_json:
+        return json.load(settings_json)
+
+
+def get_settings(new_settings_file: Union[Path, None, KerykeionSettingsModel, dict] = None) -> KerykeionSettingsModel:
+    """
+    Same result as kerykeion.settings.get_settings, from the cache: the one
+    read-only model of the settings source, shared by every caller.
+
+    A settings file is read again when its modification time or size changes. A
+    KerykeionSettingsModel is returned as is, like upstream does.
+    """
+    if isinstance(new_settings_file, KerykeionSettingsModel):
+        get_settings_entry(new_settings_file)
+        return new_settings_file
+
+    if isinstance(new_settings_file, dict):
+        content_hash = hashlib.sha1(json.dumps(new_settings_file, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return _get_entry(("dict", content_hash), lambda: new_settings_file).settings
+
+    # Same lookup order as upstream: the given file, the system wide config, the package default
+    if new_settings_file is not None:
+        settings_file = os.fspath(new_settings_file)
+        if not os.path.exists(settings_file):
+            raise FileNotFoundError(f"File {new_settings_file} does not exist")
+    else:
+        settings_file = os.path.join(os.path.expanduser("~"), ".config", "kerykeion", "kr.config.json")
+
+    try:
+        stat = os.stat(settings_file)
+    except FileNotFoundError:
+        settings_file = DEFAULT_SETTINGS_FILE
+        stat = os.stat(settings_file)
+
+    settings_file = _resolve(settings_file)
+    return _get_entry(("file", settings_file, stat.st_mtime_ns, stat.st_size), lambda: _load_settings_file(settings_file)).settings
+
+
+def get_registered_entry(registered: object) -> Union[CachedSettings, None]:
+    """
+    The cache entry of a settings model that get_settings handed out, or of its
+    celestial points or aspects list; None for anything else.
+    """
+    found = _handed_out.get(id(registered))
+    if found is not None and found[0]() is registered:
+        return found[1]
+    return None
+
+
+def get_settings_entry(settings: KerykeionSettingsModel) -> CachedSettings:
+    """The cache entry behind a model get_settings returned (a new one for any other model)."""
+    with _lock:
+        entry = get_registered_entry(settings)
+        if entry is None:
+            entry = CachedSettings(settings, keep_alive=False)
+            _register_weakly(entry)
+        return entry
+
+
+def clear_settings_cache() -> None:
+    """Forgets every validated settings source (the models already handed out keep working)."""
+    with _lock:
+        for entry in _entries.values():
+            _unregister(*map(id, entry._get_registered()))
+        _entries.clear()
+
+
+if __name__ == "__main__":
+    upstream = kerykeion.settings.kerykeion_settings.get_settings
+    # The read-only models are subclasses of kerykeion's, which pydantic never finds equal to them
+    assert get_settings().model_dump() == upstream().model_dump()
+    assert get_settings() is get_settings()
+
+    # Nothing a caller can change
+    shared = get_settings()
+    for change in (
+        lambda: setattr(shared.chart_colors, "paper_0", "#123456"),
+        lambda: shared.general_settings.__setitem__("axes_orbit", 99),
+        lambda: shared.celestial_points[0].related_zodiac_signs.append(1),
+        lambda: shared.language_settings.pop("EN"),
+    ):
+        try:
+            change()
+        except (TypeError, ValueError):
+            continue
+        raise AssertionError("cached settings changed")
+
+    point = get_writable_copy(shared.celestial_points[0], color="#123456")
+    point["is_active"] = True
+    assert type(point) is type(upstream().celestial_points[0]) and shared.celestial_points[0].is_active is None
+
+    upstream_ms = timeit.timeit(upstream, number=200) / 200 * 1000
+    cached_ms = timeit.timeit(get_settings, number=200) / 200 * 1000
+    print(f"get_settings: {upstream_ms:.3f} ms -> {cached_ms:.3f} ms")
@@ -0,0 +1,292 @@
+"""
+Compact subject records for bulk workloads.
+
+An AstrologicalSubject carries ~30 pydantic KerykeionPointModel objects, each
+with its own copies of the sign, element and quality strings. SubjectRecord
+keeps one float per point plus small integer codes, and rebuilds the exact
+AstrologicalSubjectModel on demand. For analytics, a list of records turns into
+one NumPy structured array with a column per point and field.
+"""
+import tracemalloc
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import List, Sequence, Union, get_args
+
+import numpy as np
+import swisseph as swe
+from kerykeion import AstrologicalSubject
+from kerykeion.kr_types import (
+    AstrologicalSubjectModel,
+    Element,
+    HousesSystemIdentifier,
+    PerspectiveType,
+    Quality,
+    SiderealMode,
+    ZodiacType,
+)
+from kerykeion.utilities import calculate_moon_phase
+
+from EphemerisEngine import AXIAL_CUSPS, CHIRON_AND_LILITH_POINTS, HOUSE_NAMES, PLANET_POINTS, SIGN_NAMES
+from KerykeionSpeedups import ZODIAC_SIGNS, get_kerykeion_point_from_degree
+
+
+# Every point a subject has, in storage order
+PLANET_NAMES = [name for name, _, _ in PLANET_POINTS + CHIRON_AND_LILITH_POINTS]
+POINT_NAMES = PLANET_NAMES + AXIAL_CUSPS + HOUSE_NAMES
+POINT_TYPES = ["Planet"] * len(PLANET_NAMES) + ["AxialCusps"] * len(AXIAL_CUSPS) + ["House"] * len(HOUSE_NAMES)
+
+# Integer codes: the index in these lists
+ELEMENT_NAMES = list(get_args(Element))
+QUALITY_NAMES = list(get_args(Quality))
+ZODIAC_TYPES = list(get_args(ZodiacType))
+SIDEREAL_MODES = [None] + list(get_args(SiderealMode))
+HOUSES_SYSTEM_IDENTIFIERS = list(get_args(HousesSystemIdentifier))
+PERSPECTIVE_TYPES = list(get_args(PerspectiveType))
+
+# Sign code -> element / quality code
+SIGN_ELEMENT_CODES = np.array([ELEMENT_NAMES.index(sign.element) for sign in ZODIAC_SIGNS], dtype=np.int8)
+SIGN_QUALITY_CODES = np.array([QUALITY_NAMES.index(sign.quality) for sign in ZODIAC_SIGNS], dtype=np.int8)
+
+# -1 stands for None in the house and retrograde codes
+NO_CODE = -1
+
+SUBJECT_RECORD_DTYPE = np.dtype(
+    [
+        ("name", object),
+        ("year", np.int16),
+        ("month", np.int8),
+        ("day", np.int8),
+        ("hour", np.int8),
+        ("minute", np.int8),
+        ("city", object),
+        ("nation", object),
+        ("lng", np.float64),
+        ("lat", np.float64),
+        ("tz_str", object),
+        ("utc_offset", np.int32),
+        ("julian_day", np.float64),
+        ("zodiac_type", np.int8),
+        ("sidereal_mode", np.int8),
+        ("houses_system_identifier", np.int8),
+        ("perspective_type", np.int8),
+    ]
+    + [
+        (f"{point.lower()}_{field}", dtype)
+        for point in POINT_NAMES
+        for field, dtype in (
+            ("abs_pos", np.float64),
+            ("sign", np.int8),
+            ("element", np.int8),
+            ("quality", np.int8),
+            ("house", np.int8),
+            ("retrograde", np.int8),
+        )
+    ]
+)
+
+
+class SubjectRecord:
+    """
+    One subject in ~1 KB instead of ~30 pydantic models.
+
+    Positions are kept as one float per point (NaN for a disabled Chiron or
+    Lilith). Signs, houses and retrograde flags are int8 codes, and
+    everything else (position in sign, element, quality, lunar phase, names
+    lists) is derived again by to_model().
+    """
+
+    __slots__ = (
+        "name", "year", "month", "day", "hour", "minute", "city", "nation", "lng", "lat", "tz_str",
+        "utc_offset", "julian_day", "zodiac_type", "sidereal_mode", "houses_system_identifier", "perspective_type",
+        "abs_pos", "signs", "houses", "retrograde",
+    )
+
+    def __init__(self, **fields) -> None:
+        for slot in self.__slots__:
+            setattr(self, slot, fields[slot])
+
+    @classmethod
+    def from_subject(cls, subject: Union[AstrologicalSubject, AstrologicalSubjectModel]) -> "SubjectRecord":
+        """Packs an AstrologicalSubject (or its model) into a record."""
+        abs_pos, signs, houses, retrograde = array("d"), array("b"), array("b"), array("b")
+
+        for point_name in POINT_NAMES:
+            point = subject[point_name.lower()]
+            if point is None:
+                abs_pos.append(float("nan"))
+                signs.append(NO_CODE)
+                houses.append(NO_CODE)
+                retrograde.append(NO_CODE)
+                continue
+
+            abs_pos.append(point.abs_pos)
+            signs.append(point.sign_num)
+            houses.append(HOUSE_NAMES.index(point.house) if point.house is not None else NO_CODE)
+            retrograde.append(int(point.retrograde) if point.retrograde is not None else NO_CODE)
+
+        return cls(
+            name=subject.name,
+            year=subject.year,
+            month=subject.month,
+            day=subject.day,
+            hour=subject.hour,
+            minute=subject.minute,
+            city=subject.city,
+            nation=subject.nation,
+            lng=subject.lng,
+            lat=subject.lat,
+            tz_str=subject.tz_str,
+            utc_offset=int(datetime.fromisoformat(subject.iso_formatted_local_datetime).utcoffset().total_seconds()),
+            julian_day=subject.julian_day,
+            zodiac_type=subject.zodiac_type,
+            sidereal_mode=subject.sidereal_mode,
+            houses_system_identifier=subject.houses_system_identifier,
+            perspective_type=subject.perspective_type,
+            abs_pos=abs_pos,
+            signs=signs,
+            houses=houses,
+            retrograde=retrograde,
+        )
+
+    def to_model(self) -> AstrologicalSubjectModel:
+        """Rebuilds the same AstrologicalSubjectModel the subject's model() returned."""
+        local_datetime = datetime(self.year, self.month, self.day, self.hour, self.minute, tzinfo=timezone(timedelta(seconds=self.utc_offset)))
+        utc_datetime = local_datetime.astimezone(timezone.utc)
+
+        points = {}
+        for index, point_name in enumerate(POINT_NAMES):
+            if self.signs[index] == NO_CODE:
+                points[point_name.lower()] = None
+                continue
+
+            point = get_kerykeion_point_from_degree(self.abs_pos[index], point_name, POINT_TYPES[index])
+            if self.houses[index] != NO_CODE:
+                point.house = HOUSE_NAMES[self.houses[index]]
+            if self.retrograde[index] != NO_CODE:
+                point.retrograde = bool(self.retrograde[index])
+            points[point_name.lower()] = point
+
+        planets_names_list = [name for name in PLANET_NAMES if points[name.lower()] is not None]
+
+        return AstrologicalSubjectModel(
+            name=self.name,
+            year=self.year,
+            month=self.month,
+            day=self.day,
+            hour=self.hour,
+            minute=self.minute,
+            city=self.city,
+            nation=self.nation,
+            lng=self.lng,
+            lat=self.lat,
+            tz_str=self.tz_str,
+            zodiac_type=self.zodiac_type,
+            sidereal_mode=self.sidereal_mode,
+            houses_system_identifier=self.houses_system_identifier,
+            houses_system_name=swe.house_name(self.houses_system_identifier.encode("ascii")),
+            perspective_type=self.perspective_type,
+            iso_formatted_local_datetime=local_datetime.isoformat(),
+            iso_formatted_utc_datetime=utc_datetime.isoformat(),
+            julian_day=self.julian_day,
+            utc_time=_float_hours(utc_datetime),
+            local_time=_float_hours(local_datetime),
+            planets_names_list=planets_names_list,
+            axial_cusps_names_list=list(AXIAL_CUSPS),
+            houses_names_list=list(HOUSE_NAMES),
+            lunar_phase=calculate_moon_phase(points["moon"].abs_pos, points["sun"].abs_pos),
+            **points,
+        )
+
+    def to_row(self) -> tuple:
+        """This record as one row of SUBJECT_RECORD_DTYPE."""
+        point_fields = []
+        for index in range(len(POINT_NAMES)):
+            sign = self.signs[index]
+            has_sign = sign != NO_CODE
+            point_fields += [
+                self.abs_pos[index],
+                sign,
+                SIGN_ELEMENT_CODES[sign] if has_sign else NO_CODE,
+                SIGN_QUALITY_CODES[sign] if has_sign else NO_CODE,
+                self.houses[index],
+                self.retrograde[index],
+            ]
+
+        return (
+            self.name, self.year, self.month, self.day, self.hour, self.minute, self.city, self.nation, self.lng, self.lat,
+            self.tz_str, self.utc_offset, self.julian_day,
+            ZODIAC_TYPES.index(self.zodiac_type),
+            SIDEREAL_MODES.index(self.sidereal_mode),
+            HOUSES_SYSTEM_IDENTIFIERS.index(self.houses_system_identifier),
+            PERSPECTIVE_TYPES.index(self.perspective_type),
+            *point_fields,
+        )
+
+    @classmethod
+    def from_row(cls, row: np.void) -> "SubjectRecord":
+        """Record back from one row of a SUBJECT_RECORD_DTYPE array."""
+        points = [point.lower() for point in POINT_NAMES]
+
+        return cls(
+            name=row["name"],
+            year=int(row["year"]),
+            month=int(row["month"]),
+            day=int(row["day"]),
+            hour=int(row["hour"]),
+            minute=int(row["minute"]),
+            city=row["city"],
+            nation=row["nation"],
+            lng=float(row["lng"]),
+            lat=float(row["lat"]),
+            tz_str=row["tz_str"],
+            utc_offset=int(row["utc_offset"]),
+            julian_day=float(row["julian_day"]),
+            zodiac_type=ZODIAC_TYPES[row["zodiac_type"]],
+            sidereal_mode=SIDEREAL_MODES[row["sidereal_mode"]],
+            houses_system_identifier=HOUSES_SYSTEM_IDENTIFIERS[row["houses_system_identifier"]],
+            perspective_type=PERSPECTIVE_TYPES[row["perspective_type"]],
+            abs_pos=array("d", [row[f"{point}_abs_pos"] for point in points]),
+            signs=array("b", [row[f"{point}_sign"] for point in points]),
+            houses=array("b", [row[f"{point}_house"] for point in points]),
+            retrograde=array("b", [row[f"{point}_retrograde"] for point in points]),
+        )
+
+
+def _float_hours(date: datetime) -> float:
+    # Same formula as AstrologicalSubject.utc_time / local_time
+    return date.hour + date.minute / 60 + (date.second + date.microsecond / 1_000_000) / 3600
+
+
+def records_to_array(records: Sequence[SubjectRecord]) -> np.ndarray:
+    """
+    One SUBJECT_RECORD_DTYPE row per record, e.g. array["sun_sign"] is every
+    subject's Sun sign code and array["moon_element"] every Moon element code.
+    """
+    return np.array([record.to_row() for record in records], dtype=SUBJECT_RECORD_DTYPE)
+
+
+def array_to_records(subjects: np.ndarray) -> List[SubjectRecord]:
+    return [SubjectRecord.from_row(row) for row in subjects]
+
+
+if __name__ == "__main__":
+    subjects_count = 200
+
+    tracemalloc.start()
+    subjects = [
+        AstrologicalSubject(f"Subject {index}", 1950 + index % 50, 1 + index % 12, 1 + index % 28, 8 + index % 12, index % 60, "Rome", "IT", lng=12.49, lat=41.89, tz_str="Europe/Rome", online=False)
+        for index in range(subjects_count)
+    ]
+    subjects_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    records = [SubjectRecord.from_subject(subject) for subject in subjects]
+    records_size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    subjects_array = records_to_array(records)
+    assert all(record.to_model() == subject.model() for record, subject in zip(array_to_records(subjects_array), subjects))
+
+    print(f"AstrologicalSubject: {subjects_size / subjects_count:.0f} B, SubjectRecord: {records_size / subjects_count:.0f} B, array row: {SUBJECT_RECORD_DTYPE.itemsize} B")
+    print(f"Sun sign counts: {dict(zip(SIGN_NAMES, np.bincount(subjects_array['sun_sign'], minlength=12).tolist()))}")
@@ -0,0 +1,158 @@
+"""
+Local time -> UTC -> Julian day conversion.
+
+Same results as AstrologicalSubject (minute resolution, pytz is_dst semantics,
+AmbiguousTimeError turned into a KerykeionException), but time zones are
+loaded once and whole arrays of local datetimes are converted at once from each
+zone's table of UTC offset transitions. Only times close to a transition go
+through pytz's localize one by one.
+"""
+import timeit
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Sequence, Union
+
+import numpy as np
+import pytz
+import swisseph as swe
+from kerykeion.kr_types import KerykeionException
+
+
+# Julian day of 1970-01-01 00:00 UT
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+SECONDS_PER_DAY = 86400
+
+_UNIX_EPOCH = datetime(1970, 1, 1)
+_NO_TRANSITION = np.iinfo(np.int64).max // 2
+
+
+@lru_cache(maxsize=512)
+def get_timezone(tz_str: str) -> pytz.BaseTzInfo:
+    """pytz.timezone, loaded once per zone name."""
+    return pytz.timezone(tz_str)
+
+
+@lru_cache(maxsize=512)
+def get_transition_table(tz_str: str) -> tuple:
+    """
+    (local_starts, local_ends, offsets) in seconds since 1970-01-01, one entry per
+    UTC offset period of the zone: the offset is offsets[i] for local wall-clock
+    times in [local_starts[i], local_ends[i]). Fixed-offset zones have one period.
+    """
+    timezone = get_timezone(tz_str)
+
+    if hasattr(timezone, "_utc_transition_times"):
+        utc_starts = np.array([int((transition - _UNIX_EPOCH).total_seconds()) for transition in timezone._utc_transition_times], dtype=np.int64)
+        offsets = np.array([int(info[0].total_seconds()) for info in timezone._transition_info], dtype=np.int64)
+        # pytz's first transition is a datetime(1, 1, 1) placeholder: everything before it uses the first offset too
+        utc_starts[0] = -_NO_TRANSITION
+    else:
+        utc_starts = np.array([-_NO_TRANSITION], dtype=np.int64)
+        offsets = np.array([int(timezone.utcoffset(_UNIX_EPOCH).total_seconds())], dtype=np.int64)
+
+    utc_ends = np.append(utc_starts[1:], _NO_TRANSITION)
+    return utc_starts + offsets, utc_ends + offsets, offsets
+
+
+def localize_datetime(date: datetime, tz_str: str, is_dst: Union[bool, None] = None) -> tuple:
+    """(local, utc) aware datetimes for a wall-clock time, with the same minute resolution as AstrologicalSubject."""
+    naive_datetime = datetime(date.year, date.month, date.day, date.hour, date.minute, 0)
+
+    try:
+        local_datetime = get_timezone(tz_str).localize(naive_datetime, is_dst=is_dst)
+    except pytz.exceptions.AmbiguousTimeError:
+        raise KerykeionException("Ambiguous time! Please specify if the time is in DST or not with the is_dst argument.")
+
+    return local_datetime, local_datetime.astimezone(pytz.utc)
+
+
+def utc_datetime_to_julian_day(utc_object: datetime) -> float:
+    return float(swe.julday(utc_object.year, utc_object.month, utc_object.day, utc_object.hour + (utc_object.minute / 60)))
+
+
+def local_datetime_to_julian_day(date: datetime, tz_str: str, is_dst: Union[bool, None] = None) -> float:
+    """Local wall-clock time to UT Julian day, the same way AstrologicalSubject does it."""
+    return utc_datetime_to_julian_day(localize_datetime(date, tz_str, is_dst)[1])
+
+
+def datetime_to_julian_day(date: datetime) -> float:
+    """UT Julian day of an aware datetime (naive ones are taken as UTC), to the microsecond."""
+    if date.tzinfo is not None:
+        date = date.astimezone(pytz.utc).replace(tzinfo=None)
+    return UNIX_EPOCH_JULIAN_DAY + (date - _UNIX_EPOCH) / timedelta(days=1)
+
+
+def julian_day_to_utc_datetime(julian_day: float) -> datetime:
+    """Aware UTC datetime of a UT Julian day, rounded to the microsecond."""
+    return (_UNIX_EPOCH + timedelta(days=julian_day - UNIX_EPOCH_JULIAN_DAY)).replace(tzinfo=pytz.utc)
+
+
+def _utc_offsets(local_seconds: np.ndarray, tz_str: str) -> tuple:
+    """UTC offset of each local time, and whether it's unambiguous (inside exactly one offset period)."""
+    local_starts, local_ends, offsets = get_transition_table(tz_str)
+
+    period = np.searchsorted(local_starts, local_seconds, side="right") - 1
+    period = np.clip(period, 0, None)
+    in_period = local_seconds < local_ends[period]
+    # After a clock change backwards, the previous period's wall-clock times overlap this one's
+    in_previous_period = (period > 0) & (local_seconds < local_ends[np.clip(period - 1, 0, None)])
+
+    exact = in_period & ~in_previous_period & (local_seconds >= local_starts[period])
+    if np.any(np.diff(local_starts) < 0):
+        # Periods out of order in wall-clock time, leave the whole zone to pytz
+        exact[:] = False
+
+    return offsets[period], exact
+
+
+def local_datetimes_to_julian_days(
+    dates: Union[Sequence[datetime], np.ndarray],
+    tz_str: Union[str, Sequence[str]],
+    is_dst: Union[bool, None] = None,
+) -> np.ndarray:
+    """
+    UT Julian days for a whole array of local wall-clock times, equal to calling
+    local_datetime_to_julian_day on each one.
+
+    dates can be datetimes or a datetime64 array (seconds are dropped, like
+    AstrologicalSubject does), tz_str one zone for all of them or one zone per
+    date. Times in a DST gap or overlap are resolved by pytz with is_dst, and
+    raise the same exceptions.
+    """
+    local_minutes = np.asarray(dates, dtype="datetime64[m]")
+    local_seconds = local_minutes.astype(np.int64) * 60
+    utc_seconds = np.empty_like(local_seconds)
+
+    zones = np.full(len(local_seconds), tz_str, dtype=object) if isinstance(tz_str, str) else np.asarray(tz_str, dtype=object)
+    if len(zones) != len(local_seconds):
+        raise KerykeionException(f"Got {len(local_seconds)} dates but {len(zones)} time zones!")
+
+    for zone in set(zones.tolist()):
+        rows = np.flatnonzero(zones == zone)
+        offsets, exact = _utc_offsets(local_seconds[rows], zone)
+        utc_seconds[rows] = local_seconds[rows] - offsets
+
+        for row in rows[~exact].tolist():
+            utc_object = localize_datetime(local_minutes[row].astype(datetime), zone, is_dst)[1]
+            utc_seconds[row] = int((utc_object.replace(tzinfo=None) - _UNIX_EPOCH).total_seconds())
+
+    # Same arithmetic as swe.julday(year, month, day, hour + minute / 60), which only looks at whole UTC minutes
+    days, seconds_of_day = np.divmod(utc_seconds, SECONDS_PER_DAY)
+    hours = seconds_of_day // 3600 + (seconds_of_day % 3600 // 60) / 60
+    return UNIX_EPOCH_JULIAN_DAY + days + hours / 24
+
+
+if __name__ == "__main__":
+    dates = [datetime(1950 + index % 70, 1 + index % 12, 1 + index % 28, index % 24, index % 60) for index in range(5000)]
+    zones = ["Europe/Rome", "America/New_York", "Asia/Tokyo", "UTC"]
+    tz_strs = [zones[index % len(zones)] for index in range(len(dates))]
+
+    def convert_one_by_one():
+        return [local_datetime_to_julian_day(date, tz_str, is_dst=False) for date, tz_str in zip(dates, tz_strs)]
+
+    # is_dst=False settles the times that fall in a DST gap or overlap
+    batch = local_datetimes_to_julian_days(dates, tz_strs, is_dst=False)
+    assert batch.tolist() == convert_one_by_one()
+
+    print(f"{len(dates)} dates: one by one {timeit.timeit(convert_one_by_one, number=3) / 3 * 1000:.1f} ms, "
+          f"batch {timeit.timeit(lambda: local_datetimes_to_julian_days(dates, tz_strs, is_dst=False), number=3) / 3 * 1000:.1f} ms")
@@ -0,0 +1,292 @@
+"""
+Natal transit timeline.
+
+Every aspect a transiting planet makes to a natal point over a range of dates,
+with the moment it comes into orb, each exact hit and the moment it leaves orb.
+Aspects and orbs come from the kerykeion settings (kr.config.json) and the
+active aspects, the same way SynastryAspects(transit, natal).relevant_aspects
+classifies them.
+
+Nothing is sampled at a fixed resolution: the orb edges and exact aspects are
+fixed longitudes, so each crossing is root-found on the transiting planet's
+longitude between its samples and stations (see EphemerisEvents).
+"""
+import math
+import timeit
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Union
+
+from kerykeion import AstrologicalSubject
+from kerykeion.aspects.natal_aspects import AXES_LIST
+from kerykeion.kr_types import AspectName, AstrologicalSubjectModel, KerykeionException, KerykeionSettingsModel
+from kerykeion.settings.config_constants import DEFAULT_ACTIVE_ASPECTS, DEFAULT_ACTIVE_POINTS
+
+from AspectEngine import NO_ASPECT, filter_aspects_settings
+from EphemerisEvents import TOLERANCE_DAYS, EphemerisEventFinder, find_root
+from EphemerisEngine import swiss_ephemeris_context
+from SettingsCache import get_settings
+from TimeConversion import datetime_to_julian_day, julian_day_to_utc_datetime
+
+
+# Newton steps on the cubic through a piece's ends, then on the Swiss Ephemeris itself
+HERMITE_STEPS = 4
+NEWTON_STEPS = 6
+
+
+@dataclass
+class TransitAspect:
+    """
+    One stretch of time a transiting point spends in one aspect to a natal point.
+
+    entry_julian_day is None when the aspect is already in orb at the start of
+    the range, exit_julian_day None when it's still in orb at the end. A
+    retrograde loop inside the orb gives several exact hits.
+    """
+
+    transit_point: str
+    natal_point: str
+    aspect: AspectName
+    aspect_degrees: int
+    entry_julian_day: Union[float, None]
+    exit_julian_day: Union[float, None]
+    exact_julian_days: List[float] = field(default_factory=list)
+
+    @property
+    def entry_datetime(self) -> Union[datetime, None]:
+        return julian_day_to_utc_datetime(self.entry_julian_day) if self.entry_julian_day is not None else None
+
+    @property
+    def exit_datetime(self) -> Union[datetime, None]:
+        return julian_day_to_utc_datetime(self.exit_julian_day) if self.exit_julian_day is not None else None
+
+    @property
+    def exact_datetimes(self) -> List[datetime]:
+        return [julian_day_to_utc_datetime(julian_day) for julian_day in self.exact_julian_days]
+
+
+def _wrap(angle: float) -> float:
+    """Angle in [-180, 180)."""
+    return math.fmod(angle + 540, 360) - 180
+
+
+class TransitTimelineFinder(EphemerisEventFinder):
+    """
+    Transits to one natal chart.
+
+        finder = TransitTimelineFinder(natal_subject)
+        transits = finder.find_transits(datetime(2024, 1, 1), datetime(2025, 1, 1))
+
+    The transiting points are the active points without the axes, computed with
+    the natal chart's zodiac, ayanamsa and perspective settings.
+    """
+
+    def __init__(
+        self,
+        natal_subject: Union[AstrologicalSubject, AstrologicalSubjectModel],
+        new_settings_file: Union[Path, KerykeionSettingsModel, dict, None] = None,
+        active_points: list = DEFAULT_ACTIVE_POINTS,
+        active_aspects: list = DEFAULT_ACTIVE_ASPECTS,
+    ) -> None:
+        super().__init__(
+            zodiac_type=natal_subject.zodiac_type,
+            sidereal_mode=natal_subject.sidereal_mode,
+            perspective_type=natal_subject.perspective_type,
+            lat=natal_subject.lat,
+            lng=natal_subject.lng,
+            disable_chiron_and_lilith=natal_subject.chiron is None,
+        )
+        settings = get_settings(new_settings_file)
+        self.axes_orbit = settings.general_settings.axes_orbit
+
+        # (name, degree, orb) in settings order, with the active aspects' orbs, like SynastryAspects.all_aspects
+        self.aspect_table = filter_aspects_settings(settings.aspects, active_aspects, first_match_only=False).aspect_table
+        self.aspects = list(self.aspect_table.aspects)
+
+        # Same order as get_active_points_list
+        self.natal_points = {}
+        for point in settings.celestial_points:
+            if point["name"] in active_points and natal_subject[point["name"].lower()] is not None:
+                self.natal_points[point["name"]] = natal_subject[point["name"].lower()]["abs_pos"]
+
+        self._targets = self._get_targets()
+        self.transit_points = [point["name"] for point in settings.celestial_points if point["name"] in active_points and point["name"] in self.points and point["name"] not in AXES_LIST]
+
+    def _get_aspect(self, distance: float, is_axis: bool) -> Union[int, None]:
+        """Index in self.aspects of the aspect at this distance, the same way get_aspect_from_two_points and relevant_aspects decide."""
+        index = self.aspect_table.ids[int(distance)]
+        if index == NO_ASPECT or (is_axis and abs(distance - self.aspects[index][1]) >= self.axes_orbit):
+            return None
+        return index
+
+    def _get_targets(self) -> list:
+        """
+        Sorted (transit longitude, natal point, aspect degree) for the orb edges and
+        exact aspects of every natal point. The aspect degree is None for an orb edge.
+        """
+        # get_aspect_from_two_points checks int(distance), so an orb ends one degree past degree + orb
+        edges = set()
+        for _, degree, orb in self.aspects:
+            edges.update((degree - orb, degree + orb + 1))
+        axis_edges = edges | {degree + sign * self.axes_orbit for _, degree, _ in self.aspects for sign in (-1, 1)}
+
+        targets = []
+        for natal_point, natal_longitude in self.natal_points.items():
+            offsets = {}
+            for edge in axis_edges if natal_point in AXES_LIST else edges:
+                if 0 < edge < 180:
+                    offsets[edge] = offsets[-edge] = None
+            for _, degree, _ in self.aspects:
+                # Conjunction and opposition are one longitude each
+                offsets[degree] = offsets[-degree if degree < 180 else degree] = degree
+
+            targets += [((natal_longitude + offset) % 360, natal_point, degree) for offset, degree in offsets.items()]
+
+        return sorted(targets, key=lambda target: target[0])
+
+    @staticmethod
+    def _get_crossed(angles: list, start_longitude: float, travelled: float, direction: int) -> list:
+        """Indexes of the sorted angles passed moving travelled degrees from start_longitude, in the order they're reached."""
+        if direction == 1:
+            last = start_longitude + travelled
+            crossed = list(range(bisect_right(angles, start_longitude), bisect_right(angles, min(last, 360))))
+            if last >= 360:
+                crossed += range(bisect_right(angles, last - 360))
+            return crossed
+
+        first = start_longitude - travelled
+        crossed = list(reversed(range(bisect_left(angles, max(first, 0)), bisect_left(angles, start_longitude))))
+        if first < 0:
+            crossed += reversed(range(bisect_left(angles, first + 360), len(angles)))
+        return crossed
+
+    def _find_crossing(self, point: str, piece: tuple, target: float, iflag: int) -> float:
+        """
+        When the point reaches a longitude inside one timeline piece: Newton steps on
+        its speed, starting from where a cubic through the piece's ends reaches it.
+        Falls back to find_root when the steps don't settle inside the piece.
+        """
+        (start, start_longitude, _, start_speed), (end, end_longitude, _, end_speed), direction, travelled = piece
+        span, change = end - start, direction * travelled
+        goal = direction * math.fmod(direction * (target - start_longitude) + 360, 360)
+
+        # Cubic Hermite from the end longitudes and speeds, usually within a second of arc of the Swiss Ephemeris
+        fraction = goal / change
+        for _ in range(HERMITE_STEPS):
+            fraction2, fraction3 = fraction * fraction, fraction * fraction * fraction
+            value = (fraction3 - 2 * fraction2 + fraction) * start_speed * span + (3 * fraction2 - 2 * fraction3) * change + (fraction3 - fraction2) * end_speed * span - goal
+            slope = (3 * fraction2 - 4 * fraction + 1) * start_speed * span + (6 * fraction - 6 * fraction2) * change + (3 * fraction2 - 2 * fraction) * end_speed * span
+            if slope * direction <= 0:
+                break
+            fraction = min(max(fraction - value / slope, 0.0), 1.0)
+
+        julian_day = start + fraction * span
+        for _ in range(NEWTON_STEPS):
+            longitude, speed = self._calculate(point, julian_day, iflag)
+            if speed * direction <= 0:
+                break
+            step = _wrap(longitude - target) / speed
+            julian_day -= step
+            if not start <= julian_day <= end:
+                break
+            if abs(step) < TOLERANCE_DAYS:
+                return julian_day
+
+        end_distance = _wrap(end_longitude - target)
+        if end_distance == 0:
+            return end
+        distance = lambda julian_day: _wrap(self._calculate(point, julian_day, iflag)[0] - target)
+        return find_root(distance, start, end, _wrap(start_longitude - target), end_distance)
+
+    def _find_point_transits(self, transit_point: str, start: float, end: float, iflag: int, samples_cache: dict) -> List[TransitAspect]:
+        timeline, _ = self._get_timeline(transit_point, start, end, iflag, samples_cache)
+        angles = [angle for angle, _, _ in self._targets]
+
+        # (piece, offset along it, target) for every target reached, per natal point in time order
+        pieces, crossings = [], {natal_point: [] for natal_point in self.natal_points}
+        for piece_start, piece_end in zip(timeline, timeline[1:]):
+            direction = -1 if piece_start[2] else 1
+            travelled = math.fmod(direction * (piece_end[1] - piece_start[1]) + 360, 360)
+            if travelled > 180:
+                # A hair the other way right at a station
+                continue
+
+            piece = (piece_start, piece_end, direction, travelled)
+            for index in self._get_crossed(angles, piece_start[1], travelled, direction):
+                angle, natal_point, degree = self._targets[index]
+                offset = math.fmod(direction * (angle - piece_start[1]) + 360, 360)
+                if 0 < offset <= travelled:
+                    crossings[natal_point].append((piece, offset, angle, degree))
+            pieces.append(piece)
+
+        transits = []
+        for natal_point, natal_longitude in self.natal_points.items():
+            is_axis = natal_point in AXES_LIST
+            aspect_at = lambda longitude: self._get_aspect(abs(_wrap(longitude - natal_longitude)), is_axis)
+
+            current = None
+            aspect = aspect_at(timeline[0][1])
+            if aspect is not None:
+                current = TransitAspect(transit_point, natal_point, self.aspects[aspect][0], self.aspects[aspect][1], None, None)
+
+            point_crossings = crossings[natal_point]
+            for index, (piece, offset, angle, degree) in enumerate(point_crossings):
+                # Any longitude between this target and the next one is in the same aspect
+                next_offset = point_crossings[index + 1][1] if index + 1 < len(point_crossings) and point_crossings[index + 1][0] is piece else piece[3]
+                aspect = aspect_at(piece[0][1] + piece[2] * (offset + next_offset) / 2)
+
+                is_exact = degree is not None and current is not None and current.aspect_degrees == degree
+                leaves = current is not None and (aspect is None or self.aspects[aspect][0] != current.aspect)
+                enters = aspect is not None and (current is None or leaves)
+                if not (is_exact or leaves or enters):
+                    continue
+
+                crossed_at = self._find_crossing(transit_point, piece, angle, iflag)
+                if is_exact:
+                    current.exact_julian_days.append(crossed_at)
+                if leaves:
+                    current.exit_julian_day = crossed_at
+                    transits.append(current)
+                    current = None
+                if enters:
+                    current = TransitAspect(transit_point, natal_point, self.aspects[aspect][0], self.aspects[aspect][1], crossed_at, None)
+
+            if current is not None:
+                transits.append(current)
+
+        return transits
+
+    def find_transits(self, start: Union[datetime, float], end: Union[datetime, float]) -> List[TransitAspect]:
+        """
+        Every transit aspect in orb at some point between start and end (datetimes,
+        naive ones in UTC, or UT Julian days), ordered by when it comes into orb.
+        """
+        start = start if isinstance(start, (int, float)) else datetime_to_julian_day(start)
+        end = end if isinstance(end, (int, float)) else datetime_to_julian_day(end)
+        if end <= start:
+            raise KerykeionException("The end of the range must come after its start!")
+
+        transits, samples_cache = [], {}
+        with swiss_ephemeris_context(self.zodiac_type, self.sidereal_mode, self.perspective_type, self.lat, self.lng) as iflag:
+            for transit_point in self.transit_points:
+                transits += self._find_point_transits(transit_point, start, end, iflag, samples_cache)
+
+        return sorted(transits, key=lambda transit: start if transit.entry_julian_day is None else transit.entry_julian_day)
+
+
+if __name__ == "__main__":
+    natal = AstrologicalSubject("Natal", 1990, 6, 15, 12, 30, "Rome", "IT", lng=12.49, lat=41.89, tz_str="Europe/Rome", online=False)
+    finder = TransitTimelineFinder(natal)
+    start, end = datetime(2024, 1, 1), datetime(2025, 1, 1)
+
+    for transit in finder.find_transits(start, end):
+        if transit.transit_point in ("Jupiter", "Saturn"):
+            entry = f"{transit.entry_datetime:%Y-%m-%d %H:%M}" if transit.entry_datetime else "(in orb)"
+            exit_ = f"{transit.exit_datetime:%Y-%m-%d %H:%M}" if transit.exit_datetime else "(in orb)"
+            exacts = ", ".join(f"{exact:%Y-%m-%d %H:%M}" for exact in transit.exact_datetimes)
+            print(f"{transit.transit_point} {transit.aspect} natal {transit.natal_point}: {entry} -> {exit_}, exact {exacts or '-'}")
+
+    seconds = timeit.timeit(lambda: finder.find_transits(start, end), number=1)
+    print(f"All transits for one year: {len(finder.find_transits(start, end))} in {seconds:.2f} s")